@@ -0,0 +1,182 @@
+"""
+Compares /graphql served by the WSGI app (ExtrasGraphQLView, one thread per
+request) with the ASGI app (AsyncGraphQLView on the event loop with the
+queries in the thread pool) under concurrent load.
+
+Both are driven in process - the WSGI view by a pool of threads each with
+a test Client, as a threaded WSGI server would, and the ASGI view by
+AsyncClient requests gathered on one event loop.  The response cache is
+off so every request executes.
+
+    python -m benchmarks.async_view --rows 2000 --concurrency 16
+
+SQLite in memory answers in microseconds, far quicker than a database over
+a network.  --latency adds a round trip time to every query, which is where
+running fields at the same time pays off -
+
+    python -m benchmarks.async_view --latency 2
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.utils import setup, summarise, test_database
+
+QUERY = """
+query LoadProducts ($first: Int, $orderBy: String) {
+  viewer {
+    products (first: $first, orderBy: $orderBy) {
+      edges {
+        node {
+          pk
+          price
+          startUi
+          durationUi
+          square { pk adUrl }
+        }
+        cursor
+      }
+      pageInfo { hasNextPage }
+      total
+      pages {
+        around { cursor pageNumber isCurrent }
+        last { cursor pageNumber }
+      }
+    }
+    squares (first: 10) {
+      edges { node { adUrl } }
+    }
+  }
+}
+"""
+
+
+def add_latency(seconds):
+    """
+    Sleep for seconds before every query, on every connection including
+    those opened later by other threads.
+    """
+    from django.db import connections
+    from django.db.backends.signals import connection_created
+
+    def wrapper(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def install(sender, connection, **kwargs):
+        connection.execute_wrappers.append(wrapper)
+
+    connection_created.connect(install, weak=False)
+    for connection in connections.all():
+        connection.execute_wrappers.append(wrapper)
+
+
+def body(i):
+    order_by = ["price", "-price", "start", "duration,start"][i % 4]
+    return json.dumps({
+        "query": QUERY,
+        "variables": {"first": 20, "orderBy": order_by},
+    })
+
+
+def check(response):
+    assert response.status_code == 200, response.content
+    assert "errors" not in response.json(), response.content
+
+
+def run_wsgi(requests, concurrency):
+    from django.db import connections
+    from django.test import Client
+
+    local = threading.local()
+
+    def request(i):
+        if not hasattr(local, "client"):
+            local.client = Client()
+        start = time.perf_counter()
+        response = local.client.post(
+            "/wsgi", body(i), content_type="application/json")
+        elapsed = time.perf_counter() - start
+        check(response)
+        return elapsed
+
+    def close(i):
+        connections.close_all()
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        timings = list(pool.map(request, range(requests)))
+        # the connections of the pool's threads
+        list(pool.map(close, range(concurrency)))
+    return timings
+
+
+def run_asgi(requests, concurrency):
+    from django.test import AsyncClient
+
+    async def main():
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def request(i):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post(
+                    "/asgi", body(i), content_type="application/json")
+                elapsed = time.perf_counter() - start
+                check(response)
+                return elapsed
+
+        return await asyncio.gather(*[request(i) for i in range(requests)])
+
+    return asyncio.run(main())
+
+
+def report(name, timings, elapsed):
+    stats = summarise(timings)
+    print(
+        f"{name:<5} {len(timings) / elapsed:8.1f} req/s  "
+        + "  ".join(f"{k} {v:7.1f}ms" for k, v in stats.items())
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0,
+                        help="milliseconds added to every query")
+    args = parser.parse_args()
+
+    setup()
+
+    from django.conf import settings
+    from django.test.utils import override_settings
+
+    from benchmarks.cursor_predicates import seed
+
+    extras = {**getattr(settings, "GRAPHENE_EXTRAS", {}), "RESPONSE_CACHE": None}
+
+    with test_database(), override_settings(
+        ROOT_URLCONF="benchmarks.urls",
+        ALLOWED_HOSTS=["testserver"],
+        GRAPHENE_EXTRAS=extras,
+    ):
+        seed(args.rows)
+        if args.latency:
+            add_latency(args.latency / 1000)
+        print(f"{args.requests} requests, {args.concurrency} at a time, "
+              f"{args.rows} products, {args.latency}ms per query")
+        for name, run in (("wsgi", run_wsgi), ("asgi", run_asgi)):
+            # warm up e.g. the document cache and the totals
+            run(args.concurrency, args.concurrency)
+            start = time.perf_counter()
+            timings = run(args.requests, args.concurrency)
+            report(name, timings, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Throughput of /graphql with the connection settings of proj/db.py against
+sqlite's defaults, under concurrent reads and writes -
+
+    per request     CONN_MAX_AGE 0 and sqlite's defaults (rollback journal,
+                    synchronous full) - as the project was
+    persistent      CONN_MAX_AGE 60, sqlite's defaults
+    persistent+wal  CONN_MAX_AGE 60 and the pragmas of proj/db.py with
+                    SQLITE_JOURNAL_MODE wal
+
+Every mode waits the same busy_timeout for a lock so they differ only in
+the above.  A request which fails anyway, e.g. "database is locked", is
+counted and reported rather than stopping the run.
+
+A pool of threads, each with a test Client as a threaded WSGI server would,
+sends the products query of benchmarks.async_view; every --write-every'th
+request is a bulkCreatePeople mutation of --batch people instead.  The
+database is a file, in --dir, so that the threads share it.  Writes are
+where the modes differ - a rollback journal locks readers out while a
+writer commits and fsyncs it - so the defaults are write heavy.  On a
+filesystem where fsync is cheap, or with few writes, expect the modes to
+be close; the run says so when they are.
+
+    python -m benchmarks.connections --rows 5000 --requests 400 --concurrency 8
+"""
+import argparse
+import itertools
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.async_view import body, check
+from benchmarks.utils import setup, summarise, test_database
+
+MUTATION = """
+mutation Create ($people: [PersonInput!]!) {
+  bulkCreatePeople (input: {people: $people}) {
+    errors { index }
+    personNodeEdges { node { id } }
+  }
+}
+"""
+
+SQLITE_DEFAULTS = {"journal_mode": "delete", "synchronous": "full"}
+
+# modes whose throughput is within this of each other are reported as the same
+SAME = 0.1
+
+
+def modes():
+    from proj.db import sqlite_pragmas
+
+    tuned = sqlite_pragmas({"SQLITE_JOURNAL_MODE": "wal"})
+    defaults = {**SQLITE_DEFAULTS, "busy_timeout": tuned["busy_timeout"]}
+    return {
+        "per request": {"CONN_MAX_AGE": 0, "PRAGMAS": defaults},
+        "persistent": {"CONN_MAX_AGE": 60, "PRAGMAS": defaults},
+        "persistent+wal": {"CONN_MAX_AGE": 60, "PRAGMAS": tuned},
+    }
+
+
+def use(mode):
+    """
+    The connections opened from now on, by any thread, have the settings of
+    mode.
+    """
+    from django.db import connections
+
+    connections.close_all()
+    connections.databases["default"].update(mode)
+
+
+def mutation_body(ids, batch):
+    people = [
+        {
+            "firstName": "a", "lastName": "b", "age": 30, "sex": "m",
+            "alive": True, "uniqueIdentifier": f"load-{next(ids)}",
+            "randomNumber": 1,
+        }
+        for i in range(batch)
+    ]
+    return json.dumps({"query": MUTATION, "variables": {"people": people}})
+
+
+def run(requests, concurrency, write_every, batch, ids):
+    """
+    (timings, errors) of the requests.
+    """
+    from django.db import connections
+    from django.test import Client
+
+    local = threading.local()
+    ids_lock = threading.Lock()
+
+    def request(i):
+        if not hasattr(local, "client"):
+            local.client = Client()
+        if write_every and i % write_every == 0:
+            with ids_lock:
+                data = mutation_body(ids, batch)
+        else:
+            data = body(i)
+        start = time.perf_counter()
+        try:
+            response = local.client.post("/wsgi", data, content_type="application/json")
+            check(response)
+        except Exception as e:
+            return time.perf_counter() - start, e
+        return time.perf_counter() - start, None
+
+    def close(i):
+        connections.close_all()
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(request, range(requests)))
+        list(pool.map(close, range(concurrency)))
+    timings = [elapsed for elapsed, error in results]
+    errors = [error for elapsed, error in results if error is not None]
+    return timings, errors
+
+
+def first_line(error):
+    return (str(error).strip().splitlines() or [type(error).__name__])[0][:100]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--write-every", type=int, default=2,
+                        help="every nth request writes, 0 for none")
+    parser.add_argument("--batch", type=int, default=20,
+                        help="people created by each write")
+    parser.add_argument("--dir", default=None,
+                        help="directory of the database file, a temporary one by default")
+    args = parser.parse_args()
+
+    setup()
+
+    from django.conf import settings
+    from django.test.utils import override_settings
+
+    from benchmarks.cursor_predicates import seed
+
+    extras = {**getattr(settings, "GRAPHENE_EXTRAS", {}), "RESPONSE_CACHE": None}
+    directory = tempfile.mkdtemp(dir=args.dir)
+    name = os.path.join(directory, "connections.sqlite3")
+    ids = itertools.count()
+
+    with test_database(name=name), override_settings(
+        ROOT_URLCONF="benchmarks.urls",
+        ALLOWED_HOSTS=["testserver"],
+        GRAPHENE_EXTRAS=extras,
+    ):
+        seed(args.rows)
+        print(f"{args.requests} requests, {args.concurrency} at a time, "
+              f"1 in {args.write_every} writing {args.batch} people, "
+              f"{args.rows} products")
+        throughputs = {}
+        for label, mode in modes().items():
+            use(mode)
+            # warm up
+            run(args.concurrency, args.concurrency, args.write_every, args.batch, ids)
+            start = time.perf_counter()
+            timings, errors = run(
+                args.requests, args.concurrency, args.write_every, args.batch, ids)
+            elapsed = time.perf_counter() - start
+            # only the requests which succeeded count towards throughput
+            throughputs[label] = (len(timings) - len(errors)) / elapsed
+            stats = summarise(timings)
+            print(
+                f"{label:<15} {throughputs[label]:8.1f} req/s  "
+                + "  ".join(f"{k} {v:7.1f}ms" for k, v in stats.items())
+                + f"  {len(errors)} failed"
+            )
+            for message, count in Counter(map(first_line, errors)).most_common(3):
+                print(f"{'':<15} {count} x {message}")
+
+        fastest = max(throughputs, key=throughputs.get)
+        slowest = min(throughputs, key=throughputs.get)
+        if throughputs[fastest] <= throughputs[slowest] * (1 + SAME):
+            print(f"The modes are within {SAME:.0%} of each other - no difference "
+                  "at this load.  Try more writes (--write-every, --batch), more "
+                  "--concurrency or a --dir on a disk where fsync is slow.")
+        else:
+            print(f"{fastest} is the fastest, "
+                  f"{throughputs[fastest] / throughputs[slowest]:.1f}x {slowest}.")
+
+
+if __name__ == "__main__":
+    main()
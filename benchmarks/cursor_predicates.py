@@ -0,0 +1,108 @@
+"""
+Compares the two ways proper_cursors can filter on a cursor -
+
+    the OR of ANDs from build_q_objects
+    the row value comparison e.g. (duration, start, id) > (x, y, z)
+
+against SQLite with indexes on the sort columns.  Pages are taken at
+several depths into the table.
+
+    python -m benchmarks.cursor_predicates --rows 200000
+"""
+import argparse
+import random
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.utils import setup, summarise, test_database, timeit
+
+SORTS = {
+    "price": ["price", "pk"],
+    "duration,start": ["duration", "start", "pk"],
+    "-duration,-start": ["-duration", "-start", "-pk"],
+}
+
+INDEXES = [
+    "CREATE INDEX bench_price ON squares_product (price, id)",
+    "CREATE INDEX bench_duration_start ON squares_product (duration, start, id)",
+]
+
+
+def seed(rows, batch_size=10000):
+    from squares.models import Product, Square
+
+    rng = random.Random(0)
+    Square.objects.bulk_create(
+        [Square(ad_url="www.google.com") for i in range(rows)],
+        batch_size=batch_size
+    )
+    # bulk_create doesn't set the pks on sqlite
+    squares = Square.objects.order_by('pk')
+    epoch = datetime(2021, 1, 1, tzinfo=timezone.utc)
+    products = []
+    for s in squares:
+        start = epoch + timedelta(minutes=rng.randint(0, 525600))
+        duration = timedelta(days=rng.randint(1, 7))
+        products.append(
+            Product(
+                square=s,
+                start=start,
+                duration=duration,
+                end=start + duration,
+                listing=rng.choice("ls"),
+                price=rng.randint(1, 1000000)
+            )
+        )
+        if len(products) == batch_size:
+            Product.objects.bulk_create(products)
+            products = []
+    Product.objects.bulk_create(products)
+
+
+def query_plan(connection, qs):
+    sql, params = qs.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+        return " / ".join(row[-1] for row in cursor.fetchall())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    setup()
+
+    from graphene_extras.pagination.proper_cursors import (
+        cursor_string_from_obj, filter_queryset)
+    from squares.models import Product
+
+    with test_database() as connection:
+        seed(args.rows)
+        with connection.cursor() as cursor:
+            for sql in INDEXES:
+                cursor.execute(sql)
+            cursor.execute("ANALYZE")
+
+        for name, sort in SORTS.items():
+            qs = Product.objects.order_by(*sort)
+            for depth in (0.01, 0.5, 0.99):
+                obj = qs[int(args.rows * depth)]
+                cursor = cursor_string_from_obj(obj, sort)
+                print(f"\nsort {name}, cursor at {depth:.0%}")
+                for row_values in (False, True):
+                    page = filter_queryset(
+                        qs, cursor, sort, row_values=row_values)[:args.page_size]
+                    timings = summarise(
+                        timeit(lambda: list(page.all()), args.repeat))
+                    label = "row value" if row_values else "or of ands"
+                    print(
+                        f"  {label:<10} p50 {timings['p50']:8.2f}ms"
+                        f"  p95 {timings['p95']:8.2f}ms"
+                        f"  plan: {query_plan(connection, page)}"
+                    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""
+The graphql pagination paths at several table sizes, at the first page and
+deep into the table -
+
+    offset      peoplePages, graphene's connection_from_list over the
+                queryset (offset cursors)
+    keyset      a QuerysetConnectionField of products (proper cursors)
+    pages       the page buttons and total of viewer.products
+                (PaginationConnection.pages)
+    search      viewer.products filtered by the search form with the UI
+                fields (resolve_products)
+
+For each the latency percentiles, the number of queries and the peak memory
+allocated by python are written to a JSON report, which a later run can be
+compared against -
+
+    python -m benchmarks.pagination --sizes 1000 10000 100000 --out before.json
+    ... change something ...
+    python -m benchmarks.pagination --sizes 1000 10000 100000 --compare before.json
+
+--compare prints each result next to the old one and exits with 1 if any
+is slower or uses more memory by more than --threshold, or makes more
+queries.  Timings are only comparable between runs on the same machine.
+
+Every size gets a fresh test database seeded with manage.py seed and the
+same --seed, so runs see the same rows.  The response cache is off.
+"""
+import argparse
+import io
+import json
+import platform
+import sqlite3
+import sys
+import time
+import tracemalloc
+
+from benchmarks.utils import percentile, setup, summarise, test_database, timeit
+
+PAGE_SIZE = 20
+# how far into the table the deep pages are
+DEEP = 0.9
+
+PEOPLE = """
+query People ($after: String) {
+  peopleViewer {
+    peoplePages (first: %d, after: $after) {
+      edges { node { firstName lastName age } cursor }
+      pageInfo { hasNextPage }
+    }
+  }
+}
+""" % PAGE_SIZE
+
+KEYSET = """
+query Keyset ($after: String) {
+  keysetProducts (first: %d, after: $after, orderBy: "price") {
+    edges { node { pk price start } cursor }
+    pageInfo { hasNextPage }
+  }
+}
+""" % PAGE_SIZE
+
+PAGES = """
+query Pages ($after: String) {
+  viewer {
+    products (first: %d, after: $after, orderBy: "price") {
+      edges { cursor }
+      total
+      pages (pageSize: %d) {
+        around { cursor pageNumber isCurrent }
+        last { cursor pageNumber }
+      }
+    }
+  }
+}
+""" % (PAGE_SIZE, PAGE_SIZE)
+
+SEARCH = """
+query Search ($after: String, $formData: ProductNodeInput) {
+  viewer {
+    products (first: %d, after: $after, orderBy: "-price", formData: $formData) {
+      edges {
+        node { pk price startUi endUi durationUi square { pk adUrl } }
+        cursor
+      }
+      pageInfo { hasNextPage }
+      formErrors { field errors }
+    }
+  }
+}
+""" % PAGE_SIZE
+
+SEARCH_FORM = {"fromPrice": 100, "listing": ["l"]}
+
+
+def build_schema():
+    """
+    The schema of the project with the people of the viewer and a keyset
+    connection of products, which the project's schema doesn't have.
+    """
+    import graphene
+    import people.schema
+    from graphene_extras.pagination.proper_cursors import \
+        QuerysetConnectionField
+    from graphene_extras.pagination.ui import PaginationConnection
+    from proj.schema import Mutation
+    from squares.models import Product
+    from squares.schema import PaginateProductConnection, ProductNode
+    from squares.schema import Query as SquaresQuery
+
+    class KeysetProductConnection(PaginationConnection):
+        class Meta:
+            node = ProductNode
+
+        @classmethod
+        def get_queryset(cls, root, info, **kwargs):
+            return Product.objects.all()
+
+        @classmethod
+        def get_sort(cls, **kwargs):
+            return PaginateProductConnection.get_sort(**kwargs)
+
+    # both apps call their viewer ViewerNode
+    class PeopleViewer(people.schema.ViewerNode):
+        pass
+
+    class Query(SquaresQuery):
+        people_viewer = graphene.Field(PeopleViewer)
+        keyset_products = QuerysetConnectionField(
+            KeysetProductConnection, orderBy=graphene.String())
+
+        def resolve_people_viewer(root, info):
+            return PeopleViewer()
+
+    return graphene.Schema(query=Query, mutation=Mutation)
+
+
+def seed(size, random_seed):
+    from django.core.management import call_command
+    call_command(
+        'seed',
+        squares=max(size // 10, 1),
+        products=size,
+        people=size,
+        seed=random_seed,
+        stdout=io.StringIO(),
+    )
+
+
+def cursors(size):
+    """
+    The after of the deep page of each scenario.
+    """
+    from graphene_extras.pagination.proper_cursors import \
+        cursor_string_from_obj
+    from graphene_extras.pagination.ui import create_cursor
+    from squares.forms import ProductSearchForm
+    from squares.models import Product
+    from squares.schema import PaginateProductConnection, form_data_from_input
+
+    index = int(size * DEEP)
+    price = PaginateProductConnection.get_sort(orderBy="price")
+    form = ProductSearchForm(data=form_data_from_input({
+        "from_price": SEARCH_FORM["fromPrice"], "listing": SEARCH_FORM["listing"]}))
+    assert form.is_valid(), form.errors
+    searched = Product.objects.filter(form.get_filters())
+    search_sort = PaginateProductConnection.get_sort(orderBy="-price")
+    search_index = int(searched.count() * DEEP)
+    return {
+        "offset": create_cursor(index),
+        "keyset": cursor_string_from_obj(Product.objects.order_by(*price)[index], price),
+        "pages": cursor_string_from_obj(Product.objects.order_by(*price)[index], price),
+        "search": cursor_string_from_obj(
+            searched.order_by(*search_sort)[search_index], search_sort),
+    }
+
+
+def scenarios(size):
+    deep = cursors(size)
+    queries = {
+        "offset": PEOPLE,
+        "keyset": KEYSET,
+        "pages": PAGES,
+        "search": SEARCH,
+    }
+    for name, query in queries.items():
+        extra = {"formData": SEARCH_FORM} if name == "search" else {}
+        yield f"{name}/first", query, {"after": None, **extra}
+        yield f"{name}/deep", query, {"after": deep[name], **extra}
+
+
+def measure(schema, query, variables, repeat):
+    from django.db import connection
+    from django.test import RequestFactory
+    from django.test.utils import CaptureQueriesContext
+
+    factory = RequestFactory()
+
+    def execute():
+        # a request per execution like the view, so nothing is shared
+        # between them e.g. the DataLoaders
+        result = schema.execute(
+            query, variables=variables, context_value=factory.post("/graphql"))
+        assert not result.errors, result.errors
+        return result
+
+    execute()  # warm up e.g. the cached totals
+
+    with CaptureQueriesContext(connection) as ctx:
+        execute()
+    tracemalloc.start()
+    try:
+        execute()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    timings = timeit(execute, repeat)
+    return {
+        **summarise(timings),
+        "p99": percentile(timings, 99) * 1000,
+        "queries": len(ctx.captured_queries),
+        "peak_kb": peak / 1024,
+    }
+
+
+def compare(results, old, threshold):
+    """
+    Prints the results next to the old ones.  Returns the keys which
+    regressed.
+    """
+    regressions = []
+    print(f"\n{'':<28}{'p50 ms':>20}{'queries':>14}{'peak kb':>22}")
+    for key, new in results.items():
+        if key not in old:
+            print(f"{key:<28} (new)")
+            continue
+        before = old[key]
+        slower = new["p50"] > before["p50"] * (1 + threshold)
+        bigger = new["peak_kb"] > before["peak_kb"] * (1 + threshold)
+        more = new["queries"] > before["queries"]
+        flag = " <- regressed" if slower or bigger or more else ""
+        print(
+            f"{key:<28}"
+            f"{before['p50']:9.2f} {new['p50']:9.2f}"
+            f"{before['queries']:7d} {new['queries']:6d}"
+            f"{before['peak_kb']:11.0f} {new['peak_kb']:10.0f}{flag}"
+        )
+        if flag:
+            regressions.append(key)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the report to this file")
+    parser.add_argument("--compare", help="a report of an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="how much slower or bigger counts as a regression")
+    args = parser.parse_args()
+
+    setup()
+
+    from django.conf import settings
+    from django.test.utils import override_settings
+
+    old = None
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)["results"]
+
+    extras = {**getattr(settings, "GRAPHENE_EXTRAS", {}), "RESPONSE_CACHE": None}
+    schema = build_schema()
+    results = {}
+    with override_settings(GRAPHENE_EXTRAS=extras):
+        for size in args.sizes:
+            with test_database():
+                start = time.perf_counter()
+                seed(size, args.seed)
+                print(f"{size} rows seeded in {time.perf_counter() - start:.1f}s")
+                for name, query, variables in scenarios(size):
+                    key = f"{size}/{name}"
+                    results[key] = result = measure(schema, query, variables, args.repeat)
+                    print(
+                        f"  {name:<14} p50 {result['p50']:9.2f}ms  p95 {result['p95']:9.2f}ms"
+                        f"  p99 {result['p99']:9.2f}ms  {result['queries']:3d} queries"
+                        f"  peak {result['peak_kb']:9.0f}kb"
+                    )
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "sizes": args.sizes,
+            "repeat": args.repeat,
+            "seed": args.seed,
+            "page_size": PAGE_SIZE,
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"report written to {args.out}")
+
+    if old is not None:
+        regressions = compare(results, old, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regressed")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Rows per second of ProductSerializer (DRF, a model instance per row) and of
+compiled_product_serializer (values_list tuples) for the same products.
+
+Timed twice - with the query, as a view would, and only the serializing,
+over rows already read.
+
+    python -m benchmarks.serializers --rows 100000
+"""
+import argparse
+
+from benchmarks.utils import setup, test_database, timeit
+
+
+def report(name, rows, timings):
+    best = min(timings)
+    print(f"{name:<28} {rows / best:12,.0f} rows/s  {best * 1000:9.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    setup()
+
+    from benchmarks.cursor_predicates import seed
+    from squares.models import Product
+    from squares.serializers import (ProductSerializer,
+                                     compiled_product_serializer)
+
+    with test_database():
+        seed(args.rows)
+        queryset = Product.objects.order_by('pk')
+
+        drf = ProductSerializer(queryset, many=True).data
+        compiled = compiled_product_serializer.serialize(queryset)
+        assert [dict(x) for x in drf] == compiled, "the serializers differ"
+
+        print(f"{args.rows} products, best of {args.repeat}")
+        print("with the query")
+        report("ProductSerializer", args.rows, timeit(
+            lambda: ProductSerializer(queryset.all(), many=True).data, args.repeat))
+        report("compiled", args.rows, timeit(
+            lambda: compiled_product_serializer.serialize(queryset.all()), args.repeat))
+
+        print("serializing only")
+        instances = list(queryset)
+        rows = list(compiled_product_serializer.values_list(queryset))
+        to_representation = compiled_product_serializer.to_representation
+        report("ProductSerializer", args.rows, timeit(
+            lambda: ProductSerializer(instances, many=True).data, args.repeat))
+        report("compiled", args.rows, timeit(
+            lambda: [to_representation(row) for row in rows], args.repeat))
+
+
+if __name__ == "__main__":
+    main()
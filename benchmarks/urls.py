@@ -0,0 +1,11 @@
+"""
+The ROOT_URLCONF of the benchmarks which compare the graphql views.
+"""
+from django.urls import path
+from django.views.decorators.csrf import csrf_exempt
+from graphene_extras.views import AsyncGraphQLView, ExtrasGraphQLView
+
+urlpatterns = [
+    path("wsgi", csrf_exempt(ExtrasGraphQLView.as_view())),
+    path("asgi", AsyncGraphQLView.as_view()),
+]
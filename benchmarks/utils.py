@@ -0,0 +1,62 @@
+"""
+Helpers shared by the benchmarks.  Each benchmark is a module run from the
+root of the project e.g.
+
+    python -m benchmarks.cursor_predicates
+
+Benchmarks run against a throwaway test database so db.sqlite3 is left alone.
+"""
+import os
+import statistics
+import time
+from contextlib import contextmanager
+
+import django
+
+
+def setup():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'proj.settings')
+    django.setup()
+
+
+@contextmanager
+def test_database(alias='default', name=None):
+    """
+    A test database for the alias, in memory for sqlite unless name - a
+    file - is given e.g. for connections from several threads.
+    """
+    from django.db import connections
+    connection = connections[alias]
+    old_name = connection.settings_dict['NAME']
+    if name is not None:
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = name
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def timeit(fn, repeat=20):
+    timings = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def percentile(values, p):
+    values = sorted(values)
+    i = min(len(values) - 1, round(p / 100 * (len(values) - 1)))
+    return values[i]
+
+
+def summarise(timings):
+    # milliseconds
+    return {
+        "min": min(timings) * 1000,
+        "p50": statistics.median(timings) * 1000,
+        "p95": percentile(timings, 95) * 1000,
+        "max": max(timings) * 1000,
+    }
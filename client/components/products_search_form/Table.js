@@ -1,5 +1,5 @@
 import React, { useEffect, useRef } from 'react';
-import { useTable, useSortBy, usePagination } from "react-table";
+import { useTable, useSortBy, usePagination, actions } from "react-table";
 import Pagination from "react-bootstrap/Pagination";
 import Form from "react-bootstrap/Form";
 import Row from "react-bootstrap/Row";
@@ -53,6 +53,15 @@ function Table({
             autoResetPage: false,
             autoResetSortBy: false,
             pageCount: controlledPageCount,
+            // pages are loaded from cursors of the current sort and page
+            // size so a new sort or page size starts from the first page
+            stateReducer: (newState, action) => {
+                if ([actions.toggleSortBy, actions.setSortBy, actions.clearSortBy,
+                    actions.setPageSize].includes(action.type)) {
+                    return { ...newState, pageIndex: 0 };
+                }
+                return newState;
+            },
             useControlledState: state => {
                 return React.useMemo(function(){
                     let controlledPageIndex;
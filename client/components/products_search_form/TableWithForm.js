@@ -151,6 +151,9 @@ const Styles = styled.div`
 function TableApp() {
     const pageSizeRef = useRef(10);
     const orderByRef = useRef([]);
+    // the cursors of the page buttons and the sort, page size and search
+    // they belong to
+    const pageCursorsRef = useRef({ key: null, cursors: {} });
     const [filters, setFilters] = useState({});
 
     const { loading,
@@ -159,6 +162,7 @@ function TableApp() {
         = useQuery(LOAD_PRODUCTS, {
             variables: {
                 first: pageSizeRef.current,
+                pageSize: pageSizeRef.current,
                 after: ''
             },
             fetchPolicy: 'cache-first'
@@ -220,18 +224,6 @@ function TableApp() {
         'col6': 'price'
     };
 
-    const encodeCursor = (offset) => {
-        // server implementation is -
-        // def encode_cursor(index):
-        // return b64encode(
-        //     index.encode('utf8')
-        // ).decode('ascii')
-        // this is the JS equivalent
-        const prefix = 'arrayconnection:'; // this is the prefix used by the graphene relay package on the server
-        let cursor = prefix + offset;
-        return decodeURI(btoa(encodeURI(cursor)));
-    };
-
     const getOrderingQuery = (sortBy) => {
         const ordering = [];
         sortBy.forEach((s) => {
@@ -241,9 +233,30 @@ function TableApp() {
         return ordering;
     };
 
-    const getCursorFromOffset = (offset) => {
-        if (offset == 0) return "";
-        return encodeCursor(offset);
+    const getRequestKey = ({ orderBy, pageSize, formData }) => JSON.stringify(
+        [orderBy, pageSize, formData || null]
+    );
+
+    const getPageCursors = (data) => {
+        // the server gives the cursor which loads each page button - the
+        // cursor of the last row of the page before.  Offset cursors are
+        // not accepted; every page is loaded from a cursor of a row.
+        const pages = data?.viewer.products.pages;
+        const cursors = {};
+        if (!pages) return cursors;
+        [pages.first, pages.previous, pages.last, ...pages.around].forEach((p) => {
+            if (p) cursors[p.pageNumber] = p.cursor;
+        });
+        return cursors;
+    };
+
+    const getCursorForPage = (pageIndex, requestKey) => {
+        if (pageIndex == 0) return "";
+        // cursors of a different sort, page size or search don't apply.
+        // The table goes back to the first page when those change.
+        const { key, cursors } = pageCursorsRef.current;
+        if (key != requestKey) return "";
+        return cursors[pageIndex + 1] ?? "";
     };
 
     const fetchData = React.useCallback(
@@ -258,16 +271,22 @@ function TableApp() {
                 orderByRef.current = sortBy;
             }
             const orderBy = getOrderingQuery(sortBy);
-            const offset = pageIndex ? pageIndex * pageSize - 1 : 0;
             let variables = {
                 first: pageSize,
-                after: getCursorFromOffset(offset),
+                pageSize,
                 orderBy: orderBy.join(','),
             };
             if (filters) {
                 variables.formData = filters;
             }
-            fetchMore({ variables });
+            const requestKey = getRequestKey(variables);
+            variables.after = getCursorForPage(pageIndex, requestKey);
+            fetchMore({ variables }).then(({ data }) => {
+                pageCursorsRef.current = {
+                    key: requestKey,
+                    cursors: getPageCursors(data)
+                };
+            });
             // fetchMore still using same original variables -
             // https://github.com/apollographql/apollo-client/issues/2499
         },[]);
@@ -296,7 +315,7 @@ function TableApp() {
     const getPageCount = (data) => {
         const total = getTotal(data);
         if (!total) return 0;
-        return total > pageSizeRef.current ? Math.floor(total / pageSizeRef.current) : 1;
+        return Math.ceil(total / pageSizeRef.current);
     };
 
     return (
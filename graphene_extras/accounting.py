@@ -0,0 +1,58 @@
+"""
+Counts the queries a graphql request makes and the time the database took
+to answer them.
+
+    with account_queries() as timer:
+        result = document.execute(...)
+    timer.queries, timer.time
+
+Every connection gets an execute wrapper when it is opened (see
+GrapheneExtrasConfig.ready) which adds to the timer of the request it is
+running for, if there is one.  The timer is held in a context variable so
+the queries the async view runs in its thread pool are counted too (see
+async_execution.run_in_pool).
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+current_timer = ContextVar("graphene_extras_query_timer", default=None)
+
+
+class QueryTimer:
+    def __init__(self):
+        self.queries = 0
+        self.time = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, elapsed):
+        with self.lock:
+            self.queries += 1
+            self.time += elapsed
+
+
+def timed_execute(execute, sql, params, many, context):
+    timer = current_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timer.add(time.perf_counter() - start)
+
+
+def install_timer(sender, connection, **kwargs):
+    if timed_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(timed_execute)
+
+
+@contextmanager
+def account_queries():
+    timer = QueryTimer()
+    token = current_timer.set(timer)
+    try:
+        yield timer
+    finally:
+        current_timer.reset(token)
@@ -0,0 +1,17 @@
+from django.apps import AppConfig
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+class GrapheneExtrasConfig(AppConfig):
+    name = 'graphene_extras'
+
+    def ready(self):
+        from graphene_extras.accounting import install_timer
+        from graphene_extras.profiling import install_profiler
+
+        # time the queries of graphql requests (see accounting and profiling)
+        for install in (install_timer, install_profiler):
+            connection_created.connect(install)
+            for connection in connections.all():
+                install(None, connection)
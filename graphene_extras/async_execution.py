@@ -0,0 +1,121 @@
+"""
+Running graphql queries on the event loop of the ASGI app.
+
+The ORM is synchronous (django 3.1 has no async queries) and refuses to run
+on the event loop, so anything which queries is sent to a bounded pool of
+threads - ASYNC_THREADS of them - and the loop carries on with the rest of
+the query.  Fields which don't depend on each other, e.g. products and
+squares of the viewer, or the total and pages of products, are then run
+at the same time.
+
+What goes to the pool -
+
+    the fields of the query and mutation types
+    connection fields and the fields of connections (total, pages, ...)
+    the batches of the DataLoaders (see dataloaders)
+
+Everything else, e.g. the fields of the nodes, is just reading attributes
+of objects which have already been loaded so runs on the loop.
+
+Each thread of the pool has its own database connection, so ASYNC_THREADS
+is also the number of connections one process can have open.  Django only
+recycles connections around requests, in the thread of the request, so the
+pool does the same around every call (see run_with_connections).
+"""
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from graphene.relay import Connection
+from graphql.type import get_named_type
+from django.db import close_old_connections
+from promise import Promise
+
+from graphene_extras.settings import extras_setting
+
+_pool = None
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(
+            max_workers=extras_setting("ASYNC_THREADS"),
+            thread_name_prefix="graphql"
+        )
+    return _pool
+
+
+def in_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def run_with_connections(fn, *args, **kwargs):
+    """
+    fn(*args, **kwargs) with the connections of the thread checked before
+    and after as request_started / request_finished do - any which are
+    past CONN_MAX_AGE, or unusable after an error, are closed.
+    """
+    close_old_connections()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+def run_in_pool(fn, *args, **kwargs):
+    """
+    An asyncio future for fn(*args, **kwargs) run by the pool, in the
+    context of the caller (see accounting).
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return loop.run_in_executor(
+        get_pool(), partial(context.run, run_with_connections, fn, *args, **kwargs))
+
+
+def run_sync(fn, *args, **kwargs):
+    """
+    A promise for fn(*args, **kwargs).  On the event loop fn is run by the
+    pool; otherwise it is just called.
+    """
+    if in_event_loop():
+        return Promise.resolve(run_in_pool(fn, *args, **kwargs))
+    return Promise.resolve(fn(*args, **kwargs))
+
+
+def is_connection(graphql_type):
+    graphene_type = getattr(get_named_type(graphql_type), 'graphene_type', None)
+    return isinstance(graphene_type, type) and issubclass(graphene_type, Connection)
+
+
+class ThreadPoolMiddleware:
+    """
+    Graphene middleware which sends the resolvers which query to the pool.
+    Without an event loop, e.g. under WSGI, it does nothing.
+    """
+
+    def __init__(self):
+        # (parent type, field) -> whether it goes to the pool
+        self.offloaded = {}
+
+    def offload(self, info):
+        key = (info.parent_type.name, info.field_name)
+        if key not in self.offloaded:
+            schema = info.schema
+            self.offloaded[key] = (
+                info.parent_type in (schema.get_query_type(), schema.get_mutation_type())
+                or is_connection(info.parent_type)
+                or is_connection(info.return_type)
+            )
+        return self.offloaded[key]
+
+    def resolve(self, next, root, info, **args):
+        if in_event_loop() and self.offload(info):
+            return run_in_pool(next, root, info, **args)
+        return next(root, info, **args)
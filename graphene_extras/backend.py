@@ -0,0 +1,82 @@
+"""
+A graphql backend which keeps the documents it has parsed and validated.
+
+The default backend parses and validates the query text of every request.
+For the large queries the react apps send again and again that is a
+measurable share of each request.  Here the parsed document and the result
+of validating it are kept in an LRU cache keyed by the query text, so a
+query seen before goes straight to execution.
+"""
+import threading
+from collections import OrderedDict
+from functools import partial
+
+from graphql.backend.base import GraphQLDocument
+from graphql.backend.core import GraphQLCoreBackend
+from graphql.execution import ExecutionResult, execute
+from graphql.language.base import parse
+from graphql.validation import validate
+
+from graphene_extras.settings import extras_setting
+
+
+def execute_validated(schema, document_ast, validation_errors, *args, **kwargs):
+    if validation_errors:
+        return ExecutionResult(errors=validation_errors, invalid=True)
+    return execute(schema, document_ast, *args, **kwargs)
+
+
+class CachedDocumentBackend(GraphQLCoreBackend):
+    def __init__(self, maxsize=256, executor=None):
+        super().__init__(executor=executor)
+        self.maxsize = maxsize
+        self.documents = OrderedDict()
+        self.lock = threading.Lock()
+
+    def document_from_string(self, schema, document_string):
+        if not isinstance(document_string, str):
+            # an ast.Document
+            return super().document_from_string(schema, document_string)
+
+        key = (id(schema), document_string)
+        with self.lock:
+            document = self.documents.get(key)
+            if document is not None:
+                self.documents.move_to_end(key)
+                return document
+
+        # syntax errors are raised and so never cached
+        document_ast = parse(document_string)
+        validation_errors = validate(schema, document_ast)
+        document = GraphQLDocument(
+            schema=schema,
+            document_string=document_string,
+            document_ast=document_ast,
+            execute=partial(
+                execute_validated,
+                schema,
+                document_ast,
+                validation_errors,
+                **self.execute_params
+            ),
+        )
+        # e.g. for the cost of the query (see complexity)
+        document.validation_errors = validation_errors
+
+        with self.lock:
+            self.documents[key] = document
+            while len(self.documents) > self.maxsize:
+                self.documents.popitem(last=False)
+        return document
+
+
+_backend = None
+
+
+def get_document_backend():
+    # the view is instantiated for every request so the cache lives here
+    global _backend
+    if _backend is None:
+        _backend = CachedDocumentBackend(
+            maxsize=extras_setting("DOCUMENT_CACHE_SIZE"))
+    return _backend
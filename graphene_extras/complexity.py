@@ -0,0 +1,200 @@
+"""
+A static estimate of what a query will cost, made before it is executed, so
+that queries which would scan far too much are refused up front.
+
+Every field costs 1 each time it is resolved.  The nodes of a connection
+are resolved first / last times, RELAY_CONNECTION_MAX_LIMIT if neither is
+given, so
+
+    products (first: 50) {
+      total
+      edges { node { price square { adUrl } } }
+    }
+
+costs 1 (products) + 1 (total) + 1 (edges) + 50 * 4 (node, price, square
+and adUrl) = 203.  Connections inside connections multiply.  Lists other
+than connections count once; their size can't be known before they are
+resolved.
+
+The page buttons, pages (pageSize: n), read the rows of the two pages
+either side of the current one and of the last page (see page_cursors) so
+cost 5 * n on top of their fields, n being 10 if not given.
+
+A query costing more than MAX_QUERY_COST or nested deeper than
+MAX_QUERY_DEPTH is rejected.  Introspection (__schema, __type) is free.
+"""
+from graphene_django.settings import graphene_settings
+from graphql.error import GraphQLError
+from graphql.execution.utils import get_field_def
+from graphql.language.ast import (Field, FragmentDefinition, FragmentSpread,
+                                  OperationDefinition)
+from graphql.type import get_named_type
+from graphql.utils.type_from_ast import type_from_ast
+from graphql.utils.value_from_ast import value_from_ast
+
+from graphene_extras.async_execution import is_connection
+from graphene_extras.pagination.ui import DEFAULT_PAGE_SIZE
+from graphene_extras.settings import extras_setting
+
+
+# how many pages of rows pages reads, two either side and the last
+PAGES_READ = 5
+
+
+class QueryCostError(GraphQLError):
+    pass
+
+
+def get_operation(document_ast, operation_name):
+    operations = [
+        d for d in document_ast.definitions if isinstance(d, OperationDefinition)
+    ]
+    for operation in operations:
+        if operation_name is None or (
+                operation.name and operation.name.value == operation_name):
+            return operation
+
+
+def get_variables(schema, operation, variables):
+    """
+    The variables with the defaults of the operation filled in.
+    """
+    values = {}
+    for definition in operation.variable_definitions or []:
+        name = definition.variable.name.value
+        if definition.default_value is not None:
+            values[name] = value_from_ast(
+                definition.default_value, type_from_ast(schema, definition.type))
+    values.update(variables or {})
+    return values
+
+
+class CostEstimate:
+    def __init__(self, schema, fragments, variables):
+        self.schema = schema
+        self.fragments = fragments
+        self.variables = variables
+        self.max_limit = graphene_settings.RELAY_CONNECTION_MAX_LIMIT
+
+    def fields(self, parent_type, selection_set):
+        """
+        (parent type, Field) for the selection set with fragments expanded.
+        """
+        for selection in selection_set.selections:
+            if isinstance(selection, Field):
+                yield parent_type, selection
+                continue
+            if isinstance(selection, FragmentSpread):
+                fragment = self.fragments[selection.name.value]
+            else:
+                fragment = selection
+            _type = parent_type
+            if fragment.type_condition:
+                _type = self.schema.get_type(fragment.type_condition.name.value)
+            yield from self.fields(_type, fragment.selection_set)
+
+    def argument_values(self, field_def, field_ast, names):
+        for argument in field_ast.arguments or []:
+            name = argument.name.value
+            if name in names and name in field_def.args:
+                value = value_from_ast(
+                    argument.value, field_def.args[name].type, self.variables)
+                if isinstance(value, int):
+                    yield value
+
+    def page_size(self, field_def, field_ast):
+        # a negative first / last must not take cost off the query
+        return max(0, max(
+            self.argument_values(field_def, field_ast, ('first', 'last')),
+            default=self.max_limit
+        ))
+
+    def pages_rows(self, field_def, field_ast):
+        """
+        The rows read for the page buttons (see PaginationConnection).
+        """
+        page_size = max(
+            self.argument_values(field_def, field_ast, ('pageSize',)),
+            default=DEFAULT_PAGE_SIZE
+        )
+        return PAGES_READ * max(page_size, 1)
+
+    def selection_cost(self, parent_type, selection_set, depth):
+        """
+        (cost, depth) of the selection set.
+        """
+        cost = 0
+        max_depth = depth
+        for _type, field_ast in self.fields(parent_type, selection_set):
+            name = field_ast.name.value
+            if name.startswith('__'):
+                continue
+            field_def = get_field_def(self.schema, _type, name)
+            if field_def is None:
+                continue
+            field_cost, field_depth = self.field_cost(field_def, field_ast, depth + 1)
+            cost += field_cost
+            max_depth = max(max_depth, field_depth)
+        return cost, max_depth
+
+    def field_cost(self, field_def, field_ast, depth):
+        if field_ast.selection_set is None:
+            return 1, depth
+        return_type = get_named_type(field_def.type)
+        if not is_connection(field_def.type):
+            cost, depth = self.selection_cost(return_type, field_ast.selection_set, depth)
+            return 1 + cost, depth
+
+        size = self.page_size(field_def, field_ast)
+        cost = 1
+        max_depth = depth
+        for _type, child in self.fields(return_type, field_ast.selection_set):
+            child_def = get_field_def(self.schema, _type, child.name.value)
+            if child_def is None:
+                continue
+            child_cost, child_depth = self.field_cost(child_def, child, depth + 1)
+            if child.name.value == 'edges':
+                # edges itself is one list, what is under it is per node
+                child_cost = 1 + (child_cost - 1) * size
+            elif child.name.value == 'pages':
+                child_cost += self.pages_rows(child_def, child)
+            cost += child_cost
+            max_depth = max(max_depth, child_depth)
+        return cost, max_depth
+
+
+def estimate_cost(schema, document_ast, variables=None, operation_name=None):
+    """
+    (cost, depth) of the operation.  The document must be valid.
+    """
+    operation = get_operation(document_ast, operation_name)
+    if operation is None:
+        return 0, 0
+    fragments = {
+        d.name.value: d for d in document_ast.definitions
+        if isinstance(d, FragmentDefinition)
+    }
+    if operation.operation == 'mutation':
+        root = schema.get_mutation_type()
+    else:
+        root = schema.get_query_type()
+    estimate = CostEstimate(
+        schema, fragments, get_variables(schema, operation, variables))
+    return estimate.selection_cost(root, operation.selection_set, 0)
+
+
+def check_cost(cost, depth):
+    """
+    Raises QueryCostError if the cost or depth is over the limits.
+    """
+    max_cost = extras_setting("MAX_QUERY_COST")
+    max_depth = extras_setting("MAX_QUERY_DEPTH")
+    if max_cost is not None and cost > max_cost:
+        raise QueryCostError(
+            f"Query cost {cost} is over the limit of {max_cost}. "
+            "Ask for fewer rows with first / last."
+        )
+    if max_depth is not None and depth > max_depth:
+        raise QueryCostError(
+            f"Query depth {depth} is over the limit of {max_depth}."
+        )
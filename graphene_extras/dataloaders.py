@@ -0,0 +1,123 @@
+"""
+DataLoaders for the relations of DjangoObjectTypes.
+
+Selecting a foreign key over a list of nodes otherwise runs one query per
+node.  With a loader the keys of every node are collected and loaded in a
+single query, so a page of N nodes needs at most one query per relation.
+
+Loaders live on the context of the request (the django request for the
+GraphQLView) so every field of the request shares the same loaders and
+cache e.g.
+
+    class ProductNode(DjangoObjectType):
+        resolve_square = foreign_key_resolver(Product.square.field)
+
+On the event loop of the ASGI view the batches run in the thread pool (see
+async_execution).
+"""
+from collections import defaultdict
+
+from promise.dataloader import DataLoader
+
+from graphene_extras.async_execution import run_sync
+
+
+class ModelLoader(DataLoader):
+    """
+    Loads instances of model by the value of field, the pk by default.
+    """
+
+    def __init__(self, model, field='pk', **kwargs):
+        super().__init__(**kwargs)
+        self.model = model
+        self.field = field
+
+    def batch_load_fn(self, keys):
+        return run_sync(self.load_objs, keys)
+
+    def load_objs(self, keys):
+        objs = self.model._default_manager.in_bulk(
+            set(keys), field_name=self.field)
+        return [objs.get(key) for key in keys]
+
+
+class RelatedLoader(DataLoader):
+    """
+    Loads the lists of instances of the model of the foreign key field which
+    point at each key i.e. the reverse side of the foreign key.
+    """
+
+    def __init__(self, field, **kwargs):
+        super().__init__(**kwargs)
+        self.field = field
+
+    def batch_load_fn(self, keys):
+        return run_sync(self.load_objs, keys)
+
+    def load_objs(self, keys):
+        model = self.field.model
+        related = defaultdict(list)
+        objs = model._default_manager.filter(
+            **{f"{self.field.name}__in": set(keys)}).order_by('pk')
+        for obj in objs:
+            related[getattr(obj, self.field.attname)].append(obj)
+        return [related[key] for key in keys]
+
+
+def get_loader(info, key, factory):
+    """
+    The loader for key on the context of the request, made by factory if
+    this is the first time the request has needed it.
+    """
+    context = info.context
+    if context is None:
+        # nowhere to keep it e.g. schema.execute without a context
+        return factory()
+    loaders = getattr(context, 'dataloaders', None)
+    if loaders is None:
+        loaders = context.dataloaders = {}
+    if key not in loaders:
+        loaders[key] = factory()
+    return loaders[key]
+
+
+def foreign_key_resolver(field):
+    """
+    A resolver for the foreign key field (e.g. Product.square.field) which
+    batches the lookups of the related objects.
+    """
+    model = field.related_model
+    target = field.target_field.attname
+
+    def resolver(root, info, **kwargs):
+        # already fetched e.g. by select_related
+        if field.is_cached(root):
+            return field.get_cached_value(root)
+        value = getattr(root, field.attname)
+        if value is None:
+            return None
+        loader = get_loader(
+            info, ('fk', model, target), lambda: ModelLoader(model, target))
+        return loader.load(value)
+
+    return resolver
+
+
+def reverse_foreign_key_resolver(field):
+    """
+    A resolver for the reverse side of the foreign key field e.g.
+    Product.square.field for square.product_set.  Returns a list.
+    """
+    source = field.target_field.attname
+    cache_name = field.remote_field.get_cache_name()
+
+    def resolver(root, info, **kwargs):
+        # already fetched by prefetch_related
+        prefetched = getattr(root, '_prefetched_objects_cache', {})
+        if cache_name in prefetched:
+            return list(prefetched[cache_name])
+        loader = get_loader(
+            info, ('reverse_fk', field.model, field.name), lambda: RelatedLoader(field))
+        return loader.load(getattr(root, source))
+
+    return resolver
@@ -0,0 +1,73 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from graphene_django.settings import graphene_settings
+from graphql.error import GraphQLSyntaxError
+from graphql.language.base import parse
+from graphql.validation import validate
+
+from graphene_extras.persisted_queries import (client_query,
+                                               extract_operations, query_hash)
+from graphene_extras.settings import extras_setting
+
+"""
+Pulls the gql`...` operations out of the client sources and writes them to
+the persisted queries manifest so they are registered ahead of time.
+
+    python3 manage.py collect_persisted_queries
+
+Run it whenever the queries in client/ change, alongside the webpack build.
+The queries are written as the client sends them (see client_query); pass
+--no-typename for a client whose InMemoryCache has addTypename off.
+"""
+
+
+class Command(BaseCommand):
+    help = "Register the graphql operations in the client sources as persisted queries"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source',
+            default=str(Path(settings.BASE_DIR) / 'client'),
+            help="Directory of javascript sources to search"
+        )
+        parser.add_argument(
+            '--out',
+            default=extras_setting("PERSISTED_QUERIES_PATH"),
+            help="Manifest to write, PERSISTED_QUERIES_PATH by default"
+        )
+        parser.add_argument(
+            '--no-typename',
+            action='store_false',
+            dest='typename',
+            help="The client doesn't add __typename to its queries"
+        )
+
+    def handle(self, *args, **options):
+        if not options['out']:
+            raise CommandError(
+                "Set PERSISTED_QUERIES_PATH in GRAPHENE_EXTRAS or pass --out")
+
+        schema = graphene_settings.SCHEMA
+        manifest = {}
+
+        for path in sorted(Path(options['source']).rglob('*.js')):
+            for query in extract_operations(path.read_text()):
+                try:
+                    query = client_query(query, options['typename'])
+                    errors = validate(schema, parse(query))
+                except GraphQLSyntaxError as e:
+                    errors = [e]
+                if errors:
+                    self.stderr.write(self.style.WARNING(
+                        f"Skipping an operation in {path} - {errors[0]}"))
+                    continue
+                manifest[query_hash(query)] = query
+
+        with open(options['out'], 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+
+        self.stdout.write(
+            f"Wrote {len(manifest)} persisted queries to {options['out']}")
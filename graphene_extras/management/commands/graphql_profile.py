@@ -0,0 +1,115 @@
+import json
+import statistics
+from collections import defaultdict
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from graphene_extras.settings import extras_setting
+
+"""
+Summarises the profiles of graphql requests logged to PROFILING_LOG (see
+graphene_extras.profiling) - per operation the number of requests and their
+times, and the fields which took the most time or ran the most SQL, with
+how often each was an N+1.
+
+    python3 manage.py graphql_profile
+    python3 manage.py graphql_profile --operation LoadProducts --sort queries
+
+The rolled over files (PROFILING_LOG.1, .2, ...) are read too.
+"""
+
+SORTS = ("time", "db_time", "queries")
+
+
+def log_files(path):
+    path = Path(path)
+    backups = sorted(
+        path.parent.glob(f"{path.name}.*"),
+        key=lambda p: int(p.suffix[1:]) if p.suffix[1:].isdigit() else 0,
+        reverse=True
+    )
+    return [p for p in [*backups, path] if p.exists()]
+
+
+def read_profiles(paths):
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # e.g. a line cut short by a crash
+                    continue
+
+
+def ms(values):
+    return f"p50 {statistics.median(values):8.1f}ms  max {max(values):8.1f}ms"
+
+
+class Command(BaseCommand):
+    help = "Summarise the graphql profiles written to PROFILING_LOG"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths',
+            nargs='*',
+            help="Log files to read, PROFILING_LOG and its backups by default"
+        )
+        parser.add_argument('--operation', help="Only this operation")
+        parser.add_argument('--sort', choices=SORTS, default="time")
+        parser.add_argument('--top', type=int, default=15)
+
+    def handle(self, *args, **options):
+        paths = options['paths']
+        if not paths:
+            if not extras_setting("PROFILING_LOG"):
+                raise CommandError(
+                    "Set PROFILING_LOG in GRAPHENE_EXTRAS or pass the log files")
+            paths = log_files(extras_setting("PROFILING_LOG"))
+
+        requests = defaultdict(list)  # operation -> times
+        # (operation, path) -> totals
+        fields = defaultdict(lambda: defaultdict(float))
+        for profile in read_profiles(paths):
+            operation = profile.get("operation") or "(anonymous)"
+            if options['operation'] and operation != options['operation']:
+                continue
+            requests[operation].append(profile["time"])
+            for field in profile["fields"]:
+                totals = fields[operation, field["path"]]
+                totals["requests"] += 1
+                totals["calls"] += field["calls"]
+                totals["time"] += field["time"]
+                totals["db_time"] += field["db_time"]
+                totals["queries"] += field["queries"]
+            for found in profile["n_plus_one"]:
+                fields[operation, found["path"]]["n_plus_one"] += 1
+
+        if not requests:
+            self.stdout.write("No profiles")
+            return
+
+        for operation, times in sorted(requests.items()):
+            self.stdout.write(self.style.SUCCESS(
+                f"{operation}: {len(times)} requests  {ms(times)}"))
+            rows = [
+                (path, totals) for (op, path), totals in fields.items()
+                if op == operation
+            ]
+            rows.sort(key=lambda row: row[1][options['sort']], reverse=True)
+            for path, totals in rows[:options['top']]:
+                n = totals["requests"]
+                line = (
+                    f"  {path or '(outside resolvers)':<50}"
+                    f" {totals['time'] / n:8.2f}ms"
+                    f" {totals['queries'] / n:6.1f} queries"
+                    f" {totals['db_time'] / n:8.2f}ms db"
+                    f" {totals['calls'] / n:7.1f} calls"
+                )
+                if totals["n_plus_one"]:
+                    line += f"  N+1 in {totals['n_plus_one']:.0f} of {n:.0f}"
+                    self.stdout.write(self.style.WARNING(line))
+                else:
+                    self.stdout.write(line)
+            self.stdout.write("  (per request)")
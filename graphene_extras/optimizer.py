@@ -0,0 +1,153 @@
+"""
+Builds the queryset for a connection from what the query actually selects.
+
+    products {
+      edges {
+        node {
+          price
+          square { adUrl }
+        }
+      }
+    }
+
+only needs the price and square_id columns of the product, and the ad_url of
+the square which can be joined in with select_related.  So rather than load
+every column of every row -
+
+    qs = optimize_queryset(qs, info, ProductNode)
+
+Fields which are not model fields, e.g. start_ui, can say which columns their
+resolvers need with a field_dependencies dict on the node type -
+
+    class ProductNode(DjangoObjectType):
+        field_dependencies = {'start_ui': ('start',)}
+
+Reverse relations and many to many fields are prefetched.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from graphene import Dynamic
+from graphene.utils.str_converters import to_snake_case
+from graphene_django import DjangoObjectType
+from graphql.language.ast import FragmentSpread, InlineFragment
+
+
+def get_fields(selection_set, fragments):
+    """
+    The Field nodes of the selection set with any fragments expanded.
+    """
+    if selection_set is None:
+        return
+    for selection in selection_set.selections:
+        if isinstance(selection, FragmentSpread):
+            fragment = fragments[selection.name.value]
+            yield from get_fields(fragment.selection_set, fragments)
+        elif isinstance(selection, InlineFragment):
+            yield from get_fields(selection.selection_set, fragments)
+        else:
+            yield selection
+
+
+def get_child_fields(fields, name, fragments):
+    for field in fields:
+        if field.name.value == name:
+            yield from get_fields(field.selection_set, fragments)
+
+
+def get_node_fields(info):
+    """
+    The fields selected on the nodes of the connection being resolved.
+    """
+    fields = []
+    for field_ast in info.field_asts:
+        fields.extend(get_fields(field_ast.selection_set, info.fragments))
+    edges = list(get_child_fields(fields, 'edges', info.fragments))
+    return list(get_child_fields(edges, 'node', info.fragments))
+
+
+def get_node_type(node_type, name):
+    field = node_type._meta.fields.get(name)
+    if isinstance(field, Dynamic):
+        field = field.get_type()
+    if field is None:
+        return
+    _type = field.type
+    while hasattr(_type, 'of_type'):
+        _type = _type.of_type
+    if isinstance(_type, type) and issubclass(_type, DjangoObjectType):
+        return _type
+
+
+def plan(model, node_type, fields, fragments, prefix=''):
+    """
+    The only, select_related and prefetch_related lookups for the fields
+    selected on node_type.
+    """
+    only = set()
+    select_related = set()
+    prefetch_related = set()
+    dependencies = getattr(node_type, 'field_dependencies', {})
+
+    for selection in fields:
+        name = to_snake_case(selection.name.value)
+
+        if name in dependencies:
+            only.update(prefix + x for x in dependencies[name])
+            continue
+
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # id, pk and __typename only need the pk which is always loaded
+            continue
+
+        if field.many_to_one or (field.one_to_one and field.concrete):
+            only.add(prefix + field.name)
+            related_type = get_node_type(node_type, name)
+            if selection.selection_set is None or related_type is None:
+                continue
+            select_related.add(prefix + field.name)
+            _only, _select_related, _prefetch_related = plan(
+                field.related_model,
+                related_type,
+                list(get_fields(selection.selection_set, fragments)),
+                fragments,
+                prefix=f"{prefix}{field.name}__"
+            )
+            only |= _only
+            select_related |= _select_related
+            prefetch_related |= _prefetch_related
+        elif field.is_relation:
+            # reverse relations and many to many are a query of their own
+            # which a prefetch makes one query for all the rows
+            if not prefix:
+                prefetch_related.add(field.get_accessor_name()
+                                     if field.auto_created else field.name)
+        else:
+            only.add(prefix + field.name)
+
+    return only, select_related, prefetch_related
+
+
+def optimize_queryset(qs, info, node_type, extra_fields=()):
+    """
+    extra_fields are loaded whatever is selected e.g. the columns of the
+    sort which the cursors are built from.
+    """
+    only, select_related, prefetch_related = plan(
+        qs.model, node_type, get_node_fields(info), info.fragments)
+    for name in extra_fields:
+        # the pk is always loaded and anything across a relation is an
+        # annotation (see proper_cursors.cursor_accessors)
+        if name == 'pk' or '__' in name:
+            continue
+        try:
+            qs.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            continue
+        only.add(name)
+    qs = qs.only(*only) if only else qs.only(qs.model._meta.pk.name)
+    if select_related:
+        qs = qs.select_related(*sorted(select_related))
+    if prefetch_related:
+        qs = qs.prefetch_related(*sorted(prefetch_related))
+    return qs
@@ -0,0 +1,53 @@
+"""
+Counting every row which matches a filter is often more expensive than
+fetching the page itself.  So totals are cached for a short while; the
+staleness window is the TOTAL_COUNT_TIMEOUT setting (see graphene_extras.settings).
+A version, e.g. the generations of a response cache, can be part of the key
+so that a write starts a new count straight away.
+
+On postgres the planner's estimate for the size of an unfiltered table
+can be used instead of counting at all.
+"""
+import hashlib
+
+from django.core.cache import caches
+from django.db import connections
+
+from graphene_extras.settings import extras_setting
+
+
+def count_cache_key(qs, version=None):
+    sql, params = qs.query.sql_with_params()
+    signature = f"{qs.db}:{sql}:{params!r}:{version!r}"
+    return "total:" + hashlib.sha1(signature.encode('utf-8')).hexdigest()
+
+
+def approximate_count(qs):
+    """
+    The estimated number of rows in the table or None if there is not one
+    to be had i.e. the queryset is filtered or the database is not postgres.
+    """
+    connection = connections[qs.db]
+    if connection.vendor != 'postgresql' or qs.query.where:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+            [qs.model._meta.db_table]
+        )
+        row = cursor.fetchone()
+    # reltuples is -1 for a table which has never been analyzed
+    if row and row[0] >= 0:
+        return row[0]
+
+
+def cached_count(qs, approximate=False, version=None):
+    if approximate and (count := approximate_count(qs)) is not None:
+        return count
+    cache = caches[extras_setting("TOTAL_COUNT_CACHE")]
+    key = count_cache_key(qs, version)
+    count = cache.get(key)
+    if count is None:
+        count = qs.count()
+        cache.set(key, count, extras_setting("TOTAL_COUNT_TIMEOUT"))
+    return count
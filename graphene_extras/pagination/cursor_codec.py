@@ -0,0 +1,236 @@
+"""
+A compact binary format for the values in a proper cursor.
+
+Previously the values were run through str(), joined with "|" and base64
+encoded.  A "|" inside a value broke the cursor and every value came back
+as a string which django then had to parse again.  Here each value keeps
+its type -
+
+    byte 0          version
+    byte 1          flags (FLAG_SIGNED, FLAG_POSITION)
+    varint          number of values
+    per value       a one byte type tag followed by the payload
+    varint          the index of the row in the sort, only if FLAG_POSITION
+    16 bytes        HMAC of everything before it, only if FLAG_SIGNED
+
+Integers, dates, datetimes and durations are zigzag varints so small values
+take a byte or two.  The result is URL safe base64 without the padding.
+
+Cursors are signed with the SECRET_KEY when the SIGN_CURSORS setting is on.
+
+The position is only a hint, for page numbers (see ui.PaginationConnection);
+rows are always found by the values.  It is as of when the cursor was made
+so writes since can move it a little.
+"""
+import datetime
+import struct
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from decimal import Decimal
+
+from django.db.models import Model
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from graphene_extras.settings import extras_setting
+
+VERSION = 1
+
+FLAG_SIGNED = 1
+FLAG_POSITION = 2
+
+SIGNATURE_LENGTH = 16
+
+NONE = b"N"
+TRUE = b"T"
+FALSE = b"F"
+INT = b"i"
+FLOAT = b"f"
+DECIMAL = b"m"
+STRING = b"s"
+DATE = b"d"
+DATETIME = b"a"  # aware, stored as UTC
+NAIVE_DATETIME = b"t"
+DURATION = b"u"
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+UTC_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def write_varint(buffer, n):
+    # zigzag so negative numbers stay small
+    n = n * 2 if n >= 0 else -n * 2 - 1
+    while True:
+        byte = n & 0x7f
+        n >>= 7
+        if n:
+            buffer.append(byte | 0x80)
+        else:
+            buffer.append(byte)
+            return
+
+
+def read_varint(data, i):
+    n = shift = 0
+    while True:
+        if i >= len(data):
+            raise InvalidCursor("Cursor is truncated")
+        byte = data[i]
+        i += 1
+        n |= (byte & 0x7f) << shift
+        shift += 7
+        if not byte & 0x80:
+            return (n >> 1) ^ -(n & 1), i
+
+
+def write_bytes(buffer, b):
+    write_varint(buffer, len(b))
+    buffer.extend(b)
+
+
+def read_bytes(data, i):
+    length, i = read_varint(data, i)
+    if length < 0 or i + length > len(data):
+        raise InvalidCursor("Cursor is truncated")
+    return data[i:i + length], i + length
+
+
+def microseconds(delta):
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def write_value(buffer, value):
+    if isinstance(value, Model):
+        value = value.pk
+    if value is None:
+        buffer.extend(NONE)
+    elif value is True:
+        buffer.extend(TRUE)
+    elif value is False:
+        buffer.extend(FALSE)
+    elif isinstance(value, int):
+        buffer.extend(INT)
+        write_varint(buffer, value)
+    elif isinstance(value, float):
+        buffer.extend(FLOAT)
+        buffer.extend(struct.pack(">d", value))
+    elif isinstance(value, Decimal):
+        buffer.extend(DECIMAL)
+        write_bytes(buffer, str(value).encode("ascii"))
+    elif isinstance(value, str):
+        buffer.extend(STRING)
+        write_bytes(buffer, value.encode("utf-8"))
+    elif isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            buffer.extend(NAIVE_DATETIME)
+            write_varint(buffer, microseconds(value - EPOCH))
+        else:
+            buffer.extend(DATETIME)
+            write_varint(buffer, microseconds(value - UTC_EPOCH))
+    elif isinstance(value, datetime.date):
+        buffer.extend(DATE)
+        write_varint(buffer, value.toordinal())
+    elif isinstance(value, datetime.timedelta):
+        buffer.extend(DURATION)
+        write_varint(buffer, microseconds(value))
+    else:
+        raise TypeError(f"Cannot put a {type(value).__name__} in a cursor")
+
+
+def read_value(data, i):
+    tag = data[i:i + 1]
+    i += 1
+    if tag == NONE:
+        return None, i
+    if tag == TRUE:
+        return True, i
+    if tag == FALSE:
+        return False, i
+    if tag == INT:
+        return read_varint(data, i)
+    if tag == FLOAT:
+        if i + 8 > len(data):
+            raise InvalidCursor("Cursor is truncated")
+        return struct.unpack(">d", data[i:i + 8])[0], i + 8
+    if tag == DECIMAL:
+        b, i = read_bytes(data, i)
+        return Decimal(b.decode("ascii")), i
+    if tag == STRING:
+        b, i = read_bytes(data, i)
+        return b.decode("utf-8"), i
+    if tag == NAIVE_DATETIME:
+        n, i = read_varint(data, i)
+        return EPOCH + datetime.timedelta(microseconds=n), i
+    if tag == DATETIME:
+        n, i = read_varint(data, i)
+        return UTC_EPOCH + datetime.timedelta(microseconds=n), i
+    if tag == DATE:
+        n, i = read_varint(data, i)
+        return datetime.date.fromordinal(n), i
+    if tag == DURATION:
+        n, i = read_varint(data, i)
+        return datetime.timedelta(microseconds=n), i
+    raise InvalidCursor(f"Unknown type tag {tag!r} in cursor")
+
+
+def signature(payload):
+    return salted_hmac(
+        "graphene_extras.cursor", payload, algorithm="sha256"
+    ).digest()[:SIGNATURE_LENGTH]
+
+
+def encode_values(values, sign=None, position=None):
+    if sign is None:
+        sign = extras_setting("SIGN_CURSORS")
+    flags = (FLAG_SIGNED if sign else 0) | (FLAG_POSITION if position is not None else 0)
+    buffer = bytearray([VERSION, flags])
+    write_varint(buffer, len(values))
+    for value in values:
+        write_value(buffer, value)
+    if position is not None:
+        write_varint(buffer, position)
+    if sign:
+        buffer.extend(signature(bytes(buffer)))
+    return urlsafe_b64encode(bytes(buffer)).decode("ascii").rstrip("=")
+
+
+def decode_values(cursor):
+    return decode_cursor(cursor)[0]
+
+
+def decode_cursor(cursor):
+    """
+    (values, position) of the cursor, position being None if it has none.
+    """
+    try:
+        data = urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    except (TypeError, ValueError):
+        raise InvalidCursor("Cursor is not valid base64")
+    if len(data) < 2 or data[0] != VERSION:
+        raise InvalidCursor("Unknown cursor version")
+    flags = data[1]
+    if flags & FLAG_SIGNED:
+        data, sig = data[:-SIGNATURE_LENGTH], data[-SIGNATURE_LENGTH:]
+        if not constant_time_compare(sig, signature(data)):
+            raise InvalidCursor("Cursor signature does not match")
+    elif extras_setting("SIGN_CURSORS"):
+        raise InvalidCursor("Cursor is not signed")
+    count, i = read_varint(data, 2)
+    values = []
+    try:
+        for n in range(count):
+            value, i = read_value(data, i)
+            values.append(value)
+    except InvalidCursor:
+        raise
+    except (ValueError, ArithmeticError) as e:
+        raise InvalidCursor(str(e))
+    position = None
+    if flags & FLAG_POSITION:
+        position, i = read_varint(data, i)
+    if i != len(data):
+        raise InvalidCursor("Cursor has trailing data")
+    return values, position
@@ -0,0 +1,167 @@
+"""
+Proper cursors (see proper_cursors) for the page buttons of a connection.
+
+To load page 37 with a proper cursor the client needs the cursor of the
+last row of page 36.  Numbering every row from the start of the table to
+find it costs as much as an OFFSET, so the rows are numbered from the page
+being shown instead.  Its first row is the anchor; the rows after it, in
+the order of the sort, give the cursors of the pages after it and the rows
+before it, in the reverse order, those of the pages before it e.g. on page
+36 of 10 rows
+
+    SELECT * FROM (
+        SELECT price, id, ROW_NUMBER() OVER (ORDER BY price, id) AS _row_number
+        FROM squares_product WHERE (price, id) > (<anchor>) ORDER BY price, id
+        LIMIT 19
+    ) boundaries
+    WHERE _row_number IN (9, 19)
+
+reads the cursors of pages 37 and 38 - the rows at index 359 and 369, the
+anchor being row 350.  The last page is read the same way from the end of
+the table, a reverse sort and the total.  Each query reads at most a few
+pages of rows however deep the page is.
+
+The cursors can be cached for PAGE_CURSORS_TIMEOUT seconds in the django
+cache named by PAGE_CURSORS_CACHE, keyed by the SQL of the query - i.e.
+its filters, anchor and sort - and the rows asked for.  Off by default;
+writes move the boundaries and the cached cursors can be that many seconds
+stale.
+"""
+import hashlib
+
+from django.core.cache import caches
+from django.db import connections
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from graphene_extras.pagination.cursor_codec import encode_values
+from graphene_extras.pagination.proper_cursors import (attr_from_sort,
+                                                       cursor_columns,
+                                                       filter_queryset,
+                                                       reverse_sort)
+from graphene_extras.settings import extras_setting
+
+ROW_NUMBER = "_row_number"
+
+
+def window_order_by(sort):
+    return [
+        F(attr_from_sort(x)).desc() if x.startswith('-') else F(attr_from_sort(x)).asc()
+        for x in sort
+    ]
+
+
+def boundary_index(page, page_size):
+    # the index of the last row of the page before, None for the first page
+    if page > 1:
+        return (page - 1) * page_size - 1
+
+
+def page_cursors_cache_key(sql, params, row_numbers):
+    signature = f"{sql}:{params!r}:{row_numbers!r}"
+    return "page_cursors:" + hashlib.sha1(signature.encode('utf-8')).hexdigest()
+
+
+def numbered_values(qs, sort, order, row_numbers):
+    """
+    {key: cursor values} for row_numbers ({key: row number}) of qs, its
+    rows numbered from 1 in the order of order.  The values are for sort.
+    """
+    if not row_numbers:
+        return {}
+    annotations, names = cursor_columns(qs.model, tuple(sort))
+    numbered = qs.order_by(*order).annotate(
+        **annotations,
+        **{ROW_NUMBER: Window(RowNumber(), order_by=window_order_by(order))}
+    ).values_list(*names, ROW_NUMBER)[:max(row_numbers.values())]
+
+    connection = connections[qs.db]
+    compiler = numbered.query.get_compiler(qs.db)
+    sql, params = compiler.as_sql()
+    wanted = sorted(set(row_numbers.values()))
+
+    cache = None
+    if alias := extras_setting("PAGE_CURSORS_CACHE"):
+        cache = caches[alias]
+        key = page_cursors_cache_key(sql, params, wanted)
+        if (by_number := cache.get(key)) is not None:
+            return {k: by_number[n] for k, n in row_numbers.items() if n in by_number}
+
+    row_number = connection.ops.quote_name(ROW_NUMBER)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT * FROM ({sql}) boundaries "
+            f"WHERE boundaries.{row_number} IN ({', '.join(['%s'] * len(wanted))})",
+            (*params, *wanted)
+        )
+        rows = cursor.fetchall()
+
+    # the columns come back as selected - fields then annotations - and as
+    # the database stores them e.g. datetimes as strings on sqlite
+    converters = compiler.get_converters([col for col, _, _ in compiler.select])
+    if converters:
+        rows = compiler.apply_converters(rows, converters)
+    query = numbered.query
+    columns = [*query.extra_select, *query.values_select, *query.annotation_select]
+    positions = [columns.index(name) for name in names]
+    number = columns.index(ROW_NUMBER)
+
+    by_number = {row[number]: [row[i] for i in positions] for row in rows}
+    if cache is not None:
+        cache.set(key, by_number, extras_setting("PAGE_CURSORS_TIMEOUT"))
+    return {k: by_number[n] for k, n in row_numbers.items() if n in by_number}
+
+
+def page_cursors(qs, sort, page_size, around, last_page=None, total=None,
+                 start_index=0, start_cursor=None):
+    """
+    {page number: cursor} for the pages in around (a range of page numbers)
+    and last_page.  The cursor is the `after` which loads the page.  The
+    first page has no cursor so is never in the result, nor is a page past
+    the end.
+
+    start_index and start_cursor are of the first row of the page being
+    shown, the anchor.  Without a cursor the rows are numbered from the
+    start.  total, the number of rows in qs, is counted if not given.
+
+    The cursors carry the index of their row (see cursor_codec) so the page
+    they load knows its number without counting.
+    """
+    cursors = {}
+    values = {}
+    after, before = {}, {}
+    for page in around:
+        if (index := boundary_index(page, page_size)) is None:
+            continue
+        if start_cursor is None:
+            after[page] = index + 1
+        elif index > start_index:
+            after[page] = index - start_index
+        elif index < start_index:
+            before[page] = start_index - index
+        else:
+            cursors[page] = start_cursor
+
+    backwards = reverse_sort(sort)
+    if start_cursor is None:
+        values.update(numbered_values(qs, sort, sort, after))
+    else:
+        values.update(numbered_values(
+            filter_queryset(qs, start_cursor, sort), sort, sort, after))
+        values.update(numbered_values(
+            filter_queryset(qs, start_cursor, backwards), sort, backwards, before))
+
+    index = boundary_index(last_page, page_size) if last_page else None
+    if index is not None and last_page not in cursors:
+        if total is None:
+            total = qs.count()
+        if index < total:
+            # counted from the end the row is at most a page and one row
+            # away so only that much is read
+            values.update(numbered_values(
+                qs, sort, backwards, {last_page: total - index}))
+
+    for page, page_values in values.items():
+        cursors[page] = encode_values(
+            page_values, position=boundary_index(page, page_size))
+    return cursors
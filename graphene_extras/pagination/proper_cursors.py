@@ -1,13 +1,17 @@
-import datetime
 import operator
-from base64 import b64decode as _unbase64
-from base64 import b64encode as _base64
-from functools import reduce
-from base64 import b64decode, b64encode
+from functools import lru_cache, reduce
 
-from django.db.models import Q
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections
+from django.db.models import BooleanField, Expression, F, Field, Func, Q, Value
 
 from graphene import relay
+from graphene_django.settings import graphene_settings
+from graphene_extras.pagination.cursor_codec import (InvalidCursor,
+                                                     decode_cursor,
+                                                     decode_values,
+                                                     encode_values)
+from graphene_extras.settings import extras_setting
 from graphql_relay.connection import connectiontypes
 
 """
@@ -22,12 +26,9 @@ ordering field.
 """
 
 
-def base64(s):
-    return _base64(s.encode('utf-8')).decode('utf-8')
-
-
-def unbase64(s):
-    return _unbase64(s).decode('utf-8')
+# the sorts are chosen by the client (orderBy) so the caches of anything
+# worked out per sort are bounded
+SORT_CACHE_SIZE = 256
 
 
 def get_attribute(instance, name):
@@ -52,49 +53,80 @@ def attr_from_sort(sort):
     return sort
 
 
-def build_q_objects(sort, cursor_parts):
+def equal_to(attr, value):
+    if value is None:
+        return Q(**{f"{attr}__isnull": True})
+    return Q(**{attr: value})
+
+
+def after(attr, value, descending, nullable=False, nulls_largest=False):
+    """
+    The rows which come after value in a column sorted in that direction.
+    NULLs sort as the database sorts them - as the smallest values (sqlite,
+    mysql) or the largest (postgres, see nulls_order_largest) - so they
+    come first or last depending on the direction.
+    """
+    nulls_last = nulls_largest != descending
+    if value is None:
+        # after the NULLs come either all of the values or nothing
+        if nulls_last:
+            return Q(pk__in=[])
+        return Q(**{f"{attr}__isnull": False})
+    q = Q(**{f"{attr}__{'lt' if descending else 'gt'}": value})
+    if nullable and nulls_last:
+        q |= Q(**{f"{attr}__isnull": True})
+    return q
+
+
+def build_q_objects(sort, cursor_parts, nullable=(), nulls_largest=False):
     # Initially I found the mathematics here confusing
     # See explanation below marked *
+    # nullable are the attrs which may be NULL (see nullable_attrs)
     attr = attr_from_sort(sort[-1])
-    sort_direction = 'lt' if sort[-1][0] == '-' else 'gt'
 
-    kwargs = {
-        f"{attr}__{sort_direction}": cursor_parts[attr],
-    }
+    q = after(
+        attr,
+        cursor_parts[attr],
+        sort[-1][0] == '-',
+        attr in nullable,
+        nulls_largest
+    )
 
     for x in sort[0:-1]:
         x_attr = attr_from_sort(x)
-        kwargs[x_attr] = cursor_parts[x_attr]
-
-    q = Q(**kwargs)
+        q &= equal_to(x_attr, cursor_parts[x_attr])
 
     if len(sort) == 1:
         return [q]
 
-    acc = build_q_objects(sort[0: -1], cursor_parts)
+    acc = build_q_objects(sort[0: -1], cursor_parts, nullable, nulls_largest)
     acc.append(q)
 
     return acc
 
 
 def cursor_string_from_parts(parts, sort):
-    bits = []
-
-    for x in sort:
-        attr = attr_from_sort(x)
-        bits.append(parts[attr])
-
-    return base64('|'.join(bits))
+    return encode_values([parts[attr_from_sort(x)] for x in sort])
 
 
 def parts_from_cursor_string(cursor, sort):
-    cursor_parts = {}
-    bits = unbase64(cursor).split('|')
+    # the values come back typed (see cursor_codec) so they can go
+    # straight into a filter
+    values = decode_values(cursor)
+    if len(values) != len(sort):
+        raise InvalidCursor("Cursor does not match the sort")
+    return {
+        attr_from_sort(x): value
+        for x, value in zip(sort, values)
+    }
 
-    for i, x in enumerate(sort):
-        cursor_parts[attr_from_sort(x)] = bits[i]
 
-    return cursor_parts
+def cursor_position(cursor):
+    """
+    The index of the cursor's row in the sort if the cursor says (see
+    cursor_codec), otherwise None.
+    """
+    return decode_cursor(cursor)[1]
 
 
 def cursor_string_from_obj(obj, sort):
@@ -102,24 +134,306 @@ def cursor_string_from_obj(obj, sort):
 
     for x in sort:
         attr_name = attr_from_sort(x)
-        attr = get_attribute(obj, attr_name)
+        cursor_parts[attr_name] = get_attribute(obj, attr_name)
 
-        if isinstance(attr, datetime.datetime):
-            attr = attr.isoformat()
-        else:
-            attr = str(attr)
+    return cursor_string_from_parts(cursor_parts, sort)
 
-        cursor_parts[attr_name] = attr
 
-    return cursor_string_from_parts(cursor_parts, sort)
+@lru_cache(maxsize=SORT_CACHE_SIZE)
+def cursor_columns(model, sort):
+    """
+    The annotations to add to a queryset of model and the names to read
+    the cursor values for sort (a tuple) from.  Columns of the model itself
+    are read from their attname.  Anything across a relation is selected as
+    an annotation so reading it never triggers a query.
+    """
+    annotations = {}
+    names = []
+    for i, x in enumerate(sort):
+        attr = attr_from_sort(x)
+        if attr == 'pk':
+            names.append(model._meta.pk.attname)
+            continue
+        if "__" not in attr:
+            try:
+                field = model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                # an annotation on the queryset
+                names.append(attr)
+                continue
+            if field.concrete:
+                names.append(field.attname)
+                continue
+        alias = f"_cursor_{i}"
+        annotations[alias] = F(attr)
+        names.append(alias)
+    return annotations, tuple(names)
+
+
+@lru_cache(maxsize=SORT_CACHE_SIZE)
+def cursor_accessors(model, sort):
+    """
+    How to read the cursor values for sort (a tuple) off the rows of a
+    queryset of model without walking attributes.
+
+    Returns the annotations to add to the queryset and a function which
+    takes a row and returns its cursor values.
+    """
+    annotations, names = cursor_columns(model, sort)
+    getter = operator.attrgetter(*names)
+    if len(names) == 1:
+        return annotations, lambda row: [getter(row)]
+    return annotations, getter
+
+
+def is_nullable(model, attr):
+    """
+    Whether the column sorted by may be NULL, including through a nullable
+    foreign key (a LEFT JOIN) or a reverse relation.
+    """
+    for name in attr.split("__"):
+        if name == 'pk':
+            return False
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # an annotation, which could be anything
+            return True
+        if field.null or field.one_to_many or field.many_to_many:
+            return True
+        if field.is_relation:
+            model = field.related_model
+    return False
+
+
+@lru_cache(maxsize=SORT_CACHE_SIZE)
+def nullable_attrs(model, sort):
+    return frozenset(
+        attr for attr in map(attr_from_sort, sort) if is_nullable(model, attr))
+
+
+def get_field(model, name):
+    names = name.split("__")
+    for name in names[:-1]:
+        model = model._meta.get_field(name).related_model
+    name = names[-1]
+    if name == 'pk':
+        return model._meta.pk
+    return model._meta.get_field(name)
+
+
+class RowValue(Func):
+    template = '(%(expressions)s)'
+
+    def __init__(self, *expressions):
+        super().__init__(*expressions, output_field=Field())
+
+
+class RowValueComparison(Expression):
+    """
+    (a, b, pk) > (x, y, z)
+
+    Equivalent to the OR of ANDs from build_q_objects when every column is
+    sorted in the same direction and none can be NULL - any NULL makes the
+    comparison NULL, i.e. false.  Unlike the OR expansion the planner can
+    use this as the start of a single range scan over a composite index.
+    """
+    conditional = True
+
+    def __init__(self, lhs, operator, rhs):
+        super().__init__(output_field=BooleanField())
+        self.lhs = lhs
+        self.operator = operator
+        self.rhs = rhs
+
+    def get_source_expressions(self):
+        return [self.lhs, self.rhs]
+
+    def set_source_expressions(self, exprs):
+        self.lhs, self.rhs = exprs
+
+    def as_sql(self, compiler, connection):
+        lhs_sql, lhs_params = compiler.compile(self.lhs)
+        rhs_sql, rhs_params = compiler.compile(self.rhs)
+        return f"{lhs_sql} {self.operator} {rhs_sql}", [*lhs_params, *rhs_params]
+
+
+def supports_row_values(connection):
+    if connection.vendor == 'sqlite':
+        # row values were added in sqlite 3.15
+        return connection.Database.sqlite_version_info >= (3, 15, 0)
+    return connection.vendor in ('postgresql', 'mysql')
+
+
+def has_single_direction(sort):
+    return len({x[0] == '-' for x in sort}) == 1
 
 
-def filter_queryset(qs, cursor, sort):
+def build_row_value_comparison(model, sort, cursor_parts):
+    attrs = [attr_from_sort(x) for x in sort]
+    return RowValueComparison(
+        RowValue(*[F(attr) for attr in attrs]),
+        '<' if sort[0][0] == '-' else '>',
+        RowValue(*[
+            Value(cursor_parts[attr], output_field=get_field(model, attr))
+            for attr in attrs
+        ])
+    )
+
+
+def filter_queryset(qs, cursor, sort, row_values=None):
+    """
+    row_values forces the row value comparison on or off.  By default it is
+    used whenever the sort and the database allow.
+    """
     cursor_parts = parts_from_cursor_string(cursor, sort)
-    q_objects = build_q_objects(sort, cursor_parts)
+    connection = connections[qs.db]
+    nullable = nullable_attrs(qs.model, tuple(sort))
+    if row_values is None:
+        row_values = (
+            extras_setting("ROW_VALUE_CURSORS")
+            and has_single_direction(sort)
+            and not nullable
+            and supports_row_values(connection)
+        )
+    if row_values:
+        return qs.filter(build_row_value_comparison(qs.model, sort, cursor_parts))
+    q_objects = build_q_objects(
+        sort, cursor_parts, nullable, connection.features.nulls_order_largest)
     return qs.filter(reduce(operator.__or__, q_objects))
 
 
+def reverse_sort(sort):
+    return [attr_from_sort(x) if x[0] == '-' else f"-{x}" for x in sort]
+
+
+def rows_before_cursor(qs, cursor, sort):
+    return filter_queryset(qs, cursor, reverse_sort(sort))
+
+
+def count_before_cursor(qs, cursor, sort):
+    """
+    The number of rows which come before the cursor i.e. the offset of the
+    row the cursor was made from.
+    """
+    return rows_before_cursor(qs, cursor, sort).count()
+
+
+def limit_page_size(args, name):
+    """
+    The args with first defaulting to, and first / last capped at,
+    RELAY_CONNECTION_MAX_LIMIT like graphene_django's connection fields.
+    """
+    max_limit = graphene_settings.RELAY_CONNECTION_MAX_LIMIT
+    if not max_limit:
+        return args
+    for arg in ('first', 'last'):
+        if (value := args.get(arg)) is not None and value > max_limit:
+            raise ValueError(
+                f"Requesting {value} records on the `{name}` connection exceeds "
+                f"the `{arg}` limit of {max_limit} records."
+            )
+    if not args.get('first') and not args.get('last'):
+        args = {**args, 'first': max_limit}
+    return args
+
+
+def connection_from_queryset(qs, args, sort, connection_type, edge_type=None, pageinfo_type=None):
+    """
+    The queryset equivalent of graphql_relay's connection_from_list.  Rather
+    than an OFFSET the `after` and `before` cursors become filters on the
+    sort values so each page is a range scan.
+
+    For `last` the sort is flipped so the database still only reads the page
+    from the `before` cursor backwards.  The rows are put back in the order
+    of the sort in memory.
+
+    qs must already be ordered by sort.
+    """
+    edge_type = edge_type or connectiontypes.Edge
+    pageinfo_type = pageinfo_type or relay.PageInfo
+
+    first = args.get('first')
+    last = args.get('last')
+    after = args.get('after')
+    before = args.get('before')
+
+    if after:
+        qs = filter_queryset(qs, after, sort)
+
+    if before:
+        qs = filter_queryset(qs, before, reverse_sort(sort))
+
+    if last:
+        qs = qs.order_by(*reverse_sort(sort))
+
+    annotations, get_cursor_values = cursor_accessors(qs.model, tuple(sort))
+    if annotations:
+        qs = qs.annotate(**annotations)
+
+    # Rather than count the rows we fetch one more than the page size.
+    # If it comes back there is another page.
+    limit = first or last
+    if limit:
+        qs = qs[:limit + 1]
+
+    nodes = list(qs.iterator())
+    has_more = bool(limit) and len(nodes) > limit
+    if has_more:
+        nodes = nodes[:limit]
+
+    if last:
+        nodes.reverse()
+
+    # the index of the first node, carried by the cursors so the page
+    # number needs no count (see ui.PaginationConnection)
+    start = None
+    if last:
+        if before and (position := cursor_position(before)) is not None:
+            start = max(position - len(nodes), 0)
+    elif not after:
+        start = 0
+    elif (position := cursor_position(after)) is not None:
+        start = position + 1
+
+    edges = [
+        edge_type(
+            node=node,
+            cursor=encode_values(
+                list(get_cursor_values(node)),
+                position=None if start is None else start + i)
+        )
+        for i, node in enumerate(nodes)
+    ]
+
+    first_edge_cursor = edges[0].cursor if edges else None
+    last_edge_cursor = edges[-1].cursor if edges else None
+
+    if last:
+        has_previous_page = has_more
+        has_next_page = bool(before)
+    else:
+        # the spec allows has_previous_page to be true just because there
+        # is an after cursor.  That saves a query.
+        has_previous_page = bool(after)
+        has_next_page = has_more
+
+    page_info = pageinfo_type(
+        start_cursor=first_edge_cursor,
+        end_cursor=last_edge_cursor,
+        has_previous_page=has_previous_page,
+        has_next_page=has_next_page,
+    )
+
+    connection = connection_type(
+        edges=edges,
+        page_info=page_info,
+    )
+    if start is not None:
+        connection.start_index = start
+    return connection
+
+
 class QuerysetConnectionField(relay.ConnectionField):
     def __init__(self, type, *args, **kwargs):
         return_value = super().__init__(
@@ -140,55 +454,32 @@ class QuerysetConnectionField(relay.ConnectionField):
         if hasattr(connection_type, 'of_type'):
             connection_type = connection_type.of_type
 
-        first = args.get('first')
-        last = args.get('last')
-        after = args.get('after')
-        # before = args.get('before')
         sort = connection_type.get_sort(**args)
 
         # Validate connection arguments
+        args = limit_page_size(args, info.field_name)
+        first = args.get('first')
+        last = args.get('last')
         assert first or last, (
             'You must provide a `first` or `last` value to properly paginate the `{}` connection.'
         ).format(info.field_name)
         assert not (first and last), (
             'You cannot define both `first` and `last` values on `{}` connection.'
         ).format(info.field_name)
-        assert not last, 'last` argument is not supported'
 
         qs = connection_type.get_queryset(root, info, **args).order_by(*sort)
 
-        if after:
-            qs = filter_queryset(qs, after, sort)
-
-        total_length = qs.count()
-
-        if first:
-            qs = qs[:first]
-
-        edge_type = connection_type.Edge or connectiontypes.Edge
-
-        edges = [
-            edge_type(
-                node=node,
-                cursor=cursor_string_from_obj(node, sort)
-            )
-            for node in qs.iterator()
-        ]
-
-        first_edge_cursor = edges[0].cursor if edges else None
-        last_edge_cursor = edges[-1].cursor if edges else None
-
-        page_info = relay.PageInfo(
-            start_cursor=first_edge_cursor,
-            end_cursor=last_edge_cursor,
-            has_previous_page=False,  # TODO
-            has_next_page=isinstance(first, int) and (total_length > first),
-        )
-
-        return connection_type(
-            edges=edges,
-            page_info=page_info,
+        connection = connection_from_queryset(
+            qs,
+            args,
+            sort,
+            connection_type=connection_type,
+            edge_type=connection_type.Edge,
+            pageinfo_type=relay.PageInfo,
         )
+        connection.iterable = qs
+        connection.sort = sort
+        return connection
 
 
 """
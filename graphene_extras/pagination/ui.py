@@ -1,11 +1,19 @@
 """
 This module helps with implementing pagination buttons in the UI
 """
+import threading
 from base64 import b64decode, b64encode
 
 import graphene
 from django.db.models.query import QuerySet
 
+from graphene_extras.pagination.counts import cached_count
+from graphene_extras.pagination.page_cursors import page_cursors
+from graphene_extras.pagination.proper_cursors import rows_before_cursor
+
+# the pageSize of pages when it isn't given
+DEFAULT_PAGE_SIZE = 10
+
 
 class PageCursor(graphene.ObjectType):
     cursor = graphene.String()
@@ -27,7 +35,10 @@ def decode_cursor(cursor):
         decoded_cursor = b64decode(cursor.encode('ascii')).decode('utf8')
         # e.g. 'arrayconnection:0'
         # we just want the index
-        i = decoded_cursor.split(':')[1]
+        # anything else, e.g. a proper cursor, is not an offset cursor
+        if not decoded_cursor.startswith(PREFIX):
+            return
+        i = decoded_cursor[len(PREFIX):]
         return int(i)
     except (TypeError, ValueError):
         pass
@@ -75,54 +86,107 @@ class PaginationConnection(graphene.relay.Connection):
         abstract = True
     pages = graphene.Field(PageCursors, pageSize=graphene.Int())
     # page_size will force a reload and put the user back to page 1
-    total = graphene.Int()
+    # the count is cached; approximate allows an estimate for unfiltered tables
+    total = graphene.Int(approximate=graphene.Boolean())
     form_errors = graphene.List(FormError)
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # total and pages may be resolved at the same time (see async_execution)
+        self.total_lock = threading.Lock()
+
+    def get_total(self):
+        """
+        The number of rows in the whole (filtered) queryset.  Counted once
+        for both total and pages.
+        """
+        with self.total_lock:
+            if getattr(self, 'total_count', None) is None:
+                self.total_count = cached_count(
+                    self.iterable, version=getattr(self, 'count_version', None))
+            return self.total_count
+
+    def get_start_index(self):
+        """
+        The index of the first row of the page.
+        """
+        # known without a query e.g. for the first page, from the position
+        # in a proper cursor (see proper_cursors) or an offset cursor
+        if (index := getattr(self, 'start_index', None)) is not None:
+            return index
+        cursor = self.page_info.start_cursor
+        index = decode_cursor(cursor)
+        if index is None:
+            # a proper cursor without a position e.g. of a page loaded by
+            # last alone, so count the rows before it, cached like the total
+            index = cached_count(
+                rows_before_cursor(self.iterable, cursor, self.sort),
+                version=getattr(self, 'count_version', None))
+        return index
+
     def get_page_number(self, index, page_size):
         return index // page_size + 1
 
-    def get_page_cursor(self, page, is_current, page_size):
-        if i := page_to_index(page, page_size):
-            # cursor needs to be the index of the last item on the previous page
-            c = create_cursor(i)
+    def get_page_cursor(self, page, is_current, page_size, cursors):
+        if page_to_index(page, page_size):
+            # cursor needs to be the last item on the previous page, None
+            # if the page has gone since the total was counted
+            c = cursors.get(page)
         else:
             c = ""  # first page needs to be empty string i.e. get first X items from beginning / ""
         return PageCursor(cursor=c, page_number=page, is_current=is_current)
 
-    def get_page_cursors(self, first_page, last_page, previous_page, around_pages, current_page, page_size):
+    def get_page_cursors(self, first_page, last_page, previous_page, around_pages, current_page, page_size, cursors):
         if first_page:
             first_page = PageCursor(
                 cursor="", page_number=first_page, is_current=current_page == first_page)
         if last_page:
             last_page = self.get_page_cursor(
-                last_page, last_page == current_page, page_size)
+                last_page, last_page == current_page, page_size, cursors)
         if previous_page:
             previous_page = self.get_page_cursor(
-                previous_page, previous_page == current_page, page_size)
+                previous_page, previous_page == current_page, page_size, cursors)
         if around_pages:
             around_pages_ = []
             for p in around_pages:
                 around_pages_.append(self.get_page_cursor(
-                    p, p == current_page, page_size))
+                    p, p == current_page, page_size, cursors))
             around_pages = around_pages_
         return PageCursors(first=first_page, last=last_page, around=around_pages, previous=previous_page)
 
     def get_pages(self, page_size, current_page_start_cursor, current_page_end_cursor, queryset):
         if not current_page_end_cursor:
             return
-        current_page_start_index = decode_cursor(current_page_start_cursor)
-        current_page = self.get_page_number(
-            current_page_start_index, page_size)
+        start_index = self.get_start_index()
+        current_page = self.get_page_number(start_index, page_size)
         first_page = 1
         # queryset should be the whole filtered or unfiltered set (before slice is taken)
-        last_page = self.get_page_number(len(queryset) - 1, page_size)
+        total = self.get_total()
+        last_page = max(self.get_page_number(total - 1, page_size), 1)
+        # a position from before rows were deleted can be past the end
+        current_page = min(current_page, last_page)
         previous_page = current_page - 1 if current_page > 1 else None
         around_pages = []
         for i in range(-2, 3):
             if (current_page + i >= 1
                     and current_page + i <= last_page):
                 around_pages.append(current_page + i)
-        return self.get_page_cursors(first_page, last_page, previous_page, around_pages, current_page, page_size)
+        if getattr(self, 'sort', None) is None:
+            # a plain relay connection e.g. PaginatePeopleConnection, its
+            # cursors are offsets
+            cursors = {
+                page: create_cursor(page_to_index(page, page_size))
+                for page in [*around_pages, last_page]
+            }
+        else:
+            # Proper cursors for the pages around this one (which includes
+            # the previous page) and the last page, read from this page's
+            # first row and the end of the table (see page_cursors)
+            cursors = page_cursors(
+                queryset, self.sort, page_size, around_pages, last_page,
+                total=total, start_index=start_index,
+                start_cursor=current_page_start_cursor)
+        return self.get_page_cursors(first_page, last_page, previous_page, around_pages, current_page, page_size, cursors)
 
     def resolve_pages(self, info, **kwargs):
         # Note that page_size is an argument for pages which is on the connection field
@@ -130,13 +194,17 @@ class PaginationConnection(graphene.relay.Connection):
         # along with the other parameters for peoplePages
         page_info = self.page_info
         queryset = self.iterable
-        page_size = kwargs.get('pageSize', 10)
+        page_size = kwargs.get('pageSize', DEFAULT_PAGE_SIZE)
+        if page_size < 1:
+            raise ValueError("pageSize must be at least 1")
         return self.get_pages(page_size, page_info.start_cursor, page_info.end_cursor, queryset)
 
-    def resolve_total(self, info, *args, **kwargs):
-        page_info = self.page_info
-        q = self.iterable
-        return q.count()
+    def resolve_total(self, info, approximate=False, **kwargs):
+        if approximate and getattr(self, 'total_count', None) is None:
+            return cached_count(
+                self.iterable, approximate=True,
+                version=getattr(self, 'count_version', None))
+        return self.get_total()
 
     def resolve_form_errors(self, info):
         form_errors_dict = self.form_errors
@@ -0,0 +1,165 @@
+"""
+Persisted queries keyed by the sha256 of the query text.
+
+A client can send just the hash instead of the query, in the way of Apollo's
+automatic persisted queries -
+
+    {"extensions": {"persistedQuery": {"version": 1, "sha256Hash": "<hash>"}}}
+
+The queries of the react apps are registered ahead of time in a manifest
+written by
+
+    python3 manage.py collect_persisted_queries
+
+The manifest holds each query as @apollo/client sends it (see client_query)
+- with __typename added by the InMemoryCache and printed by graphql-js - so
+its hashes, and the documents the view caches from it, are of the text the
+client actually sends.
+
+Any other query is registered the first time it is sent along with its hash
+unless the PERSISTED_QUERIES_ONLY setting is on, in which case only the
+queries in the manifest can be run at all.  The last PERSISTED_QUERIES_SIZE
+of those are kept.
+"""
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+
+from graphql.language import ast
+from graphql.language.parser import parse
+from graphql.language.printer import PrintingVisitor, indent, join, wrap
+from graphql.language.visitor import visit
+
+from graphene_extras.settings import extras_setting
+
+# graphql-js breaks the arguments of a field longer than this over lines
+MAX_LINE_LENGTH = 80
+
+# gql`...` in the client sources
+GQL_TEMPLATE = re.compile(r"gql`(.*?)`", re.DOTALL)
+
+
+def query_hash(query):
+    return hashlib.sha256(query.encode('utf-8')).hexdigest()
+
+
+def extract_operations(source):
+    """
+    The query text of each gql template literal in the javascript source.
+    """
+    return [m.strip() + "\n" for m in GQL_TEMPLATE.findall(source)]
+
+
+def add_typename(selection_set, parent=None):
+    """
+    Adds __typename to the selection sets as apollo's InMemoryCache does
+    (addTypenameToDocument) - to all but those of operations, those which
+    already select it or another __ field, and those of fields @export-ed.
+    """
+    if selection_set is None:
+        return
+    for selection in selection_set.selections:
+        add_typename(getattr(selection, 'selection_set', None), selection)
+    if isinstance(parent, ast.OperationDefinition):
+        return
+    if any(isinstance(selection, ast.Field) and selection.name.value.startswith('__')
+           for selection in selection_set.selections):
+        return
+    if isinstance(parent, ast.Field) and any(
+            directive.name.value == 'export' for directive in parent.directives or ()):
+        return
+    selection_set.selections.append(ast.Field(name=ast.Name(value='__typename')))
+
+
+class ClientPrintingVisitor(PrintingVisitor):
+    """
+    Prints a document as graphql-js 15's print does, which is what apollo
+    sends.  graphql-core's printer follows an older graphql-js.
+    """
+    __slots__ = ()
+
+    def leave_Field(self, node, *args):
+        prefix = wrap("", node.alias, ": ") + node.name
+        args_line = prefix + wrap("(", join(node.arguments, ", "), ")")
+        if len(args_line) > MAX_LINE_LENGTH:
+            args_line = prefix + wrap("(\n", indent(join(node.arguments, "\n")), "\n)")
+        return join([args_line, join(node.directives, " "), node.selection_set], " ")
+
+    def leave_StringValue(self, node, *args):
+        # JSON.stringify
+        return json.dumps(node.value, ensure_ascii=False)
+
+    def leave_InlineFragment(self, node, *args):
+        return join(
+            [
+                "...",
+                wrap("on ", node.type_condition),
+                join(node.directives, " "),
+                node.selection_set,
+            ],
+            " ",
+        )
+
+
+def client_query(query, typename=True):
+    """
+    The text of the query as @apollo/client 3 sends it - parsed, with
+    __typename added (unless the cache has addTypename off) and printed.
+    """
+    document = parse(query)
+    if typename:
+        for definition in document.definitions:
+            add_typename(definition.selection_set, definition)
+    return visit(document, ClientPrintingVisitor())
+
+
+class PersistedQueries:
+    def __init__(self):
+        self.queries = None
+        # sent by clients (see register), least recently used first
+        self.registered = OrderedDict()
+        self.lock = threading.Lock()
+
+    def load(self):
+        queries = {}
+        if path := extras_setting("PERSISTED_QUERIES_PATH"):
+            try:
+                with open(path) as f:
+                    queries = json.load(f)
+            except FileNotFoundError:
+                pass
+        return queries
+
+    def manifest(self):
+        # call holding the lock
+        if self.queries is None:
+            self.queries = self.load()
+        return self.queries
+
+    def all(self):
+        """
+        The queries of the manifest.
+        """
+        with self.lock:
+            return dict(self.manifest())
+
+    def get(self, sha256_hash):
+        with self.lock:
+            if (query := self.manifest().get(sha256_hash)) is not None:
+                return query
+            query = self.registered.get(sha256_hash)
+            if query is not None:
+                self.registered.move_to_end(sha256_hash)
+            return query
+
+    def register(self, sha256_hash, query):
+        with self.lock:
+            self.registered[sha256_hash] = query
+            self.registered.move_to_end(sha256_hash)
+            while len(self.registered) > extras_setting("PERSISTED_QUERIES_SIZE"):
+                self.registered.popitem(last=False)
+
+
+persisted_queries = PersistedQueries()
@@ -0,0 +1,232 @@
+"""
+Profiles graphql requests - where the time went, field by field.
+
+With PROFILING on, every request to the graphql views records
+
+    each field (by its path without the list indexes e.g.
+    viewer.products.edges.node.square) - how many times it was resolved
+    and how long its resolver took
+    the SQL each field ran and how long each statement took
+    N+1s - a field running the same statement PROFILING_N_PLUS_ONE or more
+    times, e.g. once for every node of a page
+
+and adds it to the extensions of the response e.g.
+
+    "extensions": {
+        "profile": {
+            "time": 41.2,
+            "fields": [
+                {"path": "viewer.products", "calls": 1, "time": 12.1,
+                 "queries": 1, "db_time": 9.8, "sql": [...]},
+                ...
+            ],
+            "n_plus_one": [
+                {"path": "viewer.products.edges.node.square", "count": 20,
+                 "sql": "SELECT ... WHERE id = %s"}
+            ]
+        }
+    }
+
+Times are in milliseconds.  A resolver which returns a promise, e.g. one
+which uses a DataLoader, is timed until the promise resolves.  SQL run
+outside of any resolver, e.g. the batches of DataLoaders under WSGI, is put
+against the path "".
+
+With PROFILING_LOG set to a path each profile is also written to that file
+as a line of JSON, the file rolled over at PROFILING_LOG_BYTES and
+PROFILING_LOG_BACKUPS kept.  manage.py graphql_profile summarises the log.
+
+It costs a middleware call for every field so is for finding out why a
+query is slow rather than for always being on.
+"""
+import json
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+
+from promise import Promise
+
+from graphene_extras.settings import extras_setting
+
+current_profile = ContextVar("graphene_extras_profile", default=None)
+# the path of the field being resolved
+current_path = ContextVar("graphene_extras_profile_path", default="")
+
+logger = logging.getLogger("graphene_extras.profiling")
+_log_lock = threading.Lock()
+_log_path = None
+
+
+def field_path(info):
+    return ".".join(str(x) for x in info.path if not isinstance(x, int))
+
+
+class FieldProfile:
+    def __init__(self):
+        self.calls = 0
+        self.time = 0.0
+        self.sql = []  # (sql, seconds)
+
+
+class RequestProfile:
+    def __init__(self):
+        self.fields = defaultdict(FieldProfile)
+        self.lock = threading.Lock()
+        self.start = time.perf_counter()
+        self.time = None
+
+    def add_call(self, path, elapsed):
+        with self.lock:
+            field = self.fields[path]
+            field.calls += 1
+            field.time += elapsed
+
+    def add_query(self, path, sql, elapsed):
+        with self.lock:
+            self.fields[path].sql.append((sql, elapsed))
+
+    def finish(self):
+        self.time = time.perf_counter() - self.start
+
+    def n_plus_one(self):
+        threshold = extras_setting("PROFILING_N_PLUS_ONE")
+        found = []
+        for path, field in self.fields.items():
+            for sql, count in Counter(sql for sql, elapsed in field.sql).items():
+                if count >= threshold:
+                    found.append({"path": path, "count": count, "sql": sql})
+        return found
+
+    def as_dict(self):
+        fields = []
+        for path, field in self.fields.items():
+            fields.append({
+                "path": path,
+                "calls": field.calls,
+                "time": round(field.time * 1000, 3),
+                "queries": len(field.sql),
+                "db_time": round(sum(e for s, e in field.sql) * 1000, 3),
+                "sql": [
+                    {"sql": sql, "time": round(elapsed * 1000, 3)}
+                    for sql, elapsed in field.sql
+                ],
+            })
+        fields.sort(key=lambda f: (f["time"] + f["db_time"]), reverse=True)
+        return {
+            "time": round((self.time or 0) * 1000, 3),
+            "fields": fields,
+            "n_plus_one": self.n_plus_one(),
+        }
+
+
+class ProfilingMiddleware:
+    """
+    Graphene middleware which times every resolver of the request.  It
+    must be the first of the middleware, i.e. the closest to the resolver,
+    so that under the async view it runs in the thread the resolver does.
+    """
+
+    def __init__(self, profile):
+        self.profile = profile
+
+    def resolve(self, next, root, info, **args):
+        path = field_path(info)
+        token = current_path.set(path)
+        start = time.perf_counter()
+        try:
+            result = next(root, info, **args)
+        finally:
+            current_path.reset(token)
+        # graphql-core makes every result a promise; most are resolved
+        if isinstance(result, Promise) and result.is_pending:
+            def done(value):
+                self.profile.add_call(path, time.perf_counter() - start)
+                return value
+            return result.then(done)
+        self.profile.add_call(path, time.perf_counter() - start)
+        return result
+
+
+def profiled_execute(execute, sql, params, many, context):
+    profile = current_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.add_query(current_path.get(), sql, time.perf_counter() - start)
+
+
+def install_profiler(sender, connection, **kwargs):
+    if profiled_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(profiled_execute)
+
+
+@contextmanager
+def profile_request(request):
+    """
+    Profiles what is run inside it if PROFILING is on.  The profile is
+    request.graphql_profile, for the middleware (see profiling_middleware).
+    """
+    if not extras_setting("PROFILING"):
+        yield None
+        return
+    profile = RequestProfile()
+    request.graphql_profile = profile
+    token = current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        current_profile.reset(token)
+        profile.finish()
+
+
+def profiling_middleware(request):
+    if profile := getattr(request, "graphql_profile", None):
+        return [ProfilingMiddleware(profile)]
+    return []
+
+
+def get_logger():
+    """
+    The logger of the profiles with a handler for PROFILING_LOG, or None.
+    """
+    global _log_path
+    path = extras_setting("PROFILING_LOG")
+    if not path:
+        return
+    with _log_lock:
+        if _log_path != str(path):
+            for handler in list(logger.handlers):
+                logger.removeHandler(handler)
+                handler.close()
+            handler = RotatingFileHandler(
+                path,
+                maxBytes=extras_setting("PROFILING_LOG_BYTES"),
+                backupCount=extras_setting("PROFILING_LOG_BACKUPS"),
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            _log_path = str(path)
+    return logger
+
+
+def log_profile(data, operation_name):
+    """
+    Writes the profile (as_dict) to PROFILING_LOG if it is set.
+    """
+    if (log := get_logger()) is None:
+        return
+    log.info(json.dumps({
+        "at": datetime.now(timezone.utc).isoformat(),
+        "operation": operation_name,
+        **data,
+    }))
@@ -0,0 +1,112 @@
+"""
+Sends the reads of graphql queries to read replicas and everything else to
+the primary.
+
+With READ_REPLICAS set to the aliases of the replicas in DATABASES and the
+router installed -
+
+    DATABASE_ROUTERS = ["graphene_extras.replicas.ReplicaRouter"]
+
+the graphql views read from a replica, picked at random, while they execute
+a query operation.  Mutations, and everything outside the graphql views -
+the admin, the export, management commands - read and write the primary.
+
+A replica lags behind the primary, so after a mutation the session which
+sent it reads from the primary for REPLICA_STICKINESS seconds, long enough
+for the replicas to catch up, and sees its own writes.  The session is
+remembered by a cookie, REPLICA_COOKIE, holding when that ends; a client
+which doesn't keep cookies gets no stickiness.
+
+Pages read from a replica which hasn't caught up may be put in the
+response cache (see response_cache) for others to read.  Keep
+RESPONSE_CACHE_TIMEOUT short or REPLICA_STICKINESS long enough to cover
+the lag.
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import DEFAULT_DB_ALIAS
+
+from graphene_extras.settings import extras_setting
+
+# whether the reads of the current request may go to a replica, a context
+# variable so the thread pool of the async view sees it (see
+# async_execution.run_in_pool)
+reading_replica = ContextVar("graphene_extras_reading_replica", default=False)
+
+
+def replicas():
+    return list(extras_setting("READ_REPLICAS") or ())
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if reading_replica.get() and (aliases := replicas()):
+            return random.choice(aliases)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # even for instances read from a replica
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas get the schema from the primary
+        if db in replicas():
+            return False
+
+
+def sticky_until(request):
+    """
+    When the session's reads can go back to the replicas, or None.
+    """
+    try:
+        until = float(request.COOKIES[extras_setting("REPLICA_COOKIE")])
+    except (KeyError, ValueError):
+        return
+    now = time.time()
+    # one set further ahead than it can be wasn't set by us
+    if now < until <= now + extras_setting("REPLICA_STICKINESS"):
+        return until
+
+
+@contextmanager
+def replica_reads(request, operation_type):
+    """
+    The reads inside it go to a replica if the operation is a query and the
+    session hasn't written recently.
+    """
+    use = (
+        operation_type == "query"
+        and bool(replicas())
+        and sticky_until(request) is None
+    )
+    token = reading_replica.set(use)
+    try:
+        yield use
+    finally:
+        reading_replica.reset(token)
+
+
+def stick_to_primary(request, response):
+    """
+    Has the session read from the primary for REPLICA_STICKINESS seconds if
+    the request ran a mutation.
+    """
+    if not getattr(request, "graphql_wrote", False) or not replicas():
+        return response
+    stickiness = extras_setting("REPLICA_STICKINESS")
+    response.set_cookie(
+        extras_setting("REPLICA_COOKIE"),
+        str(time.time() + stickiness),
+        max_age=stickiness,
+        httponly=True,
+        samesite="Lax",
+    )
+    return response
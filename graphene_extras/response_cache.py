@@ -0,0 +1,156 @@
+"""
+Caches the pages of a connection so the same search, sort and page is only
+queried for once, e.g. as a user pages back and forth through a table.
+
+Entries are keyed by the arguments which decide the page - a canonical form
+of the search, the sort and first / last / after / before - and by the
+columns the query loads, because the nodes are cached as loaded and a
+different selection needs different columns.
+
+Every key also includes a generation for each model the page is built from.
+Saving or deleting an instance of any of them (post_save / post_delete)
+moves its generation on, so everything cached before the write is never
+read again and simply expires.  Bulk writes - queryset.update,
+bulk_create and so on - send no signals so call invalidate yourself.  The
+cached totals of connections are keyed by the generations too (see
+counts.cached_count) so a page and its total are never from either side of
+a write.
+
+The cache is any django cache, named by the RESPONSE_CACHE setting.  It is
+off by default.  It must be shared by every process - memcached, redis, a
+database cache - because invalidation only reaches other processes through
+it; with local memory they would serve pages from before a write for up to
+RESPONSE_CACHE_TIMEOUT.  Without it the generations are kept in the cache
+of the totals, TOTAL_COUNT_CACHE.
+
+    products_cache = ResponseCache("products", models=(Product, Square))
+    products_cache.connect()
+"""
+import hashlib
+import json
+import time
+
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+
+from graphene_extras.settings import extras_setting
+
+# of what dump_connection returns; part of every key so entries in an older
+# form are never read
+VERSION = 2
+
+
+def canonical(value):
+    return json.dumps(value, sort_keys=True, default=str, separators=(',', ':'))
+
+
+def queryset_columns(qs):
+    """
+    The only / defer and select_related of the queryset, which decide what
+    is loaded for each node.
+    """
+    names, defer = qs.query.deferred_loading
+    select_related = qs.query.select_related
+    if isinstance(select_related, dict):
+        select_related = canonical(select_related)
+    return [sorted(names), defer, select_related]
+
+
+class ResponseCache:
+    def __init__(self, name, models):
+        self.name = name
+        self.models = models
+
+    @property
+    def cache(self):
+        if alias := extras_setting("RESPONSE_CACHE"):
+            return caches[alias]
+
+    @property
+    def generation_cache(self):
+        return caches[extras_setting("RESPONSE_CACHE") or extras_setting("TOTAL_COUNT_CACHE")]
+
+    def generation_key(self, model):
+        return f"{self.name}:generation:{model._meta.label_lower}"
+
+    def generations(self):
+        cache = self.generation_cache
+        keys = [self.generation_key(model) for model in self.models]
+        found = cache.get_many(keys)
+        generations = []
+        for key in keys:
+            if key not in found:
+                # lost e.g. evicted.  It must not go back to a value it has
+                # been before so entries from then can't be read.
+                cache.add(key, time.time_ns(), None)
+                found[key] = cache.get(key)
+            generations.append(found[key])
+        return generations
+
+    def key(self, *parts, generations=None):
+        if generations is None:
+            generations = self.generations()
+        signature = canonical([VERSION, generations, *parts])
+        return f"{self.name}:" + hashlib.sha1(signature.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value):
+        self.cache.set(key, value, extras_setting("RESPONSE_CACHE_TIMEOUT"))
+
+    @property
+    def enabled(self):
+        return self.cache is not None
+
+    def invalidate(self, model=None):
+        # even with the cache off the totals are keyed by the generations
+        cache = self.generation_cache
+        for m in ([model] if model else self.models):
+            cache.set(self.generation_key(m), time.time_ns(), None)
+
+    def receiver(self, sender, **kwargs):
+        self.invalidate(sender)
+
+    def connect(self, signals=(post_save, post_delete)):
+        # a post_delete receiver stops queryset.delete() being one DELETE
+        # so leave it out for a table deleted from in bulk
+        for model in self.models:
+            for signal in signals:
+                signal.connect(
+                    self.receiver,
+                    sender=model,
+                    weak=False,
+                    dispatch_uid=f"{self.name}:{model._meta.label_lower}"
+                )
+
+
+def dump_connection(connection):
+    """
+    What is needed to build the connection again; the connection itself
+    can't be pickled because graphene makes the edge types on the fly.
+    """
+    page_info = connection.page_info
+    return (
+        [(edge.node, edge.cursor) for edge in connection.edges],
+        page_info.has_previous_page,
+        page_info.has_next_page,
+        getattr(connection, 'start_index', None),
+    )
+
+
+def load_connection(data, connection_type, edge_type, pageinfo_type):
+    edges, has_previous_page, has_next_page, start_index = data
+    edges = [edge_type(node=node, cursor=cursor) for node, cursor in edges]
+    connection = connection_type(
+        edges=edges,
+        page_info=pageinfo_type(
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
+            has_previous_page=has_previous_page,
+            has_next_page=has_next_page,
+        )
+    )
+    if start_index is not None:
+        connection.start_index = start_index
+    return connection
@@ -0,0 +1,69 @@
+"""
+Settings for graphene_extras are read from the GRAPHENE_EXTRAS dict in the
+django settings e.g.
+
+    GRAPHENE_EXTRAS = {
+        "TOTAL_COUNT_TIMEOUT": 60
+    }
+
+Anything not set falls back to DEFAULTS.
+"""
+from django.conf import settings
+
+DEFAULTS = {
+    # seconds a cached total for a connection may be stale for
+    "TOTAL_COUNT_TIMEOUT": 60,
+    # the django cache the totals are kept in
+    "TOTAL_COUNT_CACHE": "default",
+    # the django cache the cursors of page buttons are kept in (see
+    # page_cursors), None to not cache, and for how many seconds
+    "PAGE_CURSORS_CACHE": None,
+    "PAGE_CURSORS_TIMEOUT": 60,
+    # filter on (a, b, pk) > (x, y, z) rather than an OR of ANDs when the
+    # database supports it and the sort has a single direction
+    "ROW_VALUE_CURSORS": True,
+    # sign proper cursors with the SECRET_KEY and reject any which are not
+    "SIGN_CURSORS": False,
+    # parsed and validated documents kept by the graphql view
+    "DOCUMENT_CACHE_SIZE": 256,
+    # the manifest written by manage.py collect_persisted_queries
+    "PERSISTED_QUERIES_PATH": None,
+    # reject any query which is not a persisted query
+    "PERSISTED_QUERIES_ONLY": False,
+    # queries registered by clients which are kept, besides the manifest
+    "PERSISTED_QUERIES_SIZE": 1000,
+    # the django cache pages of connections are cached in, None (the default)
+    # to not cache.  It must be shared by all processes e.g. memcached or
+    # redis, not local memory (see response_cache)
+    "RESPONSE_CACHE": None,
+    # seconds a cached page is kept for; writes invalidate it before then
+    "RESPONSE_CACHE_TIMEOUT": 300,
+    # threads the async graphql view runs queries in, one connection each
+    "ASYNC_THREADS": 8,
+    # the most a query may cost / how deep it may nest (see complexity),
+    # None for no limit
+    "MAX_QUERY_COST": 10000,
+    "MAX_QUERY_DEPTH": 10,
+    # add the cost and database time of each request to the extensions of
+    # the response
+    "COST_EXTENSIONS": True,
+    # profile every graphql request (see profiling), the number of times a
+    # field must run the same SQL to be reported as an N+1, and the file
+    # the profiles are logged to - rolled over at PROFILING_LOG_BYTES with
+    # PROFILING_LOG_BACKUPS kept - None to not log them
+    "PROFILING": False,
+    "PROFILING_N_PLUS_ONE": 5,
+    "PROFILING_LOG": None,
+    "PROFILING_LOG_BYTES": 10 * 1024 * 1024,
+    "PROFILING_LOG_BACKUPS": 5,
+    # the aliases of the databases graphql queries read from (see replicas),
+    # for how many seconds a session which ran a mutation reads from the
+    # primary instead and the cookie which says so
+    "READ_REPLICAS": (),
+    "REPLICA_STICKINESS": 10,
+    "REPLICA_COOKIE": "graphql_primary",
+}
+
+
+def extras_setting(name):
+    return getattr(settings, "GRAPHENE_EXTRAS", {}).get(name, DEFAULTS[name])
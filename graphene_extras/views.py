@@ -0,0 +1,310 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import (HttpResponse, HttpResponseBadRequest,
+                         HttpResponseNotAllowed)
+from django.utils.decorators import classonlymethod
+from graphene_django.views import GraphQLView, HttpError
+from graphql.execution import ExecutionResult
+from graphql.execution.executors.asyncio import AsyncioExecutor
+
+from graphene_extras.accounting import account_queries
+from graphene_extras.async_execution import ThreadPoolMiddleware
+from graphene_extras.backend import get_document_backend
+from graphene_extras.complexity import (QueryCostError, check_cost,
+                                        estimate_cost)
+from graphene_extras.persisted_queries import persisted_queries, query_hash
+from graphene_extras.profiling import (log_profile, profile_request,
+                                       profiling_middleware)
+from graphene_extras.replicas import replica_reads, stick_to_primary
+from graphene_extras.settings import extras_setting
+
+"""
+The GraphQLView for /graphql.  On top of graphene_django's view -
+
+    documents are parsed and validated once and then cached (see backend)
+    persisted queries can be sent by hash (see persisted_queries)
+    queries which would cost too much are rejected (see complexity)
+    the cost and the time spent in the database are in the extensions of
+    the response e.g.
+
+        "extensions": {
+            "cost": {"estimate": 203, "depth": 6},
+            "db": {"queries": 3, "time": 4.2}
+        }
+
+    with PROFILING on, the time and SQL of every field are too (see
+    profiling)
+    queries read from the READ_REPLICAS, if there are any (see replicas)
+
+AsyncGraphQLView is the same view for the ASGI app.  Queries are executed on
+the event loop (see async_execution).
+"""
+
+
+def get_persisted_query_hash(request, data):
+    extensions = request.GET.get("extensions") or data.get("extensions")
+    if not extensions:
+        return
+    if isinstance(extensions, str):
+        try:
+            extensions = json.loads(extensions)
+        except ValueError:
+            raise HttpError(HttpResponseBadRequest("Extensions are invalid JSON."))
+    persisted_query = extensions.get("persistedQuery") or {}
+    return persisted_query.get("sha256Hash")
+
+
+class ExtrasGraphQLView(GraphQLView):
+    # schemas whose persisted queries have been put in the document cache
+    warmed = set()
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("backend", get_document_backend())
+        super().__init__(*args, **kwargs)
+        if id(self.schema) not in self.warmed:
+            self.warm_document_cache()
+
+    def warm_document_cache(self):
+        """
+        Parse and validate the persisted queries ahead of the first request.
+        """
+        self.warmed.add(id(self.schema))
+        for query in persisted_queries.all().values():
+            try:
+                self.backend.document_from_string(self.schema, query)
+            except Exception:
+                # it'll error again, properly, if it is ever requested
+                pass
+
+    def get_graphql_params(self, request, data):
+        query, variables, operation_name, id = super().get_graphql_params(request, data)
+        sha256_hash = get_persisted_query_hash(request, data)
+
+        if sha256_hash and not query:
+            query = persisted_queries.get(sha256_hash)
+            if query is None:
+                # tells apollo to send the query along with the hash
+                raise HttpError(HttpResponse(), "PersistedQueryNotFound")
+        elif sha256_hash:
+            if query_hash(query) != sha256_hash:
+                raise HttpError(HttpResponseBadRequest(
+                    "provided sha does not match query"))
+            if persisted_queries.get(sha256_hash) is None:
+                if extras_setting("PERSISTED_QUERIES_ONLY"):
+                    raise HttpError(HttpResponseBadRequest(
+                        "Only persisted queries are allowed."))
+                persisted_queries.register(sha256_hash, query)
+        elif query and extras_setting("PERSISTED_QUERIES_ONLY"):
+            if persisted_queries.get(query_hash(query)) is None:
+                raise HttpError(HttpResponseBadRequest(
+                    "Only persisted queries are allowed."))
+
+        return query, variables, operation_name, id
+
+    def get_operation_type(self, request, query, operation_name):
+        """
+        query, mutation or subscription, None for an invalid query.
+        """
+        try:
+            document = self.get_backend(request).document_from_string(self.schema, query)
+            return document.get_operation_type(operation_name)
+        except Exception:
+            return
+
+    def estimate_cost(self, request, query, variables, operation_name):
+        """
+        (cost, depth) of the query, None for an invalid query which is
+        reported when it is executed.  Raises QueryCostError if the query
+        costs too much.
+        """
+        try:
+            document = self.get_backend(request).document_from_string(self.schema, query)
+        except Exception:
+            return
+        if getattr(document, "validation_errors", True):
+            # invalid or from a backend which doesn't say
+            return
+        cost, depth = estimate_cost(
+            self.schema, document.document_ast, variables, operation_name)
+        check_cost(cost, depth)
+        return cost, depth
+
+    def set_extensions(self, request, cost, timer):
+        if not extras_setting("COST_EXTENSIONS"):
+            return
+        extensions = {
+            "db": {"queries": timer.queries, "time": round(timer.time * 1000, 3)}
+        }
+        if cost:
+            extensions["cost"] = {"estimate": cost[0], "depth": cost[1]}
+        request.graphql_extensions = extensions
+
+    def set_profile(self, request, profile, operation_name):
+        if profile is None:
+            return
+        data = profile.as_dict()
+        request.graphql_extensions = {
+            **(getattr(request, "graphql_extensions", None) or {}),
+            "profile": data,
+        }
+        log_profile(data, operation_name)
+
+    def get_middleware(self, request):
+        return [*profiling_middleware(request), *(self.middleware or [])]
+
+    def execute_graphql_request(
+        self, request, data, query, variables, operation_name, show_graphiql=False
+    ):
+        cost = None
+        if query:
+            try:
+                cost = self.estimate_cost(request, query, variables, operation_name)
+            except QueryCostError as e:
+                return ExecutionResult(errors=[e], invalid=True)
+        operation_type = query and self.get_operation_type(request, query, operation_name)
+        with account_queries() as timer, profile_request(request) as profile, \
+                replica_reads(request, operation_type):
+            result = super().execute_graphql_request(
+                request, data, query, variables, operation_name, show_graphiql)
+        if operation_type == "mutation":
+            # see stick_to_primary
+            request.graphql_wrote = True
+        self.set_extensions(request, cost, timer)
+        self.set_profile(request, profile, operation_name)
+        return result
+
+    def dispatch(self, request, *args, **kwargs):
+        response = super().dispatch(request, *args, **kwargs)
+        return stick_to_primary(request, response)
+
+    def json_encode(self, request, d, pretty=False):
+        # the response of the request just executed
+        if extensions := getattr(request, "graphql_extensions", None):
+            d = {**d, "extensions": extensions}
+        return super().json_encode(request, d, pretty)
+
+
+class AsyncGraphQLView(ExtrasGraphQLView):
+    """
+    Queries run on the event loop with the fields which query the database
+    sent to a thread pool.  Mutations run as they do in ExtrasGraphQLView,
+    in one thread and, with ATOMIC_MUTATIONS, one transaction.
+
+    Only for the ASGI app; under WSGI every request would start an event
+    loop of its own.  Batching is not supported.
+    """
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        assert not initkwargs.get("batch"), "AsyncGraphQLView does not batch"
+        # checks initkwargs
+        super().as_view(**initkwargs)
+
+        async def view(request, *args, **kwargs):
+            self = cls(**initkwargs)
+            self.setup(request, *args, **kwargs)
+            return await self.async_dispatch(request)
+
+        view.view_class = cls
+        view.view_initkwargs = initkwargs
+        # csrf_exempt can't wrap a coroutine function in django 3.1
+        view.csrf_exempt = True
+        return view
+
+    def get_middleware(self, request):
+        # profiling goes first so it runs in the thread the resolver does
+        return [
+            *profiling_middleware(request),
+            ThreadPoolMiddleware(),
+            *(self.middleware or [])
+        ]
+
+    async def async_dispatch(self, request):
+        try:
+            if request.method.lower() not in ("get", "post"):
+                raise HttpError(
+                    HttpResponseNotAllowed(
+                        ["GET", "POST"], "GraphQL only supports GET and POST requests."
+                    )
+                )
+
+            data = self.parse_body(request)
+            if self.graphiql and self.can_display_graphiql(request, data):
+                # renders a template, no queries
+                return self.dispatch(request)
+
+            result, status_code = await self.async_get_response(request, data)
+            response = HttpResponse(
+                status=status_code, content=result, content_type="application/json"
+            )
+            return stick_to_primary(request, response)
+
+        except HttpError as e:
+            response = e.response
+            response["Content-Type"] = "application/json"
+            response.content = self.json_encode(
+                request, {"errors": [self.format_error(e)]}
+            )
+            return response
+
+    async def async_get_response(self, request, data):
+        query, variables, operation_name, id = self.get_graphql_params(request, data)
+        execution_result = await self.async_execute_graphql_request(
+            request, data, query, variables, operation_name)
+
+        status_code = 200
+        response = {}
+        if execution_result.errors:
+            response["errors"] = [
+                self.format_error(e) for e in execution_result.errors
+            ]
+        if execution_result.invalid:
+            status_code = 400
+        else:
+            response["data"] = execution_result.data
+        return self.json_encode(request, response), status_code
+
+    async def async_execute_graphql_request(
+        self, request, data, query, variables, operation_name
+    ):
+        if not query:
+            raise HttpError(HttpResponseBadRequest("Must provide query string."))
+
+        try:
+            document = self.get_backend(request).document_from_string(self.schema, query)
+        except Exception as e:
+            return ExecutionResult(errors=[e], invalid=True)
+
+        if document.get_operation_type(operation_name) != "query":
+            # rolls back and checks the method as before
+            return await sync_to_async(self.execute_graphql_request)(
+                request, data, query, variables, operation_name)
+
+        try:
+            cost = self.estimate_cost(request, query, variables, operation_name)
+        except QueryCostError as e:
+            return ExecutionResult(errors=[e], invalid=True)
+
+        try:
+            with account_queries() as timer, profile_request(request) as profile, \
+                    replica_reads(request, "query"):
+                result = document.execute(
+                    root_value=self.get_root_value(request),
+                    variable_values=variables,
+                    operation_name=operation_name,
+                    context_value=self.get_context(request),
+                    middleware=self.get_middleware(request),
+                    executor=AsyncioExecutor(loop=asyncio.get_running_loop()),
+                    return_promise=True,
+                )
+                if isinstance(result, ExecutionResult):
+                    # invalid, never executed
+                    return result
+                result = await result
+        except Exception as e:
+            return ExecutionResult(errors=[e], invalid=True)
+        self.set_extensions(request, cost, timer)
+        self.set_profile(request, profile, operation_name)
+        return result
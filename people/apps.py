@@ -3,3 +3,11 @@ from django.apps import AppConfig
 
 class PeopleConfig(AppConfig):
     name = 'people'
+
+    def ready(self):
+        from django.db.models.signals import post_save
+
+        from people.cache import people_cache
+
+        # the delete mutations invalidate themselves and stay one DELETE
+        people_cache.connect(signals=(post_save,))
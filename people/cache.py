@@ -0,0 +1,12 @@
+from graphene_extras.response_cache import ResponseCache
+
+from people.models import Person
+
+"""
+Generations of the people table.  Only the totals of viewer.peoplePages are
+keyed by them, so a write to a person is counted straight away.  Saves
+invalidate through post_save (see PeopleConfig.ready); deletes and bulk
+writes must call people_cache.invalidate() as the mutations do.
+"""
+
+people_cache = ResponseCache("people", models=(Person,))
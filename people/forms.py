@@ -10,4 +10,15 @@ class PersonForm(forms.ModelForm):
             'first_name', 'last_name', 'age', 
             'sex', 'alive', 'unique_identifier',
             'random_number',
-        )
\ No newline at end of file
+        )
+
+
+class BulkPersonForm(PersonForm):
+    """
+    PersonForm for one of many people written at once.  Checking
+    unique_identifier is left to the caller so it can be done for all
+    of them with one query (see people.schema.check_unique).
+    """
+
+    def validate_unique(self):
+        pass
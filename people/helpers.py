@@ -0,0 +1,35 @@
+from people.models import Person
+
+"""
+Rows for seeding the database (see manage.py seed).
+"""
+
+FIRST_NAMES = [
+    "James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael",
+    "Linda", "William", "Elizabeth", "David", "Barbara", "Richard", "Susan",
+    "Joseph", "Jessica", "Thomas", "Sarah", "Charles", "Karen",
+]
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller",
+    "Davis", "Rodriguez", "Martinez", "Hernandez", "Lopez", "Gonzalez",
+    "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin",
+]
+
+
+def random_people(rng, identifiers):
+    """
+    A person for each of the unique identifiers.
+    """
+    sexes = [value for value, label in Person.sexes]
+    return [
+        Person(
+            first_name=rng.choice(FIRST_NAMES),
+            last_name=rng.choice(LAST_NAMES),
+            age=min(100, max(0, int(rng.gauss(40, 18)))),
+            sex=rng.choice(sexes),
+            alive=rng.random() < 0.9,
+            unique_identifier=identifier,
+            random_number=rng.randrange(2 ** 31),
+        )
+        for identifier in identifiers
+    ]
@@ -1,15 +1,24 @@
 from base64 import b64decode, b64encode
+from collections import defaultdict
 
 import graphene
+from django.core.exceptions import ValidationError
+from django.db import connections, router, transaction
 from django_filters import FilterSet, OrderingFilter
+from graphene.types.utils import yank_fields_from_attrs
 from graphene_django import DjangoObjectType
+from graphene_django.constants import MUTATION_ERRORS_FLAG
 from graphene_django.filter import DjangoFilterConnectionField
-from graphene_django.forms.mutation import DjangoModelFormMutation
+from graphene_django.forms.mutation import (DjangoModelFormMutation,
+                                            fields_for_form)
+from graphene_django.types import ErrorType
+from graphene_extras.optimizer import optimize_queryset
 from graphene_extras.pagination.ui import PaginationConnection
 from graphql_relay import from_global_id
 from graphql_relay.connection.arrayconnection import offset_to_cursor
 
-from people.forms import PersonForm
+from people.cache import people_cache
+from people.forms import BulkPersonForm, PersonForm
 from people.models import Person
 
 """
@@ -102,6 +111,11 @@ class PaginatePeopleConnection(PaginationConnection):
     class Meta:
         node = PersonNode
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # the total is cached; a write to a person starts a new count
+        self.count_version = people_cache.generations()
+
 
 class ViewerNode(graphene.ObjectType):
     class Meta:
@@ -111,7 +125,7 @@ class ViewerNode(graphene.ObjectType):
         PaginatePeopleConnection)
 
     def resolve_people_pages(root, info, **kwargs):
-        return Person.objects.all()
+        return optimize_queryset(Person.objects.all(), info, PersonNode)
 
 
 class Query(graphene.ObjectType):
@@ -172,10 +186,243 @@ class DeletePersonMutation(graphene.relay.ClientIDMutation):
     @classmethod
     def mutate_and_get_payload(cls, root, info, id):
         Person.objects.filter(pk=from_global_id(id)[1]).delete()
+        people_cache.invalidate()
         return cls(deleted_person_id=id)
 
 
+"""
+Bulk versions of the mutations above for importing or editing many people
+in one request.  Every person is validated by PersonForm; if any is invalid
+nothing is written and the errors are returned against the index of the
+person in the input.  Otherwise all are written in one transaction with
+bulk_create / bulk_update / one DELETE.  bulkDeletePeople gives back the
+ids of the people it deleted; an id of no one is not an error.
+
+mutation {
+  bulkCreatePeople(input: {people: [{firstName: "a", ...}, ...]}) {
+    errors { index errors { field messages } }
+    personNodeEdges { cursor node { id firstName } }
+  }
+}
+"""
+
+# the fields of PersonForm as input
+PersonInput = type(
+    "PersonInput",
+    (graphene.InputObjectType,),
+    yank_fields_from_attrs(
+        fields_for_form(PersonForm(), (), ()), _as=graphene.InputField)
+)
+
+
+class PersonUpdateInput(PersonInput):
+    id = graphene.ID(required=True)  # the pk, as for UpdatePersonMutation
+
+
+class BulkPersonErrors(graphene.ObjectType):
+    index = graphene.Int(required=True)
+    errors = graphene.List(graphene.NonNull(ErrorType), required=True)
+
+
+def check_unique(forms):
+    """
+    unique_identifier must not be used twice in the batch or by another
+    person already.  forms are (index in the batch, form).  One query for
+    the whole batch.
+    """
+    by_identifier = defaultdict(list)
+    for i, form in forms:
+        if form.is_valid():
+            by_identifier[form.cleaned_data['unique_identifier']].append((i, form))
+    taken = dict(
+        Person.objects
+        .filter(unique_identifier__in=list(by_identifier))
+        .values_list('unique_identifier', 'pk')
+    )
+    for identifier, _forms in by_identifier.items():
+        owner = taken.get(identifier)
+        (first, form), *repeats = _forms
+        if owner is not None and owner != form.instance.pk:
+            form.add_error(
+                'unique_identifier',
+                form.instance.unique_error_message(
+                    Person, ('unique_identifier',))
+            )
+        for i, form in repeats:
+            form.add_error(
+                'unique_identifier', f'Repeats item {first} in this request.')
+
+
+def to_pk(value):
+    """
+    The pk of a person from an id sent by the client, raises ValidationError
+    if it can't be one.
+    """
+    try:
+        return Person._meta.pk.to_python(value)
+    except ValidationError:
+        raise ValidationError('Not a valid id.')
+
+
+def person_errors(errors, info):
+    if errors:
+        # see graphene_django.forms.mutation
+        setattr(info.context, MUTATION_ERRORS_FLAG, True)
+    return errors
+
+
+def validate_people(forms, info, id_errors=None):
+    """
+    The errors of the forms (each of which has been bound with data).
+    id_errors are {index: message} for the people to update whose id is
+    bad; their forms aren't checked against the others.
+    """
+    id_errors = id_errors or {}
+    for form in forms:
+        form.is_valid()
+    check_unique([(i, form) for i, form in enumerate(forms) if i not in id_errors])
+    errors = []
+    for i, form in enumerate(forms):
+        form_errors = ErrorType.from_errors(form.errors)
+        if i in id_errors:
+            form_errors.insert(0, ErrorType(field='id', messages=[id_errors[i]]))
+        if form_errors:
+            errors.append(BulkPersonErrors(index=i, errors=form_errors))
+    return person_errors(errors, info)
+
+
+def people_edges(people):
+    return [
+        PersonNodeEdge(cursor=offset_to_cursor(i), node=person)
+        for i, person in enumerate(people)
+    ]
+
+
+class BulkCreatePeopleMutation(graphene.relay.ClientIDMutation):
+    class Input:
+        people = graphene.List(graphene.NonNull(PersonInput), required=True)
+    errors = graphene.List(graphene.NonNull(BulkPersonErrors))
+    person_node_edges = graphene.List(graphene.NonNull(PersonNodeEdge))
+
+    @classmethod
+    def mutate_and_get_payload(cls, root, info, people):
+        forms = [BulkPersonForm(data=data) for data in people]
+        if errors := validate_people(forms, info):
+            return cls(errors=errors, person_node_edges=[])
+        using = router.db_for_write(Person)
+        with transaction.atomic(using=using):
+            created = Person.objects.using(using).bulk_create(
+                [form.instance for form in forms])
+            if not connections[using].features.can_return_rows_from_bulk_insert:
+                # e.g. sqlite doesn't give back the pks
+                pks = dict(
+                    Person.objects.using(using)
+                    .filter(unique_identifier__in=[p.unique_identifier for p in created])
+                    .values_list('unique_identifier', 'pk')
+                )
+                for person in created:
+                    person.pk = pks[person.unique_identifier]
+        # bulk_create sends no post_save
+        people_cache.invalidate()
+        return cls(errors=[], person_node_edges=people_edges(created))
+
+
+class BulkUpdatePeopleMutation(graphene.relay.ClientIDMutation):
+    class Input:
+        people = graphene.List(graphene.NonNull(PersonUpdateInput), required=True)
+    errors = graphene.List(graphene.NonNull(BulkPersonErrors))
+    person_node_edges = graphene.List(graphene.NonNull(PersonNodeEdge))
+
+    @classmethod
+    def mutate_and_get_payload(cls, root, info, people):
+        using = router.db_for_write(Person)
+        pks = []
+        id_errors = {}
+        for i, data in enumerate(people):
+            try:
+                pks.append(to_pk(data['id']))
+            except ValidationError:
+                pks.append(None)
+                id_errors[i] = 'Not a valid id.'
+        instances = Person.objects.using(using).in_bulk(
+            [pk for pk in pks if pk is not None])
+        forms = []
+        first_index = {}
+        for i, (data, pk) in enumerate(zip(people, pks)):
+            data = {k: v for k, v in data.items() if k != 'id'}
+            if i not in id_errors:
+                if pk in first_index:
+                    id_errors[i] = (
+                        f'The person is already in the list at index {first_index[pk]}.')
+                elif pk not in instances:
+                    id_errors[i] = 'No such person.'
+                else:
+                    first_index[pk] = i
+            # only the first form of a person gets the instance to update
+            instance = instances[pk] if first_index.get(pk) == i else None
+            forms.append(BulkPersonForm(data=data, instance=instance))
+        if errors := validate_people(forms, info, id_errors):
+            return cls(errors=errors, person_node_edges=[])
+        updated = [form.instance for form in forms]
+        with transaction.atomic(using=using):
+            Person.objects.using(using).bulk_update(
+                updated, fields=list(PersonForm._meta.fields))
+        people_cache.invalidate()
+        return cls(errors=[], person_node_edges=people_edges(updated))
+
+
+def pk_from_global_id(global_id):
+    """
+    The pk of a person from their global id, raises ValidationError if it
+    isn't the id of a person.
+    """
+    try:
+        _type, pk = from_global_id(global_id)
+    except (TypeError, ValueError):
+        # binascii.Error and UnicodeDecodeError are ValueErrors
+        raise ValidationError('Not a valid id.')
+    if _type != PersonNode._meta.name:
+        raise ValidationError('Not the id of a person.')
+    return to_pk(pk)
+
+
+class BulkDeletePeopleMutation(graphene.relay.ClientIDMutation):
+    class Input:
+        ids = graphene.List(graphene.NonNull(graphene.ID), required=True)
+    errors = graphene.List(graphene.NonNull(BulkPersonErrors))
+    deleted_person_ids = graphene.List(graphene.NonNull(graphene.ID))
+    deleted_count = graphene.Int()
+
+    @classmethod
+    def mutate_and_get_payload(cls, root, info, ids):
+        pks = []
+        errors = []
+        for i, id in enumerate(ids):
+            try:
+                pks.append(pk_from_global_id(id))
+            except ValidationError as e:
+                errors.append(BulkPersonErrors(
+                    index=i, errors=[ErrorType(field='id', messages=e.messages)]))
+        if errors:
+            return cls(
+                errors=person_errors(errors, info), deleted_person_ids=[], deleted_count=0)
+        using = router.db_for_write(Person)
+        with transaction.atomic(using=using):
+            people = Person.objects.using(using).filter(pk__in=pks)
+            deleted = set(people.select_for_update().values_list('pk', flat=True))
+            # nothing refers to a person and nothing listens for them
+            # being deleted so this is one DELETE ... WHERE id IN (...)
+            count, _ = people.delete()
+        people_cache.invalidate()
+        deleted_ids = list(dict.fromkeys(
+            id for id, pk in zip(ids, pks) if pk in deleted))
+        return cls(errors=[], deleted_person_ids=deleted_ids, deleted_count=count)
+
+
 class Mutation(graphene.ObjectType):
     create_person = CreatePersonMutation.Field()
     update_person = UpdatePersonMutation.Field()
     delete_person = DeletePersonMutation.Field()
+    bulk_create_people = BulkCreatePeopleMutation.Field()
+    bulk_update_people = BulkUpdatePeopleMutation.Field()
+    bulk_delete_people = BulkDeletePeopleMutation.Field()
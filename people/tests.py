@@ -1,3 +1,272 @@
-from django.test import TestCase
+import graphene
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from graphql_relay import to_global_id
 
-# Create your tests here.
+from graphene_extras.pagination.ui import create_cursor
+from people.models import Person
+from people.schema import Query
+from proj.schema import schema as proj_schema
+
+# the people query isn't in proj.schema
+schema = graphene.Schema(query=Query)
+
+PEOPLE_PAGES = """
+query PeoplePages ($after: String) {
+  viewer {
+    peoplePages (first: 5, after: $after) {
+      edges { node { uniqueIdentifier } }
+      pages (pageSize: 5) {
+        first { cursor pageNumber isCurrent }
+        last { cursor pageNumber isCurrent }
+        around { cursor pageNumber isCurrent }
+        previous { cursor pageNumber isCurrent }
+      }
+    }
+  }
+}
+"""
+
+
+def create_people(n):
+    Person.objects.bulk_create([
+        Person(
+            first_name="a", last_name="b", age=30, sex="m",
+            unique_identifier=f"person-{i:03}", random_number=i,
+        )
+        for i in range(n)
+    ])
+
+
+def execute(query, schema=schema, **variables):
+    return schema.execute(
+        query, variables=variables, context_value=RequestFactory().post("/graphql"))
+
+
+class PeoplePagesTests(TestCase):
+    def setUp(self):
+        create_people(23)
+
+    def test_offset_page_cursors(self):
+        # peoplePages is a plain relay connection, no sort
+        result = execute(PEOPLE_PAGES, after=create_cursor(9))
+        self.assertIsNone(result.errors)
+        connection = result.data["viewer"]["peoplePages"]
+        self.assertEqual(
+            [edge["node"]["uniqueIdentifier"] for edge in connection["edges"]],
+            [f"person-{i:03}" for i in range(10, 15)]
+        )
+        pages = connection["pages"]
+        self.assertEqual(pages["first"]["cursor"], "")
+        self.assertEqual(pages["last"]["pageNumber"], 5)
+        self.assertEqual(pages["last"]["cursor"], create_cursor(19))
+        self.assertEqual(pages["previous"]["cursor"], create_cursor(4))
+        self.assertEqual(
+            [(page["pageNumber"], page["cursor"], page["isCurrent"])
+             for page in pages["around"]],
+            [
+                (1, "", False),
+                (2, create_cursor(4), False),
+                (3, create_cursor(9), True),
+                (4, create_cursor(14), False),
+                (5, create_cursor(19), False),
+            ]
+        )
+
+    def test_page_cursors_load_the_pages(self):
+        pages = execute(PEOPLE_PAGES).data["viewer"]["peoplePages"]["pages"]
+        result = execute(PEOPLE_PAGES, after=pages["last"]["cursor"])
+        connection = result.data["viewer"]["peoplePages"]
+        self.assertEqual(
+            [edge["node"]["uniqueIdentifier"] for edge in connection["edges"]],
+            ["person-020", "person-021", "person-022"]
+        )
+        self.assertTrue(connection["pages"]["last"]["isCurrent"])
+
+
+TOTAL = """
+query { viewer { peoplePages (first: 5) { total } } }
+"""
+
+
+@override_settings(GRAPHENE_EXTRAS={"TOTAL_COUNT_TIMEOUT": 600})
+class PeopleTotalTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        create_people(3)
+
+    def total(self):
+        result = execute(TOTAL)
+        self.assertIsNone(result.errors)
+        return result.data["viewer"]["peoplePages"]["total"]
+
+    def test_writes_are_counted(self):
+        self.assertEqual(self.total(), 3)
+        person = Person.objects.first()
+        person.pk = None
+        person.unique_identifier = "another"
+        person.save()
+        self.assertEqual(self.total(), 4)
+        result = execute(
+            BULK_DELETE, schema=proj_schema, ids=[to_global_id("PersonNode", person.pk)])
+        self.assertEqual(result.data["bulkDeletePeople"]["deletedCount"], 1)
+        self.assertEqual(self.total(), 3)
+
+
+BULK_CREATE = """
+mutation Create ($people: [PersonInput!]!) {
+  bulkCreatePeople (input: {people: $people}) {
+    errors { index errors { field messages } }
+    personNodeEdges { node { id uniqueIdentifier } }
+  }
+}
+"""
+
+BULK_UPDATE = """
+mutation Update ($people: [PersonUpdateInput!]!) {
+  bulkUpdatePeople (input: {people: $people}) {
+    errors { index errors { field messages } }
+    personNodeEdges { node { uniqueIdentifier } }
+  }
+}
+"""
+
+BULK_DELETE = """
+mutation Delete ($ids: [ID!]!) {
+  bulkDeletePeople (input: {ids: $ids}) {
+    errors { index errors { field messages } }
+    deletedPersonIds
+    deletedCount
+  }
+}
+"""
+
+
+def person_input(person, **data):
+    return {
+        "id": str(person.pk), "firstName": person.first_name,
+        "lastName": person.last_name, "age": person.age, "sex": person.sex,
+        "alive": person.alive, "uniqueIdentifier": person.unique_identifier,
+        "randomNumber": person.random_number, **data,
+    }
+
+
+class BulkMutationTests(TestCase):
+    def setUp(self):
+        create_people(3)
+        self.people = list(Person.objects.order_by("pk"))
+
+    def create(self, people):
+        result = execute(BULK_CREATE, schema=proj_schema, people=people)
+        self.assertIsNone(result.errors)
+        return result.data["bulkCreatePeople"]
+
+    def new_person(self, unique_identifier, **data):
+        return {
+            "firstName": "c", "lastName": "d", "age": 20, "sex": "f",
+            "alive": True, "uniqueIdentifier": unique_identifier,
+            "randomNumber": 1, **data,
+        }
+
+    def test_create(self):
+        result = self.create([self.new_person("new-1"), self.new_person("new-2")])
+        self.assertEqual(result["errors"], [])
+        created = {
+            person.unique_identifier: person
+            for person in Person.objects.filter(unique_identifier__startswith="new-")
+        }
+        # the pks of the nodes are those of the rows, on sqlite refetched
+        self.assertEqual(
+            [(edge["node"]["id"], edge["node"]["uniqueIdentifier"])
+             for edge in result["personNodeEdges"]],
+            [(to_global_id("PersonNode", created[identifier].pk), identifier)
+             for identifier in ("new-1", "new-2")]
+        )
+
+    def test_create_with_a_bad_item(self):
+        result = self.create([
+            self.new_person("new-1"),
+            self.new_person("new-2", firstName="", sex="x"),
+            self.new_person(self.people[0].unique_identifier),
+        ])
+        self.assertEqual(result["personNodeEdges"], [])
+        self.assertEqual([error["index"] for error in result["errors"]], [1, 2])
+        self.assertEqual(
+            {error["field"] for error in result["errors"][0]["errors"]}, {"first_name", "sex"})
+        self.assertEqual(result["errors"][1]["errors"], [{
+            "field": "unique_identifier",
+            "messages": ["Person with this Unique identifier already exists."]}])
+        # nothing is written
+        self.assertEqual(Person.objects.count(), 3)
+
+    def test_create_repeated_unique_identifier(self):
+        result = self.create([
+            self.new_person("new-1"), self.new_person("new-2"), self.new_person("new-1"),
+        ])
+        self.assertEqual(result["errors"], [{"index": 2, "errors": [{
+            "field": "unique_identifier", "messages": ["Repeats item 0 in this request."]}]}])
+        self.assertEqual(Person.objects.count(), 3)
+
+    def update(self, people):
+        result = execute(BULK_UPDATE, schema=proj_schema, people=people)
+        self.assertIsNone(result.errors)
+        return result.data["bulkUpdatePeople"]
+
+    def delete(self, ids):
+        result = execute(BULK_DELETE, schema=proj_schema, ids=ids)
+        self.assertIsNone(result.errors)
+        return result.data["bulkDeletePeople"]
+
+    def test_update(self):
+        a, b, c = self.people
+        result = self.update([person_input(a, age=40), person_input(b, age=41)])
+        self.assertEqual(result["errors"], [])
+        self.assertEqual(
+            list(Person.objects.order_by("pk").values_list("age", flat=True)), [40, 41, 30])
+
+    def test_update_bad_ids(self):
+        a, b, c = self.people
+        result = self.update([
+            person_input(a, id="abc"),
+            person_input(b, id=str(c.pk + 100)),
+            person_input(c, age=50),
+        ])
+        self.assertEqual(result["errors"], [
+            {"index": 0, "errors": [{"field": "id", "messages": ["Not a valid id."]}]},
+            {"index": 1, "errors": [{"field": "id", "messages": ["No such person."]}]},
+        ])
+        self.assertFalse(Person.objects.filter(age=50).exists())
+
+    def test_update_duplicate_ids(self):
+        a, b, c = self.people
+        result = self.update([person_input(a, age=40), person_input(a, age=41)])
+        # only the repeat is an error, not unique_identifier
+        self.assertEqual(result["errors"], [{"index": 1, "errors": [{
+            "field": "id", "messages": ["The person is already in the list at index 0."]}]}])
+        self.assertEqual(Person.objects.get(pk=a.pk).age, 30)
+
+    def test_delete(self):
+        a, b, c = self.people
+        ids = [to_global_id("PersonNode", person.pk) for person in (a, b)]
+        missing = to_global_id("PersonNode", c.pk + 100)
+        result = self.delete([*ids, missing])
+        self.assertEqual(result["deletedPersonIds"], ids)
+        self.assertEqual(result["deletedCount"], 2)
+        self.assertEqual(list(Person.objects.all()), [c])
+        self.assertEqual(self.delete(ids)["deletedPersonIds"], [])
+
+    def test_delete_bad_ids(self):
+        a, b, c = self.people
+        result = self.delete([
+            to_global_id("PersonNode", a.pk),
+            "not a global id",
+            to_global_id("ProductNode", b.pk),
+            to_global_id("PersonNode", "abc"),
+        ])
+        self.assertEqual(result["errors"], [
+            {"index": 1, "errors": [{"field": "id", "messages": ["Not a valid id."]}]},
+            {"index": 2, "errors": [{"field": "id", "messages": ["Not the id of a person."]}]},
+            {"index": 3, "errors": [{"field": "id", "messages": ["Not a valid id."]}]},
+        ])
+        self.assertEqual(result["deletedPersonIds"], [])
+        self.assertEqual(Person.objects.count(), 3)
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'proj.settings')
+# serve /graphql from the event loop (see proj.urls)
+os.environ.setdefault('GRAPHQL_ASYNC', '1')
 
 application = get_asgi_application()
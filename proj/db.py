@@ -0,0 +1,163 @@
+"""
+The DATABASES of the project, configured from the environment.
+
+DB_ENGINE picks the database - sqlite (the default) or postgres.
+
+Both keep connections open between requests for DB_CONN_MAX_AGE seconds
+(60 by default, "none" for as long as they work, 0 for a new connection
+every request).  Django 3.1 has no pool of its own; a persistent connection
+is kept per thread, so a threaded server or the thread pool of the async
+view (ASYNC_THREADS) holds that many open.  For a real pool in front of
+postgres use pgbouncer.
+
+sqlite -
+
+    SQLITE_PATH             the file, db.sqlite3 by default
+    SQLITE_JOURNAL_MODE     unset - the file's own, delete for the checked
+                            in db.sqlite3.  wal - readers don't block the
+                            writer, nor it them
+    SQLITE_SYNCHRONOUS      normal with wal (safe with it, fsyncs at
+                            checkpoints), otherwise sqlite's full
+    SQLITE_CACHE_SIZE       -64000 - pages, or KiB if negative
+    SQLITE_MMAP_SIZE        268435456 - bytes of the file read through mmap
+    SQLITE_BUSY_TIMEOUT     5000 - ms to wait for a lock before failing
+
+The pragmas are set on every new connection (see set_pragmas).  Unlike the
+others journal_mode is stored in the database file, so it is opt in - use
+wal on a database of your own, not the checked in one, e.g.
+
+    SQLITE_PATH=/srv/proj.sqlite3 SQLITE_JOURNAL_MODE=wal ./manage.py runserver
+
+postgres -
+
+    POSTGRES_DB, POSTGRES_USER, POSTGRES_PASSWORD, POSTGRES_HOST,
+    POSTGRES_PORT
+    POSTGRES_CONNECT_TIMEOUT    10 - seconds
+    POSTGRES_STATEMENT_TIMEOUT  ms a statement may run for, 0 for no limit
+    PGBOUNCER                   1 when connecting through pgbouncer in
+                                transaction pooling mode - server side
+                                cursors (QuerySet.iterator) and startup
+                                options don't survive it so are turned off
+
+Read replicas, which graphql queries read from (see graphene_extras.replicas)
+- replica, replica_2, ... in DATABASES -
+
+    SQLITE_REPLICA_PATH     a copy of the sqlite file, opened query only.
+                            Nothing replicates to it; copy the primary
+                            over it to catch it up e.g.
+
+        python -c "import sqlite3; sqlite3.connect('db.sqlite3').backup(sqlite3.connect('replica.sqlite3'))"
+
+    POSTGRES_REPLICA_HOSTS  comma separated hosts, with the database,
+                            user and password of the primary
+
+Tests read the replicas from the test database of the primary.
+"""
+import os
+import re
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.signals import connection_created
+
+SQLITE_PRAGMAS = {
+    # pragma: (environment variable, default), None to leave it alone
+    "journal_mode": ("SQLITE_JOURNAL_MODE", None),
+    "synchronous": ("SQLITE_SYNCHRONOUS", None),
+    "cache_size": ("SQLITE_CACHE_SIZE", -64000),
+    "mmap_size": ("SQLITE_MMAP_SIZE", 268435456),
+    "busy_timeout": ("SQLITE_BUSY_TIMEOUT", 5000),
+}
+
+
+def conn_max_age(env):
+    value = env.get("DB_CONN_MAX_AGE", "60")
+    if value.lower() == "none":
+        return None
+    return int(value)
+
+
+def sqlite_pragmas(env):
+    pragmas = {
+        pragma: env.get(name) or default
+        for pragma, (name, default) in SQLITE_PRAGMAS.items()
+    }
+    if pragmas["synchronous"] is None and str(pragmas["journal_mode"]).lower() == "wal":
+        pragmas["synchronous"] = "normal"
+    return {pragma: value for pragma, value in pragmas.items() if value is not None}
+
+
+def sqlite_settings(base_dir, env=os.environ):
+    return {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": env.get("SQLITE_PATH") or base_dir / "db.sqlite3",
+        "CONN_MAX_AGE": conn_max_age(env),
+        # not a django setting, see set_pragmas
+        "PRAGMAS": sqlite_pragmas(env),
+    }
+
+
+def postgres_settings(env=os.environ):
+    pgbouncer = env.get("PGBOUNCER") == "1"
+    options = {
+        "connect_timeout": int(env.get("POSTGRES_CONNECT_TIMEOUT", "10")),
+    }
+    statement_timeout = int(env.get("POSTGRES_STATEMENT_TIMEOUT", "0"))
+    if statement_timeout and not pgbouncer:
+        options["options"] = f"-c statement_timeout={statement_timeout}"
+    return {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": env.get("POSTGRES_DB", "proj"),
+        "USER": env.get("POSTGRES_USER", ""),
+        "PASSWORD": env.get("POSTGRES_PASSWORD", ""),
+        "HOST": env.get("POSTGRES_HOST", ""),
+        "PORT": env.get("POSTGRES_PORT", ""),
+        "CONN_MAX_AGE": conn_max_age(env),
+        "DISABLE_SERVER_SIDE_CURSORS": pgbouncer,
+        "OPTIONS": options,
+    }
+
+
+def database_settings(base_dir, env=os.environ):
+    engine = env.get("DB_ENGINE", "sqlite")
+    if engine == "sqlite":
+        return sqlite_settings(base_dir, env)
+    if engine == "postgres":
+        return postgres_settings(env)
+    raise ImproperlyConfigured(f"DB_ENGINE must be sqlite or postgres, not {engine}")
+
+
+def replica_aliases(count):
+    return ["replica" if i == 0 else f"replica_{i + 1}" for i in range(count)]
+
+
+def replica_settings(base_dir, env=os.environ):
+    """
+    {alias: settings} of the read replicas of the primary, database_settings.
+    """
+    engine = env.get("DB_ENGINE", "sqlite")
+    replicas = []
+    if engine == "sqlite" and env.get("SQLITE_REPLICA_PATH"):
+        replica = sqlite_settings(base_dir, {**env, "SQLITE_PATH": env["SQLITE_REPLICA_PATH"]})
+        replica["PRAGMAS"]["query_only"] = "on"
+        replicas.append(replica)
+    elif engine == "postgres":
+        for host in filter(None, env.get("POSTGRES_REPLICA_HOSTS", "").split(",")):
+            replicas.append({**postgres_settings(env), "HOST": host.strip()})
+    for replica in replicas:
+        replica["TEST"] = {"MIRROR": "default"}
+    return dict(zip(replica_aliases(len(replicas)), replicas))
+
+
+def set_pragmas(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    pragmas = connection.settings_dict.get("PRAGMAS") or {}
+    with connection.cursor() as cursor:
+        for pragma, value in pragmas.items():
+            # pragmas can't take parameters
+            if not re.fullmatch(r"-?\w+", str(value)):
+                raise ImproperlyConfigured(f"Bad value for PRAGMA {pragma}: {value!r}")
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+
+
+connection_created.connect(set_pragmas, dispatch_uid="proj.db.set_pragmas")
@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/3.1/ref/settings/
 from pathlib import Path
 import os
 
+from proj.db import database_settings, replica_settings
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -41,10 +43,11 @@ INSTALLED_APPS = [
 
     'django_extensions',
     'graphene_django',
+    'graphene_extras.apps.GrapheneExtrasConfig',
     'rest_framework',
 
-    'people',
-    'squares'
+    'people.apps.PeopleConfig',
+    'squares.apps.SquaresConfig'
 ]
 
 MIDDLEWARE = [
@@ -82,13 +85,18 @@ WSGI_APPLICATION = 'proj.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
 
+# sqlite with persistent connections and pragmas for concurrency by default,
+# or postgres, and any read replicas - see proj/db.py for the environment
+# variables
+
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_settings(BASE_DIR),
+    **replica_settings(BASE_DIR),
 }
 
+# graphql queries read from the replicas (see graphene_extras.replicas)
+DATABASE_ROUTERS = ['graphene_extras.replicas.ReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
@@ -135,4 +143,11 @@ GRAPHENE = {
     "SCHEMA": "proj.schema.schema"
 }
 
+GRAPHENE_EXTRAS = {
+    # how long the total for a paginated connection can be stale for
+    "TOTAL_COUNT_TIMEOUT": 60,
+    "PERSISTED_QUERIES_PATH": BASE_DIR / 'persisted_queries.json',
+    "READ_REPLICAS": [alias for alias in DATABASES if alias != 'default'],
+}
+
 CORS_ORIGIN_ALLOW_ALL = True
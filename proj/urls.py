@@ -13,16 +13,24 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import os
+
 from django.contrib import admin
 from django.urls import include, path
 from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import TemplateView
-from graphene_django.views import GraphQLView
+from graphene_extras.views import AsyncGraphQLView, ExtrasGraphQLView
+
+# the ASGI app sets GRAPHQL_ASYNC (see proj/asgi.py)
+if os.environ.get('GRAPHQL_ASYNC') == '1':
+    graphql_view = AsyncGraphQLView.as_view(graphiql=True)
+else:
+    graphql_view = csrf_exempt(ExtrasGraphQLView.as_view(graphiql=True))
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', TemplateView.as_view(template_name='base.html')),
-    path("graphql", csrf_exempt(GraphQLView.as_view(graphiql=True))),
+    path("graphql", graphql_view),
     path("people/", include('people.urls')),
     path("squares/", include('squares.urls'))
 ]
\ No newline at end of file
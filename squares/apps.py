@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class SquaresConfig(AppConfig):
     name = 'squares'
+
+    def ready(self):
+        from squares.cache import products_cache
+        products_cache.connect()
@@ -0,0 +1,10 @@
+from graphene_extras.response_cache import ResponseCache
+
+from squares.models import Product, Square
+
+"""
+Pages of viewer.products.  The squares are part of the cached nodes so a
+write to either table invalidates them (see SquaresConfig.ready).
+"""
+
+products_cache = ResponseCache("products", models=(Product, Square))
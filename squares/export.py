@@ -0,0 +1,79 @@
+"""
+Streams the products of a search as csv or ndjson (see
+squares.views.ProductsExport).
+
+The rows are read with a server side cursor (iterator with a chunk_size)
+as tuples of the ProductSerializer fields and formatted by the compiled
+version of the serializer, so no model instance is created and memory
+stays the same however many rows are exported.
+
+Django 3.1 iterates a streaming response on the event loop of the ASGI
+app, where the ORM refuses to run.  There the chunks are read by a thread
+of their own (see read_in_thread).
+"""
+import csv
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.db import connections
+from graphene_extras.async_execution import in_event_loop
+
+from squares.serializers import compiled_product_serializer as serializer
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def row_chunks(queryset, chunk_size):
+    """
+    Lists of the rows, chunk_size at a time.
+    """
+    rows = serializer.values_list(queryset).iterator(chunk_size=chunk_size)
+    while chunk := list(islice(rows, chunk_size)):
+        yield chunk
+
+
+def csv_chunks(chunks):
+    yield ','.join(serializer.fields) + '\r\n'
+    to_values = serializer.to_values
+    for rows in chunks:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(map(to_values, rows))
+        yield buffer.getvalue()
+
+
+def ndjson_chunks(chunks):
+    to_representation = serializer.to_representation
+    for rows in chunks:
+        yield ''.join(
+            json.dumps(to_representation(row)) + '\n' for row in rows
+        )
+
+
+def read_in_thread(chunks):
+    """
+    chunks, each read by the same thread which isn't the event loop's.
+    The thread has its own database connection, closed at the end.
+    """
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="export") as thread:
+        try:
+            while (chunk := thread.submit(next, chunks, None).result()) is not None:
+                yield chunk
+        finally:
+            thread.submit(chunks.close).result()
+            thread.submit(connections.close_all).result()
+
+
+def export_chunks(queryset, format, chunk_size):
+    writer = csv_chunks if format == 'csv' else ndjson_chunks
+    chunks = writer(row_chunks(queryset, chunk_size))
+    # the view returns before the response is iterated, and where it is
+    # iterated is only known then
+    if in_event_loop():
+        yield from read_in_thread(chunks)
+    else:
+        yield from chunks
@@ -0,0 +1,25 @@
+"""
+Formatting of product values for the UI.  Shared by the graphql nodes and
+the serializers so a value looks the same everywhere.
+
+Dates repeat a lot in a page of products so the formatted strings are
+cached per date rather than calling strftime for every row.
+"""
+from functools import lru_cache
+
+from squares.models import Product
+
+DURATION_LABELS = dict(Product.durations)
+
+
+@lru_cache(maxsize=4096)
+def format_date(date):
+    return date.strftime('%d %b %y')
+
+
+def format_datetime(datetime):
+    return format_date(datetime.date())
+
+
+def duration_label(duration):
+    return DURATION_LABELS.get(duration)
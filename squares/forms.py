@@ -1,4 +1,8 @@
+from datetime import datetime, time, timedelta
+
 from django import forms
+from django.db.models import Q
+from django.utils import timezone
 from squares.models import Product
 
 """
@@ -25,6 +29,10 @@ for td, label in Product.durations:
         (td.total_seconds(), label)
     )
 
+def start_of_day(date):
+    return timezone.make_aware(datetime.combine(date, time.min))
+
+
 class ProductSearchForm(forms.Form):
     from_square = forms.IntegerField()
     to_square = forms.IntegerField()
@@ -37,11 +45,96 @@ class ProductSearchForm(forms.Form):
     duration = forms.MultipleChoiceField(choices=duration_choices)
     listing = forms.MultipleChoiceField(choices=Product.listings)
 
+    # field -> lookup.  to dates are exclusive of the next day so the whole
+    # day is included and the column is compared as is, which keeps the
+    # index usable.
+    lookups = {
+        'from_square': 'square_id__gte',
+        'to_square': 'square_id__lte',
+        'from_price': 'price__gte',
+        'to_price': 'price__lte',
+        'from_start_date': 'start__gte',
+        'to_start_date': 'start__lt',
+        'from_end_date': 'end__gte',
+        'to_end_date': 'end__lt',
+        'duration': 'duration__in',
+        'listing': 'listing__in',
+    }
+
+    # (from, to) of each range
+    ranges = [
+        ('from_square', 'to_square'),
+        ('from_price', 'to_price'),
+        ('from_start_date', 'to_start_date'),
+        ('from_end_date', 'to_end_date'),
+    ]
+
+    # the fields of ProductNodeInput which are named differently
+    input_names = {
+        'from_start': 'from_start_date',
+        'to_start': 'to_start_date',
+        'from_end': 'from_end_date',
+        'to_end': 'to_end_date',
+    }
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         for k, field in self.fields.items():
             field.required = False
 
-    # # for ui testing non field form errors
-    # def clean(self):
-    #     raise forms.ValidationError("some error!")
\ No newline at end of file
+    def clean_from_start_date(self):
+        if d := self.cleaned_data['from_start_date']:
+            return start_of_day(d)
+
+    def clean_to_start_date(self):
+        if d := self.cleaned_data['to_start_date']:
+            return start_of_day(d + timedelta(days=1))
+
+    def clean_from_end_date(self):
+        if d := self.cleaned_data['from_end_date']:
+            return start_of_day(d)
+
+    def clean_to_end_date(self):
+        if d := self.cleaned_data['to_end_date']:
+            return start_of_day(d + timedelta(days=1))
+
+    def clean_duration(self):
+        durations = {float(d) for d in self.cleaned_data['duration']}
+        # every choice is the same as no choice
+        if durations == {td.total_seconds() for td, label in Product.durations}:
+            return []
+        return [timedelta(seconds=d) for d in sorted(durations)]
+
+    def clean_listing(self):
+        listings = set(self.cleaned_data['listing'])
+        if listings == {value for value, label in Product.listings}:
+            return []
+        return sorted(listings)
+
+    def get_filters(self):
+        """
+        A Q with a predicate for only the fields which were set.  Values
+        are normalised in clean so the same search always gives the same
+        SQL.  Call after is_valid.
+        """
+        filters = {}
+        for field, lookup in self.lookups.items():
+            value = self.cleaned_data.get(field)
+            if value is None or value == [] or value == '':
+                continue
+            filters[lookup] = value
+        return Q(**filters)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        # an inverted range would just find nothing
+        for lower, upper in self.ranges:
+            from_value = cleaned_data.get(lower)
+            to_value = cleaned_data.get(upper)
+            if from_value is None or to_value is None:
+                continue
+            # the to dates are the start of the day after (see clean_to_start_date)
+            if from_value > to_value or (
+                    isinstance(from_value, datetime) and from_value == to_value):
+                self.add_error(upper, "Must not be less than the from value.")
+        return cleaned_data
\ No newline at end of file
@@ -1,15 +1,76 @@
 import random
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from squares.models import Square, Product
 
+"""
+Rows for seeding the database (see manage.py seed).
 
-def create_squares(n):
+random_products gives values spread the way real listings are, so that the
+search filters select realistic fractions of the table -
+
+    price       log normal, most in the hundreds to thousands, a long tail
+                up to 1,000,000
+    start       any day of the period, mostly in working hours
+    duration    1 and 7 days the most common
+    listing     70% lease
+    square      a few squares have many products, most have a few
+"""
+
+DURATION_WEIGHTS = [35, 15, 10, 5, 5, 5, 25]
+LISTING_WEIGHTS = [70, 30]  # lease, sale
+# hours of the day; most listings start in working hours
+HOUR_WEIGHTS = [1] * 8 + [6] * 10 + [2] * 6
+
+
+def random_price(rng):
+    return min(1000000, max(1, int(rng.lognormvariate(7.5, 1.6))))
+
+
+def random_start(rng, epoch, days):
+    hour = rng.choices(range(24), HOUR_WEIGHTS)[0]
+    return epoch + timedelta(
+        days=rng.randrange(days),
+        hours=hour,
+        minutes=rng.choice((0, 15, 30, 45))
+    )
+
+
+def random_squares(rng, n):
+    return [Square(ad_url=f"https://www.example.com/ad/{rng.getrandbits(32):x}") for i in range(n)]
+
+
+def random_products(rng, n, square_ids, epoch=None, days=365):
+    """
+    n products for the squares with the pks in the range square_ids.
+    """
+    epoch = epoch or datetime(2021, 1, 1, tzinfo=timezone.utc)
+    durations = [td for td, label in Product.durations]
+    listings = [value for value, label in Product.listings]
+    products = []
+    for i in range(n):
+        start = random_start(rng, epoch, days)
+        duration = rng.choices(durations, DURATION_WEIGHTS)[0]
+        products.append(
+            Product(
+                # skewed towards the first squares
+                square_id=square_ids[int(len(square_ids) * rng.random() ** 2)],
+                price=random_price(rng),
+                start=start,
+                duration=duration,
+                end=start + duration,
+                listing=rng.choices(listings, LISTING_WEIGHTS)[0],
+            )
+        )
+    return products
+
+
+def create_squares(n, batch_size=10000):
     squares = []
     for i in range(n):
         squares.append(Square(ad_url="www.google.com"))
-    return Square.objects.bulk_create(squares)
+    return Square.objects.bulk_create(squares, batch_size=batch_size)
 
-def create_products(squares):
+def create_products(squares, batch_size=10000):
     products = []
     listings = ['l', 's']
     for i, s in enumerate(squares):
@@ -25,4 +86,4 @@ def create_products(squares):
             price=random.randint(1, 1000000)
         )
         products.append(p)
-    return Product.objects.bulk_create(products)
+    return Product.objects.bulk_create(products, batch_size=batch_size)
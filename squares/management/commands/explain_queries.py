@@ -0,0 +1,126 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from graphene_django.settings import graphene_settings
+from graphql import parse
+from graphql.error import GraphQLSyntaxError
+from graphql.utils.get_operation_ast import get_operation_ast
+
+"""
+Replays recorded graphql operations against the schema, runs EXPLAIN on
+every SELECT they generate and reports the ones which scan a whole table
+or index.  The recorded operations are a file of JSON lines e.g.
+
+    {"query": "query LoadProducts ($first: Int) {...}", "variables": {"first": 10}}
+
+    python3 manage.py explain_queries recorded_queries.jsonl
+
+Only query operations are replayed; mutations are skipped.  Each replay runs
+in a transaction which is rolled back, so nothing it does is kept.
+"""
+
+
+def explain(sql):
+    if connection.vendor == 'sqlite':
+        statement = "EXPLAIN QUERY PLAN " + sql
+    elif connection.vendor == 'mysql':
+        statement = "EXPLAIN FORMAT=TRADITIONAL " + sql
+    else:
+        statement = "EXPLAIN " + sql
+    with connection.cursor() as cursor:
+        cursor.execute(statement)
+        rows = cursor.fetchall()
+    if connection.vendor == 'sqlite':
+        # (id, parent, notused, detail)
+        return [row[-1] for row in rows]
+    if connection.vendor == 'mysql':
+        # the access type is the fifth column; ALL is a full table scan
+        return [f"{row[2]} type={row[4]} key={row[6]}" for row in rows]
+    return [row[0] for row in rows]
+
+
+def is_full_scan(line):
+    if connection.vendor == 'sqlite':
+        # "SCAN t" reads the table, "SCAN t USING INDEX i" reads all of an
+        # index.  "SEARCH t USING INDEX i (a>?)" is a range scan.
+        return line.startswith("SCAN ")
+    if connection.vendor == 'mysql':
+        return "type=ALL" in line or "type=index" in line
+    return "Seq Scan" in line
+
+
+def operation_type(operation):
+    """
+    query, mutation or subscription, None if the operation can't be found.
+    """
+    try:
+        document = parse(operation['query'])
+    except GraphQLSyntaxError:
+        return
+    if ast := get_operation_ast(document, operation.get('operationName')):
+        return ast.operation
+
+
+def read_operations(path):
+    with open(path) as f:
+        for i, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield i, json.loads(line)
+            except ValueError as e:
+                raise CommandError(f"Line {i} of {path} is not JSON: {e}")
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the SQL generated by recorded graphql operations and report full scans"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="JSON lines file of recorded operations")
+        parser.add_argument(
+            '--full-scans-only',
+            action='store_true',
+            help="Only print the queries which do a full scan"
+        )
+
+    def handle(self, *args, **options):
+        schema = graphene_settings.SCHEMA
+        total = full_scans = 0
+
+        for line_number, operation in read_operations(options['path']):
+            name = operation.get('operationName') or f"line {line_number}"
+            if (kind := operation_type(operation)) != 'query':
+                self.stderr.write(f"{name}: skipped, not a query ({kind})")
+                continue
+            with transaction.atomic(), CaptureQueriesContext(connection) as ctx:
+                result = schema.execute(
+                    operation['query'],
+                    variables=operation.get('variables') or {},
+                    operation_name=operation.get('operationName'),
+                )
+                transaction.set_rollback(True)
+            if result.errors:
+                self.stderr.write(f"{name}: {result.errors}")
+
+            for query in ctx.captured_queries:
+                sql = query['sql']
+                if not sql.lstrip().upper().startswith('SELECT'):
+                    continue
+                total += 1
+                plan = explain(sql)
+                scans = [line for line in plan if is_full_scan(line)]
+                full_scans += bool(scans)
+                if options['full_scans_only'] and not scans:
+                    continue
+                style = self.style.WARNING if scans else self.style.SUCCESS
+                self.stdout.write(style(f"{name} ({query['time']}s)"))
+                self.stdout.write(f"  {sql}")
+                for line in plan:
+                    marker = "[full scan] " if is_full_scan(line) else ""
+                    self.stdout.write(f"    {marker}{line}")
+
+        self.stdout.write(
+            f"{full_scans} of {total} queries do a full scan")
@@ -0,0 +1,139 @@
+import multiprocessing
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router
+from django.db.models import Max, Min
+from people.helpers import random_people
+from people.models import Person
+
+from squares.helpers import random_products, random_squares
+from squares.models import Product, Square
+
+"""
+Fills the database with random squares, products and people, batch_size
+rows per INSERT, and reports the rows per second e.g.
+
+    python3 manage.py seed --squares 1000000 --products 10000000 --people 100000
+
+Every batch has a random generator of its own, seeded from --seed, the
+model and the number of the batch, so the same arguments give the same
+rows however many workers there are (though with workers not in the same
+order).  The distributions of the values are
+described in squares.helpers.
+
+--workers N writes the batches from N processes, each with its own
+connection, for a database which takes writes at the same time e.g.
+postgres.  Not sqlite, which has one writer at a time.
+"""
+
+
+def write_batch(task):
+    """
+    Writes one batch, in a worker or not.  Returns the number of rows.
+    """
+    model, number, size, seed, extra = task
+    rng = random.Random(f"{seed}:{model}:{number}")
+    if model == 'squares':
+        objs = random_squares(rng, size)
+    elif model == 'products':
+        objs = random_products(rng, size, extra)
+    else:
+        run, start = extra
+        objs = random_people(rng, [f"{run}-{i}" for i in range(start, start + size)])
+    objs[0].__class__.objects.bulk_create(objs)
+    return size
+
+
+def square_ids():
+    """
+    The pks of the squares - a range if there are no gaps.
+    """
+    bounds = Square.objects.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        raise CommandError("There are no squares for the products")
+    ids = range(bounds['low'], bounds['high'] + 1)
+    if Square.objects.count() != len(ids):
+        ids = list(Square.objects.order_by('pk').values_list('pk', flat=True))
+    return ids
+
+
+class Command(BaseCommand):
+    help = "Fill the database with random squares, products and people"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--squares', type=int, default=0)
+        parser.add_argument('--products', type=int, default=0)
+        parser.add_argument('--people', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help="Processes to write the batches from, each with its own connection"
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError("--batch-size must be at least 1")
+        seed = options['seed']
+        # people need unique identifiers which don't clash with earlier runs
+        run = f"{int(time.time()):x}"
+
+        pool = None
+        if options['workers'] > 1:
+            for model in (Square, Product, Person):
+                if connections[router.db_for_write(model)].vendor == 'sqlite':
+                    raise CommandError(
+                        "sqlite takes one write at a time so --workers "
+                        "needs a database like postgres")
+            # the workers are forked and must not share the connections
+            connections.close_all()
+            pool = multiprocessing.get_context('fork').Pool(options['workers'])
+        try:
+            for model, count in (
+                ('squares', options['squares']),
+                ('products', options['products']),
+                ('people', options['people']),
+            ):
+                if count < 1:
+                    continue
+                extra = None
+                if model == 'products':
+                    extra = square_ids()
+                tasks = []
+                for number, start in enumerate(range(0, count, batch_size)):
+                    size = min(batch_size, count - start)
+                    if model == 'people':
+                        extra = (run, start)
+                    tasks.append((model, number, size, seed, extra))
+                self.write(model, tasks, pool, options['verbosity'])
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+    def write(self, model, tasks, pool, verbosity):
+        total = sum(task[2] for task in tasks)
+        if pool is not None:
+            # the parent's connection was closed above and may be reopened
+            # e.g. by square_ids, so close it again before the workers run
+            connections.close_all()
+            results = pool.imap_unordered(write_batch, tasks)
+        else:
+            results = map(write_batch, tasks)
+        start = time.perf_counter()
+        written = 0
+        for rows in results:
+            written += rows
+            if verbosity > 1:
+                elapsed = time.perf_counter() - start
+                self.stdout.write(
+                    f"  {model}: {written:,} of {total:,} ({written / elapsed:,.0f} rows/s)")
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"{model}: {written:,} rows in {elapsed:.1f}s ({written / elapsed:,.0f} rows/s)"
+        ))
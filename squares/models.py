@@ -25,4 +25,20 @@ class Product(models.Model):
     start = models.DateTimeField()
     duration = models.DurationField(choices=durations)
     end = models.DateTimeField()
-    listing = models.CharField(choices=listings, max_length=1)
\ No newline at end of file
+    listing = models.CharField(choices=listings, max_length=1)
+
+    class Meta:
+        # The product search filters on ranges of price, start and end and
+        # on sets of duration and listing, and sorts on any column with the
+        # id last.  The id in each index means the index also serves the
+        # ordering and the cursor filter of a page.  square already has the
+        # index of its foreign key.
+        indexes = [
+            models.Index(fields=['price', 'id'], name='product_price_idx'),
+            models.Index(fields=['start', 'id'], name='product_start_idx'),
+            models.Index(fields=['end', 'id'], name='product_end_idx'),
+            models.Index(fields=['duration', 'start', 'id'],
+                         name='product_duration_start_idx'),
+            models.Index(fields=['listing', 'price', 'id'],
+                         name='product_listing_price_idx'),
+        ]
\ No newline at end of file
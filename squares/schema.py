@@ -1,20 +1,26 @@
 import json
 from collections.abc import Iterable
-from datetime import date, timedelta
+from datetime import timedelta
 from functools import partial
 
 import graphene
-from django.db.models import Case, CharField, F, Value, When
-from django.db.models.functions import (Concat, ExtractDay, ExtractMonth,
-                                        ExtractYear)
 from django_filters import FilterSet, OrderingFilter
 from graphene.relay.connection import PageInfo
 from graphene_django import DjangoObjectType
 from graphene_django.filter import DjangoFilterConnectionField
+from graphene_extras.dataloaders import (foreign_key_resolver,
+                                         reverse_foreign_key_resolver)
+from graphene_extras.optimizer import optimize_queryset
+from graphene_extras.pagination.proper_cursors import (attr_from_sort,
+                                                       connection_from_queryset,
+                                                       limit_page_size)
 from graphene_extras.pagination.ui import PaginationConnection
-from graphql_relay import connection_from_list
+from graphene_extras.response_cache import (dump_connection, load_connection,
+                                            queryset_columns)
 
-from squares.forms import ProductSearchForm, duration_choices
+from squares.cache import products_cache
+from squares.formatters import duration_label, format_datetime
+from squares.forms import ProductSearchForm
 from squares.models import Product, Square
 from squares.serializers import ProductSerializer
 
@@ -76,40 +82,20 @@ class SquareNode(DjangoObjectType):
         interfaces = (graphene.relay.Node,)
         filterset_class = SquareFilter
     pk = graphene.ID(source='pk', required=True)
+    products = graphene.List(graphene.NonNull(lambda: ProductNode))
+
+    # one query for the products of every square of the page, and their
+    # squares one more (resolve_square), rather than one per square
+    resolve_products = reverse_foreign_key_resolver(Product.square.field)
 
 
 """
 The UI values for fields start, end and duration are different to the DB values.
-We need to create extra fields on the db query which map to the same field
-names on the DjangoObjectType.
+They are formatted in python by the resolvers below and only for the rows,
+and fields, which are actually asked for.
 """
 
 
-def get_month_name_for_field(field_name):
-    months = {
-        'Jan': 1,
-        'Feb': 2,
-        'Mar': 3,
-        'Apr': 4,
-        'May': 5,
-        'Jun': 6,
-        'Jul': 7,
-        'Aug': 8,
-        'Sep': 9,
-        'Oct': 10,
-        'Nov': 11,
-        'Dec': 12
-    }
-    whens = []
-    for m, i in months.items():
-        kwargs = {
-            field_name: i,
-            'then': Value(m, output_field=CharField())
-        }
-        whens.append(When(**kwargs))
-    return Case(*whens)
-
-
 class ProductNode(DjangoObjectType):
     class Meta:
         model = Product
@@ -122,23 +108,41 @@ class ProductNode(DjangoObjectType):
     duration_ui = graphene.String()
     end_ui = graphene.String()
 
+    # the columns the resolvers of the UI fields need (see optimize_queryset)
+    field_dependencies = {
+        'start_ui': ('start',),
+        'end_ui': ('end',),
+        'duration_ui': ('duration',),
+    }
+
+    # one query for the squares of the whole page rather than one per product
+    resolve_square = foreign_key_resolver(Product.square.field)
+
     def resolve_start_ui(root, info, **kwargs):
-        return root.start.strftime('%d %b %y')
+        return format_datetime(root.start)
 
     def resolve_end_ui(root, info, **kwargs):
-        return root.start.strftime('%d %b %y')
+        return format_datetime(root.end)
+
+    def resolve_duration_ui(root, info, **kwargs):
+        return duration_label(root.duration)
 
 
 class PaginateProductConnection(PaginationConnection):
     class Meta:
         node = ProductNode
 
-
-def order_queryset(q, **kwargs):
-    if order_by := kwargs.get('orderBy'):
-        order_by = order_by.split(',')
-        q = q.order_by(*order_by)
-    return q
+    @classmethod
+    def get_sort(cls, **kwargs):
+        sort = []
+        if order_by := kwargs.get('orderBy'):
+            sort = order_by.split(',')
+        # the pk makes the ordering unique which proper cursors rely on.
+        # It follows the direction of the last column so a sort with a
+        # single direction can be filtered with a row value comparison.
+        if not any(attr_from_sort(x) in ('pk', 'id') for x in sort):
+            sort.append('-pk' if sort and sort[-1][0] == '-' else 'pk')
+        return sort
 
 
 # This approach does not work because django_graphene wants a model instance
@@ -159,17 +163,6 @@ def order_queryset(q, **kwargs):
 """
 
 
-def choices_display(field_name, choices):
-    whens = []
-    for value, label in choices:
-        kwargs = {
-            field_name: value,
-            "then": Value(label, output_field=CharField())
-        }
-        whens.append(When(**kwargs))
-    return Case(*whens)
-
-
 class Duration(graphene.Enum):
     d1 = timedelta(days=1).total_seconds()
     d2 = timedelta(days=2).total_seconds()
@@ -198,6 +191,15 @@ class ProductNodeInput(graphene.InputObjectType):
     listing = graphene.List(Listing)
 
 
+def form_data_from_input(product_node_input):
+    # The date fields of the input are named differently to the form
+    names = ProductSearchForm.input_names
+    return {
+        names.get(field, field): value
+        for field, value in product_node_input.items()
+    }
+
+
 class ConnectionFieldWithErrors(graphene.relay.ConnectionField):
 
     @classmethod
@@ -210,19 +212,48 @@ class ConnectionFieldWithErrors(graphene.relay.ConnectionField):
             'Received "{}"'
         ).format(connection_type, resolved)
 
-        queryset = resolved["queryset"]
+        args = limit_page_size(args, connection_type._meta.name)
+        sort = connection_type.get_sort(**args)
+        queryset = resolved["queryset"].order_by(*sort)
         form_errors = resolved["form_errors"]
 
-        connection = connection_from_list(
+        # a write starts a new count of the total too
+        generations = products_cache.generations()
+        if products_cache.enabled and not form_errors:
+            cache_key = products_cache.key(
+                resolved["search"],
+                sort,
+                [args.get(x) for x in ('first', 'last', 'after', 'before')],
+                queryset_columns(queryset),
+                generations=generations,
+            )
+            if (cached := products_cache.get(cache_key)) is not None:
+                connection = load_connection(
+                    cached, connection_type, connection_type.Edge, PageInfo)
+            else:
+                connection = cls.page(connection_type, args, queryset, sort)
+                products_cache.set(cache_key, dump_connection(connection))
+        else:
+            connection = cls.page(connection_type, args, queryset, sort)
+
+        connection.iterable = queryset
+        connection.sort = sort
+        connection.count_version = generations
+        connection.form_errors = form_errors
+        return connection
+
+    @staticmethod
+    def page(connection_type, args, queryset, sort):
+        # the client pages with the cursors of the edges and of pages, all
+        # proper cursors, so every page is a range scan
+        return connection_from_queryset(
             queryset,
             args,
+            sort,
             connection_type=connection_type,
             edge_type=connection_type.Edge,
             pageinfo_type=PageInfo,
         )
-        connection.iterable = queryset
-        connection.form_errors = form_errors
-        return connection
 
 
 class ViewerNode(graphene.ObjectType):
@@ -240,97 +271,36 @@ class ViewerNode(graphene.ObjectType):
 
     def resolve_products(root, info, **kwargs):
         """
-        After writing this I remembered the django object field value can be
-        overwritten with resolve_<field_name> lol
-
-        Anyway, we still need the three fields -
-
-            start_ui
-            duration_ui
-            end_ui
-
-        Because we want to return a str and start and end have to return
-        datetime objects.  And obj.duration is not nice.  Easier to just
-        return the right value from the DB.
-
-        So the start_ui and end_ui fields are now obsolete in this query.
-        I still include them for the sake of learning.
+        The UI fields - start_ui, duration_ui and end_ui - used to be
+        annotations computed by the database for every row.  They are
+        resolved on ProductNode now so this is a plain select.
         """
 
-        q = (
-            Product
-            .objects
-            .annotate(start_month=ExtractMonth('start'))
-            .annotate(end_month=ExtractMonth('end'))
-            .annotate(start_month_name=get_month_name_for_field('start_month'))
-            .annotate(end_month_name=get_month_name_for_field('end_month'))
-            .annotate(start_ui=Concat(
-                ExtractDay('start'),
-                Value('-'),
-                F('start_month_name'),
-                Value('-'),
-                ExtractYear('start'),
-                output_field=CharField()
-            )
-            )
-            .annotate(end_ui=Concat(
-                ExtractDay('end'),
-                Value('-'),
-                F('end_month_name'),
-                Value('-'),
-                ExtractYear('end'),
-                output_field=CharField()
-            )
-            )
-            .annotate(duration_ui=choices_display('duration', Product.durations))
+        sort = PaginateProductConnection.get_sort(**kwargs)
+        q = optimize_queryset(
+            Product.objects.all(),
+            info,
+            ProductNode,
+            extra_fields=[attr_from_sort(x) for x in sort]
         )
 
         form_errors = {}
+        # the normalised lookups of the search, which key the cached pages
+        search = []
 
         if formData := kwargs.get('formData'):
-            form = ProductSearchForm(data=formData)
+            form = ProductSearchForm(data=form_data_from_input(formData))
             if form.is_valid():
-                default_search = {
-                    "from_square": 1,
-                    "to_square": 1000,
-                    "from_price": 0,
-                    "to_price": 1000000,
-                    "from_start_date": date(1900, 1, 1),
-                    "to_start_date": date(2030, 1, 1),
-                    "from_end_date": date(1900, 1, 1),
-                    "to_end_date": date(2030, 1, 1),
-                    "duration": [str(d[0]) for d in duration_choices],
-                    "listing": [l[0] for l in Product.listings]
-                }
-                cleaned_data = {k: v for k,
-                                v in form.cleaned_data.items() if v}
-                filters = {}
-                filters.update(default_search)
-                filters.update(cleaned_data)
-                duration = []
-                for d in filters["duration"]:
-                    duration.append(timedelta(seconds=float(d)))
-                filters["duration"] = duration
-                q = (
-                    q
-                    .filter(square_id__gte=filters["from_square"])
-                    .filter(square_id__lte=filters["to_square"])
-                    .filter(price__gte=filters["from_price"])
-                    .filter(price__lte=filters["to_price"])
-                    .filter(start__gte=filters["from_start_date"])
-                    .filter(start__lte=filters["to_start_date"])
-                    .filter(end__gte=filters["from_end_date"])
-                    .filter(end__lte=filters["to_end_date"])
-                    .filter(duration__in=filters["duration"])
-                    .filter(listing__in=filters["listing"])
-                )
+                filters = form.get_filters()
+                q = q.filter(filters)
+                search = filters.children
             else:
                 form_errors = form.errors
                 q = q.none()
-        q = order_queryset(q, **kwargs)
         return {
             "queryset": q,
-            "form_errors": form_errors
+            "form_errors": form_errors,
+            "search": search
         }
 
 
@@ -1,3 +1,711 @@
-from django.test import TestCase
+import datetime
+import random
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import graphene
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from graphene_django.settings import graphene_settings
+from graphql import parse
+
+from graphene_extras.complexity import estimate_cost
+from graphene_extras.pagination.cursor_codec import (InvalidCursor,
+                                                     decode_cursor,
+                                                     decode_values,
+                                                     encode_values)
+from graphene_extras.pagination.page_cursors import page_cursors
+from graphene_extras.pagination.proper_cursors import (QuerysetConnectionField,
+                                                       connection_from_queryset,
+                                                       count_before_cursor,
+                                                       cursor_string_from_obj,
+                                                       filter_queryset,
+                                                       reverse_sort)
+from graphene_extras.pagination.ui import PaginationConnection
+from proj.schema import schema
+from squares.forms import ProductSearchForm
+from squares.models import Product, Square
+from squares.schema import PaginateProductConnection, ProductNode
+
+EPOCH = datetime.datetime(2021, 3, 1, tzinfo=datetime.timezone.utc)
+
+SORTS = [
+    "price",
+    "-price",
+    # mixed directions
+    "listing,-price",
+    "-duration,start",
+    # across a relation
+    "square__ad_url,-price",
+    "-square__ad_url,start",
+]
+
+
+def create_products(n, seed=0):
+    """
+    Products with few distinct values in every column so every sort has
+    plenty of ties.
+    """
+    rng = random.Random(seed)
+    squares = Square.objects.bulk_create([
+        Square(ad_url=f"https://example.com/{i}") for i in range(4)
+    ])
+    squares = list(Square.objects.all())
+    products = []
+    for i in range(n):
+        start = EPOCH + datetime.timedelta(days=rng.randrange(5))
+        duration = datetime.timedelta(days=rng.randrange(1, 4))
+        products.append(Product(
+            square=rng.choice(squares),
+            price=rng.choice([100, 200, 300]),
+            start=start,
+            duration=duration,
+            end=start + duration,
+            listing=rng.choice("ls"),
+        ))
+    Product.objects.bulk_create(products)
+
+
+def cursor_at(ordered, index, sort):
+    """
+    The cursor of ordered[index] with its position, as the server makes it.
+    """
+    values = decode_values(cursor_string_from_obj(ordered[index], sort))
+    return encode_values(values, position=index)
+
+
+def get_sort(order_by):
+    return PaginateProductConnection.get_sort(orderBy=order_by)
+
+
+def page(qs, sort, **args):
+    return connection_from_queryset(
+        qs.order_by(*sort),
+        args,
+        sort,
+        connection_type=PaginateProductConnection,
+        edge_type=PaginateProductConnection.Edge,
+    )
+
+
+def page_forwards(qs, sort, size):
+    ids, after = [], None
+    while True:
+        connection = page(qs, sort, first=size, after=after)
+        ids += [edge.node.pk for edge in connection.edges]
+        if not connection.page_info.has_next_page:
+            return ids
+        after = connection.page_info.end_cursor
+
+
+def page_backwards(qs, sort, size):
+    ids, before = [], None
+    while True:
+        connection = page(qs, sort, last=size, before=before)
+        ids = [edge.node.pk for edge in connection.edges] + ids
+        if not connection.page_info.has_previous_page:
+            return ids
+        before = connection.page_info.start_cursor
+
+
+class KeysetPagingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_products(97)
+
+    def expected(self, sort, qs=None):
+        qs = Product.objects.all() if qs is None else qs
+        return list(qs.order_by(*sort).values_list("pk", flat=True))
+
+    def test_forwards(self):
+        for row_values in (True, False):
+            for order_by in SORTS:
+                sort = get_sort(order_by)
+                with self.subTest(order_by=order_by, row_values=row_values), \
+                        override_settings(GRAPHENE_EXTRAS={"ROW_VALUE_CURSORS": row_values}):
+                    self.assertEqual(
+                        page_forwards(Product.objects.all(), sort, 10),
+                        self.expected(sort))
+
+    def test_backwards(self):
+        for order_by in SORTS:
+            sort = get_sort(order_by)
+            with self.subTest(order_by=order_by):
+                self.assertEqual(
+                    page_backwards(Product.objects.all(), sort, 10),
+                    self.expected(sort))
+
+    def test_filtered(self):
+        qs = Product.objects.filter(listing="l", price__gte=200)
+        sort = get_sort("-start,price")
+        self.assertEqual(page_forwards(qs, sort, 7), self.expected(sort, qs))
+
+    def test_page_info(self):
+        sort = get_sort("price")
+        connection = page(Product.objects.all(), sort, first=10)
+        self.assertTrue(connection.page_info.has_next_page)
+        self.assertFalse(connection.page_info.has_previous_page)
+        self.assertEqual(connection.start_index, 0)
+
+        last = page(Product.objects.all(), sort, last=10)
+        self.assertEqual(
+            [edge.node.pk for edge in last.edges], self.expected(sort)[-10:])
+        self.assertTrue(last.page_info.has_previous_page)
+        self.assertFalse(last.page_info.has_next_page)
+
+    def test_each_page_is_one_query(self):
+        sort = get_sort("square__ad_url,-price")
+        after = page(Product.objects.all(), sort, first=10).page_info.end_cursor
+        with self.assertNumQueries(1):
+            connection = page(Product.objects.all(), sort, first=10, after=after)
+            [edge.cursor for edge in connection.edges]
+
+    def test_cursor_of_edge_matches_object(self):
+        sort = get_sort("-square__ad_url,start")
+        connection = page(Product.objects.all(), sort, first=5)
+        ordered = list(Product.objects.order_by(*sort))
+        for i, edge in enumerate(connection.edges):
+            self.assertEqual(edge.cursor, cursor_at(ordered, i, sort))
+
+    def test_positions(self):
+        # the index of the first row comes from the cursor, not a count
+        sort = get_sort("listing,-price")
+        ordered = list(Product.objects.order_by(*sort))
+        forwards = page(Product.objects.all(), sort, first=10)
+        self.assertEqual(forwards.start_index, 0)
+        forwards = page(
+            Product.objects.all(), sort, first=10, after=forwards.page_info.end_cursor)
+        self.assertEqual(forwards.start_index, 10)
+        self.assertEqual(forwards.page_info.end_cursor, cursor_at(ordered, 19, sort))
+        backwards = page(
+            Product.objects.all(), sort, last=5, before=forwards.page_info.start_cursor)
+        self.assertEqual(backwards.start_index, 5)
+        self.assertEqual(backwards.page_info.start_cursor, cursor_at(ordered, 5, sort))
+        # without a position there is none to carry on
+        without = page(
+            Product.objects.all(), sort, first=5,
+            after=cursor_string_from_obj(ordered[3], sort))
+        self.assertFalse(hasattr(without, "start_index"))
+
+    def test_cursor_for_another_sort(self):
+        cursor = page(Product.objects.all(), get_sort("price"), first=5).page_info.end_cursor
+        with self.assertRaises(InvalidCursor):
+            page(Product.objects.all(), get_sort("listing,-price"), first=5, after=cursor)
+
+
+class NullSortTests(TestCase):
+    """
+    square is a nullable foreign key and the table sorts by square_id.
+    """
+    sorts = ["square_id", "-square_id", "square__ad_url,-price", "-square__ad_url,start",
+             "square_id,-price"]
+
+    @classmethod
+    def setUpTestData(cls):
+        create_products(60)
+        ids = list(Product.objects.values_list("pk", flat=True))
+        Product.objects.filter(pk__in=ids[::3]).update(square=None)
+
+    def expected(self, sort):
+        return list(Product.objects.order_by(*sort).values_list("pk", flat=True))
+
+    def test_forwards_and_backwards(self):
+        for row_values in (True, False):
+            for order_by in self.sorts:
+                sort = get_sort(order_by)
+                with self.subTest(order_by=order_by, row_values=row_values), \
+                        override_settings(GRAPHENE_EXTRAS={"ROW_VALUE_CURSORS": row_values}):
+                    self.assertEqual(
+                        page_forwards(Product.objects.all(), sort, 7), self.expected(sort))
+                    self.assertEqual(
+                        page_backwards(Product.objects.all(), sort, 7), self.expected(sort))
+
+    def test_cursor_on_null(self):
+        sort = get_sort("square_id")
+        ordered = list(Product.objects.order_by(*sort))
+        for i, product in enumerate(ordered):
+            connection = page(
+                Product.objects.all(), sort,
+                first=100, after=cursor_string_from_obj(product, sort))
+            self.assertEqual(
+                [edge.node.pk for edge in connection.edges], [p.pk for p in ordered[i + 1:]])
+
+    def test_nulls_largest(self):
+        # as postgres sorts them, checked against a python sort
+        sort = get_sort("-square_id,price")
+        # -square_id puts the NULLs, the largest, first
+        ordered = sorted(
+            Product.objects.all(),
+            key=lambda p: (p.square_id is not None, -(p.square_id or 0), p.price, p.pk),
+        )
+        with mock.patch.object(connection.features, "nulls_order_largest", True):
+            for i, product in enumerate(ordered):
+                cursor = cursor_string_from_obj(product, sort)
+                rows = filter_queryset(Product.objects.all(), cursor, sort)
+                self.assertEqual(
+                    set(rows.values_list("pk", flat=True)), {p.pk for p in ordered[i + 1:]})
+
+    def test_count_before_cursor(self):
+        for order_by in self.sorts:
+            sort = get_sort(order_by)
+            ordered = list(Product.objects.order_by(*sort))
+            with self.subTest(order_by=order_by):
+                for i in (0, 5, 19, 20, 21, 40, 59):
+                    cursor = cursor_string_from_obj(ordered[i], sort)
+                    self.assertEqual(
+                        count_before_cursor(Product.objects.all(), cursor, sort), i)
+
+    def test_page_cursors(self):
+        for order_by in self.sorts:
+            sort = get_sort(order_by)
+            qs = Product.objects.order_by(*sort)
+            ordered = list(qs)
+            with self.subTest(order_by=order_by):
+                cursors = page_cursors(
+                    qs, sort, 7, [3, 4, 5, 6, 7], last_page=9, total=60,
+                    start_index=28, start_cursor=cursor_string_from_obj(ordered[28], sort))
+                self.assertEqual(sorted(cursors), [3, 4, 5, 6, 7, 9])
+                for number, cursor in cursors.items():
+                    self.assertEqual(cursor, cursor_at(ordered, (number - 1) * 7 - 1, sort))
+
+
+class CursorCodecTests(TestCase):
+    values = [
+        None, True, False, 0, -1, 2 ** 70, -(2 ** 70), 1.5, Decimal("-12.340"),
+        "", "a|b", "ünïcødé",
+        datetime.date(2021, 3, 1),
+        datetime.datetime(2021, 3, 1, 12, 30, 15, 123456),
+        datetime.datetime(1960, 3, 1, 12, 30, tzinfo=datetime.timezone.utc),
+        datetime.timedelta(days=-3, microseconds=7),
+    ]
+
+    def test_round_trip(self):
+        for sign in (False, True):
+            cursor = encode_values(self.values, sign=sign)
+            with override_settings(GRAPHENE_EXTRAS={"SIGN_CURSORS": sign}):
+                self.assertEqual(decode_values(cursor), self.values)
+            for value in self.values:
+                self.assertIs(
+                    type(decode_values(encode_values([value], sign=sign))[0]),
+                    type(value))
+
+    def test_aware_datetimes_come_back_in_utc(self):
+        value = timezone.now().astimezone(datetime.timezone(datetime.timedelta(hours=5)))
+        [decoded] = decode_values(encode_values([value], sign=False))
+        self.assertEqual(decoded, value)
+        self.assertEqual(decoded.utcoffset(), datetime.timedelta(0))
+
+    def test_url_safe(self):
+        cursor = encode_values(["?" * 50, 2 ** 63], sign=False)
+        self.assertRegex(cursor, r"^[A-Za-z0-9_-]+$")
+
+    def test_malformed(self):
+        cursor = encode_values([1, "a"], sign=False)
+        for bad in ["", "!!!", "YXJyYXljb25uZWN0aW9uOjk", cursor[:-2], cursor + "AA"]:
+            with self.subTest(cursor=bad), self.assertRaises(InvalidCursor):
+                decode_values(bad)
+
+    def test_unknown_type(self):
+        with self.assertRaises(TypeError):
+            encode_values([object()])
+
+    @override_settings(GRAPHENE_EXTRAS={"SIGN_CURSORS": True})
+    def test_tampering(self):
+        cursor = encode_values([100, 7])
+        self.assertEqual(decode_values(cursor), [100, 7])
+
+        tampered = encode_values([100, 8], sign=False)
+        with self.assertRaises(InvalidCursor):
+            decode_values(tampered)
+
+        # the same values with the signature of other values
+        signed = encode_values([100, 8])
+        forged = signed[:len(cursor) - 22] + cursor[len(cursor) - 22:]
+        with self.assertRaises(InvalidCursor):
+            decode_values(forged)
+
+        # any change to the payload
+        for i in range(len(cursor) - 22):
+            changed = cursor[:i] + ("A" if cursor[i] != "A" else "B") + cursor[i + 1:]
+            with self.subTest(i=i), self.assertRaises(InvalidCursor):
+                decode_values(changed)
+
+    def test_position(self):
+        for sign in (False, True):
+            with override_settings(GRAPHENE_EXTRAS={"SIGN_CURSORS": sign}):
+                cursor = encode_values([1, "a"], position=12345)
+                self.assertEqual(decode_cursor(cursor), ([1, "a"], 12345))
+                self.assertEqual(decode_values(cursor), [1, "a"])
+                self.assertEqual(decode_cursor(encode_values([1, "a"])), ([1, "a"], None))
+
+    @override_settings(GRAPHENE_EXTRAS={"SIGN_CURSORS": True})
+    def test_position_is_signed(self):
+        cursor = encode_values([100, 7], position=3)
+        changed = encode_values([100, 7], position=4)
+        forged = changed[:len(changed) - 22] + cursor[len(cursor) - 22:]
+        with self.assertRaises(InvalidCursor):
+            decode_cursor(forged)
+
+    @override_settings(SECRET_KEY="another")
+    def test_signed_with_another_key(self):
+        with override_settings(SECRET_KEY="one"):
+            cursor = encode_values([1], sign=True)
+        with self.assertRaises(InvalidCursor):
+            decode_values(cursor)
+
+
+PRODUCTS = """
+query Products ($first: Int, $after: String, $orderBy: String, $pageSize: Int) {
+  viewer {
+    products (first: $first, after: $after, orderBy: $orderBy) {
+      edges { node { pk } cursor }
+      total
+      pages (pageSize: $pageSize) {
+        first { cursor pageNumber isCurrent }
+        previous { cursor pageNumber }
+        around { cursor pageNumber isCurrent }
+        last { cursor pageNumber }
+      }
+    }
+  }
+}
+"""
+
+
+@override_settings(GRAPHENE_EXTRAS={"RESPONSE_CACHE": None})
+class PageCursorsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_products(97)
+
+    def expected(self, sort):
+        return list(Product.objects.order_by(*sort).values_list("pk", flat=True))
+
+    def setUp(self):
+        cache.clear()
+
+    def assertPageCursors(self, cursors, ordered, sort, page_size):
+        for number, cursor in cursors.items():
+            # the last row of the page before
+            self.assertEqual(cursor, cursor_at(ordered, (number - 1) * page_size - 1, sort))
+
+    def test_page_cursors(self):
+        for order_by in SORTS:
+            sort = get_sort(order_by)
+            qs = Product.objects.order_by(*sort)
+            ordered = list(qs)
+            with self.subTest(order_by=order_by):
+                cursors = page_cursors(qs, sort, 10, [1, 2, 3, 4, 5], last_page=10)
+                self.assertEqual(sorted(cursors), [2, 3, 4, 5, 10])
+                self.assertPageCursors(cursors, ordered, sort, 10)
+
+    def test_page_cursors_from_the_current_page(self):
+        for order_by in SORTS:
+            sort = get_sort(order_by)
+            qs = Product.objects.order_by(*sort)
+            ordered = list(qs)
+            for start_index in (30, 33):
+                with self.subTest(order_by=order_by, start_index=start_index):
+                    start_cursor = cursor_at(ordered, start_index, sort)
+                    cursors = page_cursors(
+                        qs, sort, 10, [2, 3, 4, 5, 6], last_page=10, total=97,
+                        start_index=start_index, start_cursor=start_cursor)
+                    self.assertEqual(sorted(cursors), [2, 3, 4, 5, 6, 10])
+                    self.assertPageCursors(cursors, ordered, sort, 10)
+
+    def test_page_cursors_read_a_few_pages(self):
+        sort = get_sort("price")
+        qs = Product.objects.order_by(*sort)
+        start_cursor = cursor_string_from_obj(list(qs)[50], sort)
+        with CaptureQueriesContext(connection) as queries:
+            cursors = page_cursors(
+                qs, sort, 10, [4, 5, 6, 7, 8], last_page=10, total=97,
+                start_index=50, start_cursor=start_cursor)
+        self.assertEqual(sorted(cursors), [4, 5, 6, 7, 8, 10])
+        # the rows before and after the page and from the end, none of
+        # them numbering from the start of the table
+        self.assertEqual(len(queries), 3)
+        for query in queries:
+            self.assertRegex(query["sql"], r"LIMIT (\d|1\d|2\d)\b")
+
+    def test_page_cursors_past_the_end(self):
+        sort = get_sort("price")
+        qs = Product.objects.order_by(*sort)
+        cursors = page_cursors(qs, sort, 10, [9, 10, 11], 12)
+        self.assertEqual(sorted(cursors), [9, 10])
+        start_cursor = cursor_string_from_obj(list(qs)[90], sort)
+        cursors = page_cursors(
+            qs, sort, 10, [9, 10, 11], 12, start_index=90, start_cursor=start_cursor)
+        self.assertEqual(sorted(cursors), [9, 10])
+
+    def execute(self, **variables):
+        result = schema.execute(
+            PRODUCTS, variables=variables, context_value=RequestFactory().post("/graphql"))
+        self.assertIsNone(result.errors)
+        return result.data["viewer"]["products"]
+
+    def test_page_buttons(self):
+        order_by = "-square__ad_url,start"
+        expected = self.expected(get_sort(order_by))
+        products = self.execute(first=10, pageSize=10, orderBy=order_by)
+        pages = products["pages"]
+        self.assertEqual(products["total"], 97)
+        self.assertEqual(pages["first"], {"cursor": "", "pageNumber": 1, "isCurrent": True})
+        self.assertEqual([p["pageNumber"] for p in pages["around"]], [1, 2, 3])
+        self.assertEqual(pages["last"]["pageNumber"], 10)
+
+        # jump to the last page, then a page around it, then back one
+        products = self.execute(
+            first=10, pageSize=10, orderBy=order_by, after=pages["last"]["cursor"])
+        self.assertEqual([e["node"]["pk"] for e in products["edges"]], [str(pk) for pk in expected[90:]])
+        around = {p["pageNumber"]: p for p in products["pages"]["around"]}
+        self.assertEqual(sorted(around), [8, 9, 10])
+        self.assertTrue(around[10]["isCurrent"])
+
+        products = self.execute(
+            first=10, pageSize=10, orderBy=order_by, after=around[8]["cursor"])
+        self.assertEqual([e["node"]["pk"] for e in products["edges"]], [str(pk) for pk in expected[70:80]])
+        previous = products["pages"]["previous"]
+        self.assertEqual(previous["pageNumber"], 7)
+
+        products = self.execute(
+            first=10, pageSize=10, orderBy=order_by, after=previous["cursor"])
+        self.assertEqual([e["node"]["pk"] for e in products["edges"]], [str(pk) for pk in expected[60:70]])
+
+    def test_page_numbers_without_counting(self):
+        order_by = "price"
+        pages = self.execute(first=10, pageSize=10, orderBy=order_by)["pages"]
+        with mock.patch(
+                "graphene_extras.pagination.ui.rows_before_cursor",
+                side_effect=AssertionError("counted the rows before the page")):
+            products = self.execute(
+                first=10, pageSize=10, orderBy=order_by, after=pages["around"][2]["cursor"])
+            around = {p["pageNumber"]: p for p in products["pages"]["around"]}
+            self.assertTrue(around[3]["isCurrent"])
+            products = self.execute(
+                first=10, pageSize=10, orderBy=order_by, after=around[5]["cursor"])
+            self.assertEqual(
+                [p["pageNumber"] for p in products["pages"]["around"] if p["isCurrent"]], [5])
+            products = self.execute(
+                first=10, pageSize=10, orderBy=order_by,
+                after=products["edges"][-1]["cursor"])
+            self.assertEqual(
+                [p["pageNumber"] for p in products["pages"]["around"] if p["isCurrent"]], [6])
+
+    def test_offset_cursors_are_rejected(self):
+        result = schema.execute(
+            PRODUCTS,
+            variables={"first": 10, "after": "YXJyYXljb25uZWN0aW9uOjk="},
+            context_value=RequestFactory().post("/graphql"))
+        self.assertTrue(result.errors)
+
+    def test_reverse_sort(self):
+        self.assertEqual(reverse_sort(["a", "-b", "pk"]), ["-a", "b", "-pk"])
+
+
+class ProductSearchFormTests(TestCase):
+    def test_inverted_ranges(self):
+        form = ProductSearchForm(data={
+            "from_price": 500000, "to_price": 10,
+            "from_start_date": "2021-03-02", "to_start_date": "2021-03-01",
+        })
+        self.assertFalse(form.is_valid())
+        self.assertEqual(sorted(form.errors), ["to_price", "to_start_date"])
+
+    def test_ranges_of_one_value(self):
+        form = ProductSearchForm(data={
+            "from_price": 10, "to_price": 10,
+            "from_end_date": "2021-03-01", "to_end_date": "2021-03-01",
+        })
+        self.assertTrue(form.is_valid(), form.errors)
+
+    def test_form_errors_reach_the_connection(self):
+        result = schema.execute(
+            """{ viewer { products (first: 5, formData: {fromPrice: 500000, toPrice: 10}) {
+                edges { node { pk } } formErrors { field errors } } } }""",
+            context_value=RequestFactory().post("/graphql"))
+        self.assertIsNone(result.errors)
+        products = result.data["viewer"]["products"]
+        self.assertEqual(products["edges"], [])
+        self.assertEqual([e["field"] for e in products["formErrors"]], ["to_price"])
+
+
+SQUARES = """
+query Squares ($first: Int) {
+  viewer {
+    squares (first: $first) {
+      edges { node { pk adUrl products { pk price square { pk adUrl } } } }
+    }
+  }
+}
+"""
+
+
+class DataLoaderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_products(40)
+
+    def execute(self, first):
+        result = schema.execute(
+            SQUARES, variables={"first": first}, context_value=RequestFactory().post("/graphql"))
+        self.assertIsNone(result.errors)
+        return [edge["node"] for edge in result.data["viewer"]["squares"]["edges"]]
+
+    def test_products_of_squares(self):
+        squares = self.execute(10)
+        self.assertEqual(len(squares), 4)
+        for square in squares:
+            expected = Product.objects.filter(square_id=square["pk"]).order_by("pk")
+            self.assertEqual(
+                [(p["pk"], p["price"]) for p in square["products"]],
+                [(str(p.pk), p.price) for p in expected])
+            for product in square["products"]:
+                self.assertEqual(product["square"]["adUrl"], square["adUrl"])
+
+    def test_queries_do_not_grow_with_the_page(self):
+        # count, page of squares, their products, the squares of those
+        with self.assertNumQueries(4):
+            self.execute(1)
+        with self.assertNumQueries(4):
+            self.execute(10)
+
+
+TOTAL = """
+query Total ($first: Int) {
+  viewer { products (first: $first, orderBy: "price") { edges { node { pk } } total } }
+}
+"""
+
+
+class ResponseCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_products(30)
+
+    def setUp(self):
+        cache.clear()
+
+    def execute(self):
+        result = schema.execute(
+            TOTAL, variables={"first": 50}, context_value=RequestFactory().post("/graphql"))
+        self.assertIsNone(result.errors)
+        products = result.data["viewer"]["products"]
+        return len(products["edges"]), products["total"]
+
+    def test_off_by_default(self):
+        from squares.cache import products_cache
+        self.assertFalse(products_cache.enabled)
+
+    def test_write_updates_page_and_total(self):
+        for response_cache in (None, "default"):
+            with self.subTest(response_cache=response_cache), override_settings(
+                    GRAPHENE_EXTRAS={"RESPONSE_CACHE": response_cache, "TOTAL_COUNT_TIMEOUT": 600}):
+                count = Product.objects.count()
+                self.assertEqual(self.execute(), (count, count))
+                self.assertEqual(self.execute(), (count, count))
+                product = Product.objects.first()
+                product.pk = None
+                product.save()
+                self.assertEqual(self.execute(), (count + 1, count + 1))
+                product.delete()
+                self.assertEqual(self.execute(), (count, count))
+
+
+class KeysetProductConnection(PaginationConnection):
+    class Meta:
+        node = ProductNode
+
+    @classmethod
+    def get_queryset(cls, root, info, **kwargs):
+        return Product.objects.all()
+
+    @classmethod
+    def get_sort(cls, **kwargs):
+        return PaginateProductConnection.get_sort(**kwargs)
+
+
+class KeysetQuery(graphene.ObjectType):
+    products = QuerysetConnectionField(KeysetProductConnection, orderBy=graphene.String())
+
+
+keyset_schema = graphene.Schema(query=KeysetQuery)
+
+
+class QuerysetConnectionFieldTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_products(30)
+
+    def test_first_defaults_to_the_max_limit(self):
+        with mock.patch.object(graphene_settings, "RELAY_CONNECTION_MAX_LIMIT", 20):
+            result = keyset_schema.execute("{ products { edges { node { pk } } } }")
+        self.assertIsNone(result.errors)
+        self.assertEqual(len(result.data["products"]["edges"]), 20)
+
+
+class QueryCostTests(TestCase):
+    def cost(self, query, **variables):
+        return estimate_cost(schema, parse(query), variables)[0]
+
+    def test_pages_cost_depends_on_page_size(self):
+        query = """
+        query ($pageSize: Int) {
+          viewer {
+            products (first: 10) {
+              pages (pageSize: $pageSize) { around { cursor } }
+            }
+          }
+        }
+        """
+        base = self.cost(query, pageSize=0)
+        self.assertEqual(self.cost(query, pageSize=10) - base, 5 * 10 - 5)
+        self.assertEqual(self.cost(query, pageSize=1000) - base, 5 * 1000 - 5)
+        # 10 by default
+        self.assertEqual(self.cost(query), self.cost(query, pageSize=10))
+
+    def test_negative_page_size_costs_nothing_off(self):
+        query = """
+        query ($first: Int) {
+          viewer { products (first: $first) { edges { node { pk price } } } }
+        }
+        """
+        self.assertEqual(self.cost(query, first=-100), self.cost(query, first=0))
+        self.assertGreater(self.cost(query, first=-100), 0)
+
+
+class ProductsExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_products(30)
+
+    def export(self, **params):
+        return self.client.get(reverse("products:products_export"), {"format": "ndjson", **params})
+
+    def rows(self, response):
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content).decode().splitlines()
+
+    def test_filter_names(self):
+        expected = Product.objects.filter(price__gte=200).count()
+        self.assertLess(expected, 30)
+        # as the client names them and as the form does
+        self.assertEqual(len(self.rows(self.export(fromPrice=200))), expected)
+        self.assertEqual(len(self.rows(self.export(from_price=200))), expected)
+        self.assertEqual(
+            len(self.rows(self.export(fromStart="2021-03-03"))),
+            Product.objects.filter(start__gte=EPOCH + datetime.timedelta(days=2)).count())
+
+    def test_bad_filters(self):
+        for params in ({"fromPrice": "abc"}, {"from_price": "abc"}):
+            with self.subTest(params=params):
+                response = self.export(**params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("from_price", response.json())
+        response = self.export(price=200)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"price": ["Not a filter."]})
@@ -1,7 +1,8 @@
 from django.urls import path
 
-from squares.views import (InfiniteScroll, MyTable, ProductSearchForm,
-                           ProductsTableServerSide, ProductsView, Slider)
+from squares.views import (InfiniteScroll, MyTable, ProductsExport,
+                           ProductSearchForm, ProductsTableServerSide,
+                           ProductsView, Slider)
 
 app_name = "products"
 urlpatterns = [
@@ -12,5 +13,6 @@ urlpatterns = [
          name="products_search_form"),
     path('slider', Slider.as_view(), name="slider"),
     path('my_table', MyTable.as_view(), name="my-table"),
-    path('infinite_scroll', InfiniteScroll.as_view(), name="infinite_scroll")
+    path('infinite_scroll', InfiniteScroll.as_view(), name="infinite_scroll"),
+    path('export', ProductsExport.as_view(), name="products_export"),
 ]
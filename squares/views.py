@@ -1,6 +1,13 @@
+from django.core.exceptions import FieldError
+from django.http import (HttpResponseBadRequest, JsonResponse, QueryDict,
+                         StreamingHttpResponse)
 from django.shortcuts import render
-from django.views.generic import TemplateView
+from django.views.generic import TemplateView, View
+from graphene.utils.str_converters import to_snake_case
+from squares.export import CONTENT_TYPES, export_chunks
+from squares.forms import ProductSearchForm as SearchForm
 from squares.models import Product
+from squares.schema import PaginateProductConnection
 
 def model_dict_for_ui(product):
     product["start"] = product["start"].strftime("%d %m %Y")
@@ -27,4 +34,66 @@ class MyTable(TemplateView):
     template_name = "my_table.html"
 
 class InfiniteScroll(TemplateView):
-    template_name = "infinite_scroll.html"
\ No newline at end of file
+    template_name = "infinite_scroll.html"
+
+class ProductsExport(View):
+    """
+    The products of a search as csv or ndjson, streamed e.g.
+
+        /squares/export?format=csv&orderBy=-price&fromPrice=10&listing=l
+
+    Takes the fields of ProductNodeInput as the client names them e.g.
+    fromPrice and fromStart - or the fields of ProductSearchForm e.g.
+    from_price and from_start_date - and orderBy as the products of the
+    viewer do.  Any other name is a 400 rather than a filter quietly
+    ignored.
+    """
+    chunk_size = 2000
+
+    # the query parameters which aren't filters
+    parameters = ('format', 'orderBy')
+
+    def get_form_data(self, query):
+        """
+        (data for SearchForm, the names which aren't filters) from the query
+        string.
+        """
+        data = QueryDict(mutable=True)
+        unknown = []
+        for name, values in query.lists():
+            if name in self.parameters:
+                continue
+            field = to_snake_case(name)
+            field = SearchForm.input_names.get(field, field)
+            if field in SearchForm.base_fields:
+                data.setlist(field, values)
+            else:
+                unknown.append(name)
+        return data, unknown
+
+    def get(self, request, *args, **kwargs):
+        format = request.GET.get('format', 'csv')
+        if format not in CONTENT_TYPES:
+            return HttpResponseBadRequest("format must be csv or ndjson")
+
+        data, unknown = self.get_form_data(request.GET)
+        if unknown:
+            # as form.errors
+            return JsonResponse(
+                {name: ["Not a filter."] for name in unknown}, status=400)
+        form = SearchForm(data=data)
+        if not form.is_valid():
+            return JsonResponse(form.errors, status=400)
+
+        sort = PaginateProductConnection.get_sort(orderBy=request.GET.get('orderBy'))
+        try:
+            queryset = Product.objects.filter(form.get_filters()).order_by(*sort)
+        except FieldError as e:
+            return HttpResponseBadRequest(str(e))
+
+        response = StreamingHttpResponse(
+            export_chunks(queryset, format, self.chunk_size),
+            content_type=CONTENT_TYPES[format]
+        )
+        response['Content-Disposition'] = f'attachment; filename="products.{format}"'
+        return response